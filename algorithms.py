@@ -1,63 +1,397 @@
 from collections import defaultdict
+from bisect import bisect_right
 import heapq
-from db import get_edges_raw, get_edge_between
+from db import get_places_by_id
+from graph_state import get_edge_profiles, get_snapshot
+from route_cache import route_cache
 
 from datetime import datetime, timedelta
 
-def find_route(start, end, mode='distance', use_highways=True, departure_time=None):
-    edges = get_edges_raw()
-    graph = defaultdict(list)
-    # Pokud se mají dálnice ignorovat, vyřadíme hrany s dálnicemi (toll==1)
-    filtered_edges = []
-    for eid, f, t, dist, tm, toll in edges:
-        if use_highways or not toll:
-            filtered_edges.append((eid, f, t, dist, tm, toll))
-    for eid, f, t, dist, tm, toll in filtered_edges:
-        graph[f].append({'to': t, 'distance': dist, 'time': tm, 'toll': toll})
-        graph[t].append({'to': f, 'distance': dist, 'time': tm, 'toll': toll})
-    # Rozhodnutí podle režimu
-    cost_key = 'distance' if mode == 'distance' else 'time'
-    queue = [(0, start, [])]
+def _build_graph(use_highways=True):
+    # Sousednost: uzel -> [(soused, id hrany, vzdálenost, čas, mýto)] z aktuálního snímku grafu.
+    # Jedno hledání pracuje s jedním snímkem, souběžné změny hran ho neovlivní.
+    return get_snapshot().view(use_highways)
+
+def _parse_departure(departure_time):
+    if isinstance(departure_time, datetime):
+        return departure_time
+    try:
+        return datetime.strptime(departure_time, '%Y-%m-%dT%H:%M')
+    except (TypeError, ValueError):
+        return None
+
+def _search_path(graph, start, end, cost_index):
+    # Dijkstra od startu do cíle; vrací (uzly, hrany) nebo None
+    queue = [(0, start)]
+    best = {start: 0}
+    parent = {start: None}
     visited = set()
-    path = []
     while queue:
-        cost, node, curr_path = heapq.heappop(queue)
+        cost, node = heapq.heappop(queue)
         if node == end:
-            path = curr_path
-            break
+            return _tree_path(parent, end)
         if node in visited:
             continue
         visited.add(node)
         for edge in graph[node]:
-            if edge['to'] not in visited:
-                heapq.heappush(queue, (cost + edge[cost_key], edge['to'], curr_path + [node]))
+            to = edge[0]
+            if to in visited:
+                continue
+            next_cost = cost + edge[cost_index]
+            if next_cost < best.get(to, float('inf')):
+                best[to] = next_cost
+                parent[to] = (node, edge)
+                heapq.heappush(queue, (next_cost, to))
+    return None
+
+def find_route(start, end, mode='distance', use_highways=True, departure_time=None, use_cache=True):
+    # Časově závislé profily se použijí jen pro režim 'time' se zadaným odjezdem
+    if mode == 'time' and departure_time is not None:
+        dep_dt = _parse_departure(departure_time)
+        profiles = get_edge_profiles() if dep_dt is not None else None
+        if profiles:
+            return find_route_td(start, end, dep_dt, use_highways=use_highways, profiles=profiles)
+    snapshot = get_snapshot()
+    graph = snapshot.view(use_highways)
+    # Rozhodnutí podle režimu
+    cost_index = 2 if mode == 'distance' else 3
+    if not use_cache:
+        found = _search_path(graph, start, end, cost_index)
+    else:
+        # Výsledky jsou platné jen pro verzi grafu, se kterou byly spočítány
+        version = (snapshot.db_path, snapshot.version)
+        key = (start, end, mode, use_highways)
+        found = route_cache.paths.get(version, key)
+        if found is None:
+            origin_key = (start, mode, use_highways)
+            tree = route_cache.trees.get(version, origin_key)
+            if tree is None and route_cache.is_hot(version, origin_key):
+                tree = _shortest_path_tree(graph, start, cost_index)[1]
+                route_cache.trees.put(version, origin_key, tree)
+            if tree is not None:
+                found = _tree_path(tree, end) if end in tree else None
+            else:
+                found = _search_path(graph, start, end, cost_index)
+            # False značí uloženou odpověď „trasa neexistuje“
+            found = found or False
+            route_cache.paths.put(version, key, found)
+    if not found:
+        return None
+    # Sestavení detailů trasy včetně ETA
+    nodes, edges = found
+    return _summarize(nodes, edges, departure_time)
+
+def find_route_td(start, end, departure_time, use_highways=True, profiles=None):
+    """Time-dependent Dijkstra on travel time.
+
+    Each edge with a profile is evaluated at the time we arrive at its tail
+    node; edges without a profile keep their static ``time``. The label of a
+    node is the elapsed minutes since ``departure_time``. ``profiles`` is a
+    ``graph_state.EdgeProfiles``; by default the cached ones are used.
+    """
+    dep_dt = _parse_departure(departure_time)
+    if dep_dt is None:
+        raise ValueError('departure_time must be a datetime or YYYY-MM-DDTHH:MM string')
+    if profiles is None:
+        profiles = get_edge_profiles()
+    graph = _build_graph(use_highways)
+    dep_minute = dep_dt.hour * 60 + dep_dt.minute + dep_dt.second / 60
+    travel_time = profiles.travel_time
+    best = {start: 0}
+    parent = {start: None}
+    queue = [(0, start)]
+    settled = set()
+    while queue:
+        elapsed, node = heapq.heappop(queue)
+        if node == end:
+            break
+        if node in settled:
+            continue
+        settled.add(node)
+        clock = dep_minute + elapsed
+        for to, eid, dist, tm, toll in graph[node]:
+            if to in settled:
+                continue
+            profile_tm = travel_time(eid, clock)
+            if profile_tm is not None:
+                tm = profile_tm
+            arrival = elapsed + tm
+            if arrival < best.get(to, float('inf')):
+                best[to] = arrival
+                parent[to] = (node, dist, toll)
+                heapq.heappush(queue, (arrival, to))
     else:
         return None
-    # Sestavení detailů trasy
-    full_path = path + [end]
+    full_path = [end]
     total_dist = 0
-    total_time = 0
     tolls = 0
-    for i in range(len(full_path)-1):
-        edge_data = get_edge_between(full_path[i], full_path[i+1])
-        if edge_data:
-            d, t, toll = edge_data
-            total_dist += d
-            total_time += t
-            tolls += toll
-    # Výpočet ETA
-    eta = None
-    if departure_time is not None:
-        try:
-            dep_dt = datetime.strptime(departure_time, '%Y-%m-%dT%H:%M')
-            eta_dt = dep_dt + timedelta(minutes=total_time)
-            eta = eta_dt.strftime('%Y-%m-%d %H:%M')
-        except Exception:
-            eta = None
+    node = end
+    while parent[node] is not None:
+        node, dist, toll = parent[node]
+        full_path.append(node)
+        total_dist += dist
+        tolls += toll
+    full_path.reverse()
+    total_time = best[end]
+    eta_dt = dep_dt + timedelta(minutes=total_time)
     return {
         'route': full_path,
         'distance': total_dist,
         'time': total_time,
         'tolls': tolls,
+        'eta': eta_dt.strftime('%Y-%m-%d %H:%M')
+    }
+
+def _shortest_path_tree(graph, source, cost_index):
+    # Úplný Dijkstra ze zdroje; parent[uzel] = (předchozí uzel, n-tice hrany)
+    costs = {}
+    parent = {source: None}
+    best = {source: 0}
+    queue = [(0, source)]
+    while queue:
+        cost, node = heapq.heappop(queue)
+        if node in costs:
+            continue
+        costs[node] = cost
+        for edge in graph[node]:
+            to = edge[0]
+            if to in costs:
+                continue
+            next_cost = cost + edge[cost_index]
+            if next_cost < best.get(to, float('inf')):
+                best[to] = next_cost
+                parent[to] = (node, edge)
+                heapq.heappush(queue, (next_cost, to))
+    return costs, parent
+
+def _tree_path(parent, node):
+    # Uzly a hrany od kořene stromu k uzlu
+    nodes = [node]
+    edges = []
+    while parent[node] is not None:
+        node, edge = parent[node]
+        nodes.append(node)
+        edges.append(edge)
+    nodes.reverse()
+    edges.reverse()
+    return nodes, edges
+
+def _summarize(nodes, edges, departure_time=None):
+    total_dist = sum(edge[2] for edge in edges)
+    total_time = sum(edge[3] for edge in edges)
+    eta = None
+    dep_dt = _parse_departure(departure_time) if departure_time is not None else None
+    if dep_dt is not None:
+        eta = (dep_dt + timedelta(minutes=total_time)).strftime('%Y-%m-%d %H:%M')
+    return {
+        'route': list(nodes),
+        'distance': total_dist,
+        'time': total_time,
+        'tolls': sum(edge[4] for edge in edges),
         'eta': eta
     }
+
+def find_alternatives(start, end, k=3, mode='distance', use_highways=True, departure_time=None,
+                      max_stretch=1.4, max_similarity=0.6):
+    """Up to k distinct routes using the via-node (plateau) method.
+
+    One shortest-path tree from ``start`` and one towards ``end`` give the
+    cost of the best route through every node v as fwd[v] + bwd[v], so each
+    candidate is just two tree walks. Candidates longer than ``max_stretch``
+    times the optimum, containing loops, or sharing more than
+    ``max_similarity`` of their cost with an accepted route are dropped.
+    """
+    graph = _build_graph(use_highways)
+    cost_index = 2 if mode == 'distance' else 3
+    fwd, fwd_parent = _shortest_path_tree(graph, start, cost_index)
+    if end not in fwd:
+        return []
+    # Hrany jsou obousměrné, strom k cíli je tedy strom z cíle
+    bwd, bwd_parent = _shortest_path_tree(graph, end, cost_index)
+    limit = fwd[end] * max_stretch
+    candidates = sorted((fwd[v] + bwd[v], v) for v in fwd if v in bwd and fwd[v] + bwd[v] <= limit)
+
+    accepted = []
+    covered = set()
+    for cost, via in candidates:
+        if len(accepted) >= k:
+            break
+        # Průjezdní uzly na přijaté trase by zopakovaly (část) této trasy
+        if via in covered:
+            continue
+        head_nodes, head_edges = _tree_path(fwd_parent, via)
+        tail_nodes, tail_edges = _tree_path(bwd_parent, via)
+        nodes = head_nodes + tail_nodes[-2::-1]
+        if len(set(nodes)) != len(nodes):
+            continue
+        edges = head_edges + tail_edges[::-1]
+        edge_ids = {edge[1] for edge in edges}
+        too_similar = False
+        for other_ids, _ in accepted:
+            shared = sum(edge[cost_index] for edge in edges if edge[1] in other_ids)
+            if cost and shared / cost > max_similarity:
+                too_similar = True
+                break
+        if not too_similar:
+            covered.update(nodes)
+            accepted.append((edge_ids, _summarize(nodes, edges, departure_time)))
+    return [summary for _, summary in accepted]
+
+def _dominated(costs, bag):
+    for other in bag:
+        if other[0] <= costs[0] and other[1] <= costs[1] and other[2] <= costs[2]:
+            return True
+    return False
+
+def find_pareto_routes(start, end, use_highways=True, departure_time=None, max_labels=8, max_routes=10):
+    """Pareto-optimal routes over (time, distance, tolls).
+
+    Multi-criteria label-setting search: labels are settled in
+    lexicographic order, a label dominated by one already settled at its
+    node or at the target is pruned, and each node keeps at most
+    ``max_labels`` labels so the search stays interactive on dense graphs.
+    """
+    graph = _build_graph(use_highways)
+    bags = defaultdict(list)
+    results = []
+    counter = 0
+    # (čas, vzdálenost, mýta, rozhodovací pořadí, uzel, rodičovský štítek, hrana)
+    queue = [(0, 0, 0, counter, start, None, None)]
+    while queue:
+        label = heapq.heappop(queue)
+        costs = label[:3]
+        node = label[4]
+        bag = bags[node]
+        if _dominated(costs, bag) or _dominated(costs, bags[end]):
+            continue
+        if len(bag) >= max_labels:
+            continue
+        bag.append(costs)
+        if node == end:
+            results.append(label)
+            if len(results) >= max_routes:
+                break
+            continue
+        for edge in graph[node]:
+            to = edge[0]
+            next_costs = (costs[0] + edge[3], costs[1] + edge[2], costs[2] + edge[4])
+            if _dominated(next_costs, bags[to]) or _dominated(next_costs, bags[end]):
+                continue
+            counter += 1
+            heapq.heappush(queue, next_costs + (counter, to, label, edge))
+
+    routes = []
+    for label in results:
+        nodes = [label[4]]
+        edges = []
+        while label[5] is not None:
+            edges.append(label[6])
+            label = label[5]
+            nodes.append(label[4])
+        nodes.reverse()
+        edges.reverse()
+        routes.append(_summarize(nodes, edges, departure_time))
+    # Pojmenování extrémů sady pro řidiče
+    if routes:
+        for route in routes:
+            route['tags'] = []
+        min(routes, key=lambda r: (r['time'], r['distance']))['tags'].append('fastest')
+        min(routes, key=lambda r: (r['distance'], r['time']))['tags'].append('shortest')
+        toll_free = [r for r in routes if not r['tolls']]
+        if toll_free:
+            min(toll_free, key=lambda r: r['time'])['tags'].append('toll_free')
+    return routes
+
+def route_matrix(origins, destinations, mode='time', use_highways=True):
+    """Cost matrix [origin][destination] (None when unreachable).
+
+    One single-source search per origin that stops once every destination
+    is settled.
+    """
+    graph = _build_graph(use_highways)
+    cost_index = 2 if mode == 'distance' else 3
+    matrix = []
+    for origin in origins:
+        remaining = set(destinations)
+        costs = {}
+        queue = [(0, origin)]
+        while queue and remaining:
+            cost, node = heapq.heappop(queue)
+            if node in costs:
+                continue
+            costs[node] = cost
+            remaining.discard(node)
+            for edge in graph[node]:
+                if edge[0] not in costs:
+                    heapq.heappush(queue, (cost + edge[cost_index], edge[0]))
+        matrix.append([costs.get(dest) for dest in destinations])
+    return matrix
+
+def reachable_within(start, budget, mode='time', use_highways=True):
+    """Bounded single-source Dijkstra: {place_id: cost} for every place
+    whose cheapest cost from ``start`` does not exceed ``budget``."""
+    graph = _build_graph(use_highways)
+    cost_index = 2 if mode == 'distance' else 3
+    costs = {}
+    queue = [(0, start)]
+    while queue:
+        cost, node = heapq.heappop(queue)
+        # Fronta je seřazená, takže první uzel nad limitem ukončí hledání
+        if cost > budget:
+            break
+        if node in costs:
+            continue
+        costs[node] = cost
+        for edge in graph[node]:
+            if edge[0] not in costs:
+                next_cost = cost + edge[cost_index]
+                if next_cost <= budget:
+                    heapq.heappush(queue, (next_cost, edge[0]))
+    return costs
+
+def convex_hull(points):
+    # Andrewův monotónní řetězec; obal vrací proti směru hodinových ručiček bez opakování prvního bodu
+    points = sorted(set(points))
+    if len(points) <= 2:
+        return points
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    lower = []
+    for p in points:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    upper = []
+    for p in reversed(points):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return lower[:-1] + upper[:-1]
+
+def isochrone(start, budgets, mode='time', use_highways=True, with_hull=False):
+    """Reachability for several budgets from one graph traversal.
+
+    The search runs once up to the largest budget; smaller budgets are
+    answered by filtering the settled costs.
+    """
+    budgets = sorted(set(budgets))
+    if not budgets:
+        return []
+    costs = reachable_within(start, budgets[-1], mode=mode, use_highways=use_highways)
+    coords = None
+    if with_hull:
+        # Souřadnice jen dosažených uzlů, ne celé tabulky míst
+        coords = {pid: (p['x'], p['y']) for pid, p in get_places_by_id(costs).items()}
+    ordered = sorted(costs.items(), key=lambda item: item[1])
+    ordered_costs = [cost for _, cost in ordered]
+    result = []
+    for budget in budgets:
+        reached = [{'id': node, 'cost': cost} for node, cost in ordered[:bisect_right(ordered_costs, budget)]]
+        entry = {'budget': budget, 'places': reached}
+        if with_hull:
+            points = [coords[p['id']] for p in reached if p['id'] in coords]
+            entry['hull'] = [{'x': x, 'y': y} for x, y in convex_hull(points)]
+        result.append(entry)
+    return result
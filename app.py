@@ -1,8 +1,15 @@
 from flask import Flask
 from config import get_config
 from routes import routes_bp
+import routes
+from utils.profiling import ProfilingMiddleware
+from utils import log
+import warmup
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 def create_app(config_class=None):
     """Application factory function to create and configure the Flask app.
     This pattern makes the app more modular and easier to test.
@@ -15,22 +22,44 @@ def create_app(config_class=None):
         config_class = get_config()
     app.config.from_object(config_class)
 
+    # Queue-based logging; the current API key is masked wherever it appears
+    log.configure(level=config_class.LOG_LEVEL, fmt=config_class.LOG_FORMAT,
+                  debug_sample=config_class.LOG_DEBUG_SAMPLE, use_queue=config_class.LOG_QUEUE,
+                  secrets=lambda: (config_class.GOOGLE_MAPS_API_KEY,))
+
     # Validate configuration
     config_class.validate_config()
 
     # Register blueprints
     app.register_blueprint(routes_bp)
 
-    # Print startup information
-    print(f"Starting application in {config_class.ENV} mode")
-    print(f"Database path: {config_class.DB_PATH}")
+    # Profiling wraps the WSGI app only when enabled, so it costs nothing otherwise
+    if config_class.PROFILING_ENABLED:
+        app.wsgi_app = ProfilingMiddleware(app.wsgi_app, routes.profile_store,
+                                           sample_every=config_class.PROFILING_SAMPLE_EVERY,
+                                           token=config_class.PROFILING_TOKEN)
+
+    if config_class.WARMUP_ON_START:
+        warmup.start()
+
+    # Log startup information
+    logger.info("Starting application in %s mode", config_class.ENV)
+    logger.info("Database path: %s", config_class.DB_PATH)
 
     return app
 
-# Create the application instance
-app = create_app()
+def __getattr__(name):
+    # "app:app" (gunicorn, flask run, from app import app) creates the
+    # application on first access instead of at import time
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == '__main__':
+    app = create_app()
+
     # Get host and port from config
     host = app.config.get('HOST', '0.0.0.0')
     port = app.config.get('PORT', 5000)
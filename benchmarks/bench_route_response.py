@@ -0,0 +1,61 @@
+"""CPU per /route request on large multi-leg Directions responses.
+
+The Google client is replaced by one returning a prebuilt response, so the
+numbers cover planning, route selection and response assembly only.
+
+Usage: python -m benchmarks.bench_route_response [--legs 25] [--steps 200] [--requests 50]
+"""
+import argparse
+import time
+
+from benchmarks.directions_fixtures import make_directions
+
+
+class StaticDirectionsClient:
+    def __init__(self, data):
+        self.data = data
+
+    async def plan_route(self, **kwargs):
+        return self.data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--legs', type=int, default=25)
+    parser.add_argument('--steps', type=int, default=200)
+    parser.add_argument('--routes', type=int, default=3)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--toll-every', type=int, default=10 ** 9, help='mark every Nth step as a toll road')
+    args = parser.parse_args()
+
+    import routes
+    from app import create_app
+
+    app = create_app()
+    data = make_directions(args.legs, args.steps, args.routes, toll_every=args.toll_every)
+    routes.route_planner.google_maps_client = StaticDirectionsClient(data)
+    client = app.test_client()
+    payload = {'start': 'Praha', 'end': 'Brno', 'departure_time': 1700000000}
+    assert client.post('/route', json=payload).status_code == 200
+
+    def measure():
+        start = time.process_time()
+        for _ in range(args.requests):
+            client.post('/route', json=payload)
+        return (time.process_time() - start) / args.requests * 1000
+
+    full = measure()
+    # Same requests with JSON encoding stubbed out: planning, selection and assembly only
+    jsonify = routes.jsonify
+    routes.jsonify = lambda *a, **k: ''
+    try:
+        assembly = measure()
+    finally:
+        routes.jsonify = jsonify
+    print(f'{args.routes} routes x {args.legs} legs x {args.steps} steps, CPU per /route request:')
+    print(f'  full request:           {full:.2f} ms')
+    print(f'  without JSON encoding:  {assembly:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Multi-query throughput of the routing pool for different worker counts.
+
+Usage: python -m benchmarks.bench_routing_pool [--size 120] [--queries 64] [--workers 1,2,4]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import db
+from config import Config
+from benchmarks.bench_time_dependent import build_grid_db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=120, help='grid side length')
+    parser.add_argument('--queries', type=int, default=64)
+    parser.add_argument('--workers', default='1,2,4')
+    args = parser.parse_args()
+
+    from graph_snapshot import write_snapshot
+    from routing_pool import RoutingPool
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        build_grid_db(path, args.size)
+        # Workers share the graph through the mapped snapshot
+        snap = os.path.join(tmp, 'graph.snap')
+        write_snapshot(path, snap)
+        db.DB_PATH = Config.DB_PATH = path
+        Config.GRAPH_SNAPSHOT_PATH = snap
+        rng = random.Random(3)
+        nodes = args.size * args.size
+        pairs = [(rng.randrange(nodes), rng.randrange(nodes)) for _ in range(args.queries)]
+
+        baseline = None
+        for workers in (int(w) for w in args.workers.split(',')):
+            pool = RoutingPool(workers=workers, max_queue=args.queries, timeout=300)
+            # Warm up every worker (interpreter start, snapshot open)
+            for future in [pool.submit('find_route', 0, 1) for _ in range(workers)]:
+                pool.result(future)
+            start = time.perf_counter()
+            futures = [pool.submit('find_route', s, t, mode='time') for s, t in pairs]
+            for future in futures:
+                pool.result(future)
+            elapsed = time.perf_counter() - start
+            pool.shutdown()
+            qps = args.queries / elapsed
+            baseline = baseline or qps
+            print(f'{workers} worker(s): {qps:7.1f} queries/s (speedup {qps / baseline:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Compare static and time-dependent local routing on a synthetic grid.
+
+Usage: python -m benchmarks.bench_time_dependent [--size 60] [--queries 50]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import db
+
+
+def build_grid_db(path, size, seed=1):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute('CREATE TABLE places (id INTEGER PRIMARY KEY, name TEXT NOT NULL, x REAL NOT NULL, y REAL NOT NULL)')
+    c.execute('CREATE TABLE edges (id INTEGER PRIMARY KEY, from_id INTEGER, to_id INTEGER, distance REAL, time REAL, toll INTEGER)')
+    c.executemany('INSERT INTO places VALUES (?, ?, ?, ?)',
+                  ((r * size + col, f'P{r}-{col}', col, r) for r in range(size) for col in range(size)))
+    edges = []
+    for r in range(size):
+        for col in range(size):
+            node = r * size + col
+            if col + 1 < size:
+                edges.append((len(edges) + 1, node, node + 1, rng.uniform(1, 5), rng.uniform(1, 6), 0))
+            if r + 1 < size:
+                edges.append((len(edges) + 1, node, node + size, rng.uniform(1, 5), rng.uniform(1, 6), 0))
+    c.executemany('INSERT INTO edges VALUES (?, ?, ?, ?, ?, ?)', edges)
+    conn.commit()
+    conn.close()
+    return edges
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=60, help='grid side length')
+    parser.add_argument('--queries', type=int, default=50)
+    args = parser.parse_args()
+
+    import graph_state
+    from algorithms import find_route, find_route_td
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        edges = build_grid_db(path, args.size)
+        db.DB_PATH = path
+        rng = random.Random(2)
+        # 15-minute buckets with a morning and evening peak on every edge
+        graph_state.set_edge_profiles(
+            (eid, 15, [tm * (1.6 if 28 <= b < 36 or 64 <= b < 72 else 1.0) for b in range(96)])
+            for eid, _, _, _, tm, _ in edges
+        )
+        profiles = graph_state.get_edge_profiles()
+        nodes = args.size * args.size
+        pairs = [(rng.randrange(nodes), rng.randrange(nodes)) for _ in range(args.queries)]
+
+        start = time.perf_counter()
+        for s, t in pairs:
+            find_route(s, t, mode='time')
+        static = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for s, t in pairs:
+            find_route_td(s, t, '2024-05-06T07:45', profiles=profiles)
+        dependent = time.perf_counter() - start
+
+    print(f'grid {args.size}x{args.size}, {len(edges)} edges, {args.queries} queries')
+    print(f'static:         {static / args.queries * 1000:.2f} ms/query')
+    print(f'time-dependent: {dependent / args.queries * 1000:.2f} ms/query ({dependent / static:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
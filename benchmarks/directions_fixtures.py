@@ -0,0 +1,59 @@
+"""Synthetic Directions API responses for benchmarks and tests."""
+import logging
+import random
+
+logger = logging.getLogger(__name__)
+
+
+def make_directions(legs=25, steps=200, routes=3, seed=1, toll_every=97):
+    rng = random.Random(seed)
+    result = []
+    for r in range(routes):
+        raw_legs = []
+        for l in range(legs):
+            leg_steps = []
+            for s in range(steps):
+                toll = (s + l) % toll_every == 0
+                leg_steps.append({
+                    'distance': {'text': '1 km', 'value': rng.randint(50, 2000)},
+                    'duration': {'text': '1 min', 'value': rng.randint(10, 300)},
+                    'html_instructions': 'Continue onto <b>D1</b>' + (' (Toll road)' if toll else ''),
+                    'start_location': {'lat': 50.0 + s * 1e-3, 'lng': 14.0 + s * 1e-3},
+                    'end_location': {'lat': 50.0 + (s + 1) * 1e-3, 'lng': 14.0 + (s + 1) * 1e-3},
+                    'polyline': {'points': 'a~l~Fjk~uOwHJy@P'},
+                    'travel_mode': 'DRIVING',
+                })
+            distance = sum(step['distance']['value'] for step in leg_steps)
+            duration = sum(step['duration']['value'] for step in leg_steps)
+            raw_legs.append({
+                'start_address': f'Stop {l}',
+                'end_address': f'Stop {l + 1}',
+                'start_location': {'lat': 50.0 + l, 'lng': 14.0 + l},
+                'end_location': {'lat': 51.0 + l, 'lng': 15.0 + l},
+                'distance': {'text': f'{distance / 1000:.1f} km', 'value': distance},
+                'duration': {'text': f'{duration // 60} mins', 'value': duration},
+                'duration_in_traffic': {'text': f'{duration // 50} mins', 'value': int(duration * 1.2) + r},
+                'steps': leg_steps,
+            })
+        result.append({
+            'summary': f'Route {r}',
+            'legs': raw_legs,
+            'overview_polyline': {'points': '_p~iF~ps|U_ulLnnqC_mqNvxq`@'},
+            'bounds': {'northeast': {'lat': 60.0, 'lng': 40.0}, 'southwest': {'lat': 50.0, 'lng': 14.0}},
+        })
+    return {'status': 'OK', 'routes': result, 'geocoded_waypoints': []}
+
+
+class FakeDirectionsClient:
+    """Stand-in for GoogleMapsClient that answers ``plan_route`` with ``make_directions``."""
+
+    def __init__(self, legs=2, steps=4, routes=2):
+        self.legs = legs
+        self.steps = steps
+        self.routes = routes
+        self.calls = 0
+
+    async def plan_route(self, origin=None, destination=None, **kwargs):
+        self.calls += 1
+        logger.info('Fake directions request %s -> %s', origin, destination)
+        return make_directions(legs=self.legs, steps=self.steps, routes=self.routes)
@@ -0,0 +1,128 @@
+"""Synthetic road graphs for benchmarks, written as places.db-style databases.
+
+Three families, all with roughly ``nodes`` places:
+
+- ``grid``: square lattice with random edge costs.
+- ``geometric``: random points joined to their nearest neighbours.
+- ``road``: a lattice of local roads with some missing links and diagonal
+  shortcuts, overlaid with a sparse, faster and partly tolled highway grid.
+
+Distances are kilometres and times minutes, like the real data.
+"""
+import math
+import os
+import random
+import sqlite3
+
+from init_db import INDEXES, create_schema
+
+KINDS = ('grid', 'geometric', 'road')
+
+
+def grid(nodes, rng):
+    side = max(2, int(round(math.sqrt(nodes))))
+    places = ((r * side + c, f'Grid {r}-{c}', c, r) for r in range(side) for c in range(side))
+
+    def edges():
+        for r in range(side):
+            for c in range(side):
+                node = r * side + c
+                if c + 1 < side:
+                    d = rng.uniform(0.5, 1.5)
+                    yield node, node + 1, d, d / rng.uniform(30, 70) * 60, 0
+                if r + 1 < side:
+                    d = rng.uniform(0.5, 1.5)
+                    yield node, node + side, d, d / rng.uniform(30, 70) * 60, 0
+    return places, edges()
+
+
+def geometric(nodes, rng, neighbours=3):
+    # Unit density: about one place per square kilometre
+    side = math.sqrt(nodes)
+    points = [(rng.uniform(0, side), rng.uniform(0, side)) for _ in range(nodes)]
+    cells = {}
+    for i, (x, y) in enumerate(points):
+        cells.setdefault((int(x), int(y)), []).append(i)
+    places = ((i, f'Node {i}', x, y) for i, (x, y) in enumerate(points))
+
+    def edges():
+        seen = set()
+        for i, (x, y) in enumerate(points):
+            cx, cy = int(x), int(y)
+            radius = 1
+            candidates = []
+            # Widen the search until enough neighbours are found
+            while len(candidates) < neighbours and radius <= side + 1:
+                candidates = [j for dx in range(-radius, radius + 1) for dy in range(-radius, radius + 1)
+                              for j in cells.get((cx + dx, cy + dy), ()) if j != i]
+                radius += 1
+            candidates.sort(key=lambda j: (points[j][0] - x) ** 2 + (points[j][1] - y) ** 2)
+            for j in candidates[:neighbours]:
+                key = (min(i, j), max(i, j))
+                if key in seen:
+                    continue
+                seen.add(key)
+                d = math.hypot(points[j][0] - x, points[j][1] - y) * 1.2 + 0.05
+                yield i, j, d, d / rng.uniform(30, 60) * 60, 0
+    return places, edges()
+
+
+def road(nodes, rng, highway_every=10):
+    side = max(2, int(round(math.sqrt(nodes))))
+    places = ((r * side + c, f'Town {r}-{c}', c, r) for r in range(side) for c in range(side))
+
+    def edges():
+        for r in range(side):
+            for c in range(side):
+                node = r * side + c
+                for dr, dc in ((0, 1), (1, 0)):
+                    if r + dr >= side or c + dc >= side:
+                        continue
+                    other = (r + dr) * side + c + dc
+                    on_highway = (r % highway_every == 0 and dr == 0) or (c % highway_every == 0 and dc == 0)
+                    if on_highway:
+                        d = rng.uniform(0.9, 1.1)
+                        yield node, other, d, d / 110 * 60, int(rng.random() < 0.3)
+                    elif rng.random() > 0.1:
+                        d = rng.uniform(0.8, 1.6)
+                        yield node, other, d, d / rng.uniform(30, 50) * 60, 0
+                if r + 1 < side and c + 1 < side and rng.random() < 0.05:
+                    d = rng.uniform(1.3, 1.8)
+                    yield node, node + side + 1, d, d / 40 * 60, 0
+    return places, edges()
+
+
+GENERATORS = {'grid': grid, 'geometric': geometric, 'road': road}
+
+
+def build_db(path, kind, nodes, seed=1):
+    """Write a graph database; returns the number of places."""
+    rng = random.Random(seed)
+    places, edges = GENERATORS[kind](nodes, rng)
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        create_schema(conn)
+        conn.execute('BEGIN')
+        conn.executemany('INSERT INTO places VALUES (?, ?, ?, ?)', places)
+        conn.executemany('INSERT INTO edges (from_id, to_id, distance, time, toll) VALUES (?, ?, ?, ?, ?)', edges)
+        conn.execute('COMMIT')
+        for statement in INDEXES.values():
+            conn.execute(statement)
+        return conn.execute('SELECT COUNT(*) FROM places').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def cached_db(cache_dir, kind, nodes, seed=1):
+    """Path of a generated graph, building it only if it is not cached yet."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f'{kind}-{nodes}-{seed}.db')
+    if not os.path.exists(path):
+        tmp = path + '.tmp'
+        build_db(tmp, kind, nodes, seed)
+        os.replace(tmp, path)
+    return path
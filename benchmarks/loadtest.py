@@ -0,0 +1,347 @@
+"""End-to-end load test of the HTTP API.
+
+Starts the app (``app.create_app`` under the threaded Werkzeug server) in a
+subprocess pointed at ``fake_directions.py``, drives it with a scenario of
+weighted requests and prints a JSON report: throughput, latency percentiles
+and error rate per request type, plus CPU and peak RSS of the app process.
+Reports can be saved with ``--output`` and compared across commits.
+
+Closed loop: ``--concurrency`` clients send requests back to back.
+Open loop: requests arrive as a Poisson process at ``--rate`` per second
+regardless of how fast the server answers; latency is measured from the
+scheduled arrival, so queueing delay is included.
+
+Payload strings of the form ``"{name}"`` are filled in per request: with a
+random entry of the scenario's ``vars[name]`` list, or for ``{departure}``
+with a random departure time (to the second) in the next week. Distinct
+payloads keep the directions caches from answering most of the requests.
+
+Usage:
+    python -m benchmarks.loadtest benchmarks/scenarios/mixed.json --concurrency 16 --duration 20
+    python -m benchmarks.loadtest benchmarks/scenarios/mixed.json --mode open --rate 50
+    python -m benchmarks.loadtest scenario.json --url http://host:5000   (existing deployment)
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_SERVER = ('import sys; from app import create_app; '
+              'create_app().run(host="127.0.0.1", port=int(sys.argv[1]), threaded=True, debug=False)')
+
+
+PLACEHOLDER = re.compile(r'^\{(\w+)\}$')
+BUILTIN_VARS = ('departure',)
+
+
+def _placeholders(payload):
+    if isinstance(payload, dict):
+        for value in payload.values():
+            yield from _placeholders(value)
+    elif isinstance(payload, list):
+        for value in payload:
+            yield from _placeholders(value)
+    elif isinstance(payload, str):
+        match = PLACEHOLDER.match(payload)
+        if match:
+            yield match.group(1)
+
+
+def load_scenario(path):
+    with open(path, encoding='utf-8') as f:
+        scenario = json.load(f)
+    requests = scenario.get('requests')
+    if not isinstance(requests, list) or not requests:
+        raise ValueError('Scenario must contain a non-empty "requests" list')
+    variables = scenario.setdefault('vars', {})
+    for entry in requests:
+        entry.setdefault('name', entry['path'])
+        entry.setdefault('method', 'GET')
+        entry.setdefault('weight', 1)
+        # A list of payloads is sampled per request
+        for key in ('json', 'params'):
+            if key in entry and not isinstance(entry[key], list):
+                entry[key] = [entry[key]]
+            for name in _placeholders(entry.get(key, [])):
+                if name not in BUILTIN_VARS and not variables.get(name):
+                    raise ValueError(f'Unknown placeholder {{{name}}} in request "{entry["name"]}"')
+    return scenario
+
+
+def render(payload, rng, variables):
+    """Copy of ``payload`` with ``"{name}"`` strings replaced by values drawn from ``rng``."""
+    if isinstance(payload, dict):
+        return {key: render(value, rng, variables) for key, value in payload.items()}
+    if isinstance(payload, list):
+        return [render(value, rng, variables) for value in payload]
+    match = PLACEHOLDER.match(payload) if isinstance(payload, str) else None
+    if match is None:
+        return payload
+    name = match.group(1)
+    if name == 'departure' and name not in variables:
+        departure = time.time() + rng.randrange(3600, 7 * 86400)
+        return time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(departure))
+    return rng.choice(variables[name])
+
+
+def percentile(sorted_values, q):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(q / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples, elapsed):
+    """samples: (latency_seconds, ok, status) tuples."""
+    latencies = sorted(latency for latency, _, _ in samples)
+    errors = sum(1 for _, ok, _ in samples if not ok)
+    statuses = {}
+    for _, _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        'requests': len(samples),
+        'rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'latency_ms': {
+            'mean': ms(sum(latencies) / len(latencies)) if latencies else None,
+            'p50': ms(percentile(latencies, 50)),
+            'p95': ms(percentile(latencies, 95)),
+            'p99': ms(percentile(latencies, 99)),
+            'max': ms(latencies[-1]) if latencies else None,
+        },
+        'status': statuses,
+    }
+
+
+class ProcessMonitor:
+    """Samples CPU time and RSS of a process from /proc (Linux only)."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.peak_rss = 0
+        self.start_cpu = None
+        self.ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+    def available(self):
+        return self.pid is not None and os.path.exists(f'/proc/{self.pid}/stat')
+
+    def cpu_seconds(self):
+        with open(f'/proc/{self.pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        # utime and stime are fields 14 and 15 of the full line
+        return (int(fields[11]) + int(fields[12])) / self.ticks
+
+    def rss_bytes(self):
+        with open(f'/proc/{self.pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def begin(self):
+        if self.available():
+            self.start_cpu = self.cpu_seconds()
+
+    async def sample(self, interval=0.25):
+        while self.available():
+            self.peak_rss = max(self.peak_rss, self.rss_bytes())
+            await asyncio.sleep(interval)
+
+    def report(self, elapsed):
+        if self.start_cpu is None or not self.available():
+            return None
+        cpu = self.cpu_seconds() - self.start_cpu
+        return {
+            'pid': self.pid,
+            'cpu_seconds': round(cpu, 3),
+            'cpu_percent': round(100 * cpu / elapsed, 1) if elapsed else None,
+            'peak_rss_mb': round(self.peak_rss / 2 ** 20, 1),
+        }
+
+
+async def run_load(base_url, scenario, mode='closed', concurrency=8, rate=10.0, duration=10.0,
+                   warmup=2.0, timeout=30.0, seed=1, monitor=None):
+    rng = random.Random(seed)
+    entries = scenario['requests']
+    variables = scenario.get('vars', {})
+    weights = [entry['weight'] for entry in entries]
+    samples = {entry['name']: [] for entry in entries}
+    state = {'recording': False}
+
+    async def send(session, scheduled=None):
+        entry = rng.choices(entries, weights)[0]
+        kwargs = {}
+        for key in ('json', 'params'):
+            if key in entry:
+                kwargs[key] = render(rng.choice(entry[key]), rng, variables)
+        started = scheduled if scheduled is not None else time.perf_counter()
+        try:
+            async with session.request(entry['method'], base_url + entry['path'], **kwargs) as response:
+                await response.read()
+                status, ok = response.status, response.status < 400
+        except asyncio.TimeoutError:
+            status, ok = 'timeout', False
+        except aiohttp.ClientError as e:
+            status, ok = type(e).__name__, False
+        if state['recording']:
+            samples[entry['name']].append((time.perf_counter() - started, ok, status))
+
+    connector = aiohttp.TCPConnector(limit=0)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        end = time.perf_counter() + warmup + duration
+
+        async def recorder():
+            # Samples only count after the warm-up period
+            await asyncio.sleep(warmup)
+            state['recording'] = True
+            if monitor is not None:
+                monitor.begin()
+            return time.perf_counter()
+
+        recording = asyncio.ensure_future(recorder())
+        sampler = asyncio.ensure_future(monitor.sample()) if monitor is not None else None
+        if mode == 'closed':
+            async def client():
+                while time.perf_counter() < end:
+                    await send(session)
+            await asyncio.gather(*(client() for _ in range(concurrency)))
+        else:
+            tasks = set()
+            next_arrival = time.perf_counter()
+            while next_arrival < end:
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                task = asyncio.ensure_future(send(session, scheduled=next_arrival))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                next_arrival += rng.expovariate(rate)
+            if tasks:
+                await asyncio.wait(tasks)
+        began = await recording
+        elapsed = time.perf_counter() - began
+        if sampler is not None:
+            sampler.cancel()
+
+    every = [sample for entry_samples in samples.values() for sample in entry_samples]
+    report = {
+        'scenario': scenario.get('name'),
+        'mode': mode,
+        'concurrency': concurrency if mode == 'closed' else None,
+        'rate': rate if mode == 'open' else None,
+        'duration': round(elapsed, 2),
+        'total': summarize(every, elapsed),
+        'endpoints': {name: summarize(entry_samples, elapsed) for name, entry_samples in samples.items()},
+    }
+    if monitor is not None:
+        report['server'] = monitor.report(elapsed)
+    return report
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url, process, timeout=30.0):
+    import urllib.request
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{url} exited with code {process.returncode}')
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'{url} did not start within {timeout} s')
+
+
+def start_stack(latency_ms, error_rate):
+    """Fake Google server plus the app, each in a subprocess. Returns (processes, app_url, app_pid)."""
+    fake_port, app_port = free_port(), free_port()
+    fake = subprocess.Popen([sys.executable, 'fake_directions.py', '--port', str(fake_port),
+                             '--latency-ms', str(latency_ms), '--error-rate', str(error_rate)],
+                            cwd=ROOT, stdout=subprocess.DEVNULL)
+    env = dict(os.environ,
+               GOOGLE_MAPS_BASE_URL=f'http://127.0.0.1:{fake_port}/maps/api',
+               GOOGLE_MAPS_API_KEY=os.environ.get('GOOGLE_MAPS_API_KEY') or 'loadtest',
+               DIRECTIONS_MODE='live', FLASK_DEBUG='0', FLASK_ENV='production')
+    app = subprocess.Popen([sys.executable, '-c', APP_SERVER, str(app_port)], cwd=ROOT, env=env,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    processes = [app, fake]
+    try:
+        wait_until_up(f'http://127.0.0.1:{fake_port}/maps/api/geocode/json?address=x', fake)
+        wait_until_up(f'http://127.0.0.1:{app_port}/search?q=', app)
+    except Exception:
+        stop_stack(processes)
+        raise
+    return processes, f'http://127.0.0.1:{app_port}', app.pid
+
+
+def stop_stack(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='HTTP load test against the app and a fake Google API')
+    parser.add_argument('scenario', help='scenario JSON file (see benchmarks/scenarios)')
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed')
+    parser.add_argument('--concurrency', type=int, default=8, help='clients in closed-loop mode')
+    parser.add_argument('--rate', type=float, default=20.0, help='requests per second in open-loop mode')
+    parser.add_argument('--duration', type=float, default=10.0, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=2.0, help='seconds before measuring')
+    parser.add_argument('--timeout', type=float, default=30.0, help='per-request timeout')
+    parser.add_argument('--url', help='load an existing deployment instead of starting one')
+    parser.add_argument('--pid', type=int, help='app process to monitor when using --url')
+    parser.add_argument('--fake-latency-ms', type=float, default=100.0, help='median fake Google latency')
+    parser.add_argument('--fake-error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    args = parser.parse_args(argv)
+
+    scenario = load_scenario(args.scenario)
+    processes = []
+    if args.url:
+        url, pid = args.url.rstrip('/'), args.pid
+    else:
+        processes, url, pid = start_stack(args.fake_latency_ms, args.fake_error_rate)
+    try:
+        report = asyncio.run(run_load(url, scenario, mode=args.mode, concurrency=args.concurrency,
+                                      rate=args.rate, duration=args.duration, warmup=args.warmup,
+                                      timeout=args.timeout, seed=args.seed,
+                                      monitor=ProcessMonitor(pid) if pid else None))
+    finally:
+        stop_stack(processes)
+    report['url'] = url
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+"""Micro-benchmarks for routing, database and /route response hot paths.
+
+Each benchmark is timed in repeats of an auto-ranged number of calls and
+reported as the median (and best) time per call. Results can be saved as a
+baseline and later runs compared against it; the comparison lists every
+benchmark that got slower than the threshold and exits non-zero.
+
+Usage:
+    python -m benchmarks.suite run [--sizes 1000,10000] [--graphs grid,road] [--filter find_route]
+                                   [--output results.json] [--save-baseline NAME] [--baseline FILE]
+    python -m benchmarks.suite compare results.json --baseline benchmarks/baselines/NAME.json [--threshold 0.15]
+
+Generated graphs are cached in --cache-dir; sizes up to 1,000,000 nodes work
+but take up to about a minute per graph to generate the first time.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import db
+import graph_state
+from config import Config
+from route_cache import route_cache
+from benchmarks.directions_fixtures import make_directions
+from benchmarks.graphs import KINDS, cached_db
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+QUERY_PAIRS = 16
+
+
+def measure(fn, repeat=5, min_time=0.2):
+    """(median, best) seconds per call of ``fn`` over ``repeat`` timed rounds."""
+    fn()  # warm-up
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / repeat or number >= 1 << 20:
+            break
+        number *= 2
+    rounds = [elapsed / number]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - started) / number)
+    return statistics.median(rounds), min(rounds), number
+
+
+def use_database(path):
+    db.DB_PATH = Config.DB_PATH = path
+    Config.GRAPH_SNAPSHOT_PATH = ''
+    graph_state.reset()
+    route_cache.clear()
+
+
+def graph_benchmarks(kind, nodes, path):
+    from algorithms import find_route
+
+    use_database(path)
+    conn = db.get_connection()
+    ids = [row[0] for row in conn.execute('SELECT id FROM places')]
+    conn.close()
+    rng = random.Random(7)
+    # Every round routes the same fixed pairs, so rounds are comparable
+    pairs = [(rng.choice(ids), rng.choice(ids)) for _ in range(QUERY_PAIRS)]
+    label = f'{kind}-{nodes}'
+
+    def queries(mode, use_cache):
+        def run():
+            for start, end in pairs:
+                find_route(start, end, mode=mode, use_cache=use_cache)
+        return run
+
+    yield f'graph_load[{label}]', graph_state.load_snapshot, 1
+    graph_state.get_snapshot()
+    for mode in ('distance', 'time'):
+        yield f'find_route[{label},{mode}]', queries(mode, False), len(pairs)
+    yield f'find_route_cached[{label}]', queries('time', True), len(pairs)
+    yield f'search_places[{label}]', lambda: db.search_places('1-2'), 1
+    if len(ids) <= 200000:
+        # Full-table reads; skipped for the largest graphs where they dominate the run
+        yield f'get_places[{label}]', db.get_places, 1
+        yield f'get_edges[{label}]', db.get_edges, 1
+
+
+def response_benchmarks(directions):
+    from business.route_planner import RoutePlanner
+    from routes import build_route_response
+    from app import app
+
+    planner = RoutePlanner(google_maps_client=object())
+    route = planner._extract_fastest_route(directions)
+    response = build_route_response(route, 'Praha', 1900000000)
+    yield 'extract_fastest_route', lambda: planner._extract_fastest_route(directions), 1
+    yield 'extract_shortest_route', lambda: planner._extract_shortest_route(directions), 1
+    yield 'build_route_response', lambda: build_route_response(route, 'Praha', 1900000000), 1
+    yield 'route_response_json', lambda: app.json.dumps(response), 1
+
+
+def load_directions(path):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    # Accept raw responses as well as DirectionsRecorder files
+    return data.get('response', data)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(args):
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    kinds = [kind for kind in args.graphs.split(',') if kind]
+    for kind in kinds:
+        if kind not in KINDS:
+            raise SystemExit(f'Unknown graph kind: {kind} (choose from {", ".join(KINDS)})')
+    directions = load_directions(args.directions) if args.directions else make_directions(legs=25, steps=200, routes=3)
+
+    results = {}
+
+    def record(name, fn, ops):
+        if args.filter and args.filter not in name:
+            return
+        median, best, number = measure(fn, repeat=args.repeat, min_time=args.min_time)
+        # Times are per operation (one query for the routing benchmarks)
+        median, best = median / ops, best / ops
+        results[name] = {'median': median, 'best': best, 'calls': number * ops}
+        print(f'{name:<48} {median * 1e3:12.4f} ms  (best {best * 1e3:.4f} ms, {number * ops} calls/round)',
+              file=sys.stderr)
+
+    for name, fn, ops in response_benchmarks(directions):
+        record(name, fn, ops)
+    original = db.DB_PATH
+    try:
+        for kind in kinds:
+            for nodes in sizes:
+                path = cached_db(args.cache_dir, kind, nodes)
+                for name, fn, ops in graph_benchmarks(kind, nodes, path):
+                    record(name, fn, ops)
+    finally:
+        use_database(original)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        write(args.output, output)
+    if args.save_baseline:
+        write(os.path.join(BASELINE_DIR, f'{args.save_baseline}.json'), output)
+    if not args.output and not args.save_baseline:
+        print(output)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            return compare_reports(report, json.load(f), args.threshold)
+    return 0
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text + '\n')
+    print(f'saved {path}', file=sys.stderr)
+
+
+def compare_reports(current, baseline, threshold):
+    """Print a comparison table; returns 1 if anything regressed beyond ``threshold``."""
+    regressions = []
+    print(f'{"benchmark":<48} {"baseline ms":>12} {"current ms":>12} {"change":>8}')
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print(f'{name:<48} {"-":>12} {result["median"] * 1e3:12.4f} {"new":>8}')
+            continue
+        ratio = result['median'] / before['median'] if before['median'] else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = '  faster'
+        print(f'{name:<48} {before["median"] * 1e3:12.4f} {result["median"] * 1e3:12.4f} '
+              f'{(ratio - 1) * 100:+7.1f}%{flag}')
+    missing = sorted(set(baseline['results']) - set(current['results']))
+    if missing:
+        print(f'not run: {", ".join(missing)}')
+    if regressions:
+        print(f'{len(regressions)} regression(s) beyond {threshold:.0%}: {", ".join(regressions)}')
+        return 1
+    print(f'no regressions beyond {threshold:.0%}')
+    return 0
+
+
+def compare(args):
+    with open(args.results, encoding='utf-8') as f:
+        current = json.load(f)
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    return compare_reports(current, baseline, args.threshold)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Micro-benchmarks with baselines')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = sub.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--sizes', default='1000,10000', help='graph sizes in nodes (up to 1000000)')
+    run_parser.add_argument('--graphs', default=','.join(KINDS), help=f'graph kinds: {", ".join(KINDS)}')
+    run_parser.add_argument('--filter', help='only benchmarks whose name contains this text')
+    run_parser.add_argument('--directions', help='recorded Directions response for the response benchmarks')
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('--min-time', type=float, default=0.2, help='seconds per benchmark (approx.)')
+    run_parser.add_argument('--cache-dir', default=os.path.join(tempfile.gettempdir(), 'route-planner-bench'))
+    run_parser.add_argument('--output', help='write results to this file')
+    run_parser.add_argument('--save-baseline', metavar='NAME', help='save results as benchmarks/baselines/NAME.json')
+    run_parser.add_argument('--baseline', help='compare the results against this file')
+    run_parser.add_argument('--threshold', type=float, default=0.15, help='allowed slowdown (0.15 = 15%%)')
+    run_parser.set_defaults(func=run)
+
+    compare_parser = sub.add_parser('compare', help='compare saved results with a baseline')
+    compare_parser.add_argument('results')
+    compare_parser.add_argument('--baseline', required=True)
+    compare_parser.add_argument('--threshold', type=float, default=0.15, help='allowed slowdown (0.15 = 15%%)')
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Streaming import of stop lists from Excel workbooks.
+
+Workbooks are read with openpyxl's read-only mode, which parses the sheet
+XML row by row instead of loading it, and geocoding runs over a bounded
+window of concurrent requests. Every row is returned, so a round trip that
+ends where it started keeps its last stop. Repeats inside the window share
+one request and later ones are answered by the geocoder's cache. Memory
+therefore depends on the window size, not on the size of the sheet.
+"""
+import asyncio
+import re
+from collections import deque
+
+from config import Config
+from utils import event_loop
+
+# Header names recognised as the address column (compared case-insensitively)
+ADDRESS_COLUMNS = ('address', 'adresa', 'místo', 'location', 'lokalita')
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_address(value):
+    """Trimmed address with collapsed whitespace, or None for empty cells."""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    address = _WHITESPACE.sub(' ', str(value)).strip().strip(',').strip()
+    return address or None
+
+
+def detect_address_column(header):
+    """Index of the address column in a header row, else the first non-empty column."""
+    names = [str(cell).strip().casefold() if cell is not None else '' for cell in header]
+    for candidate in ADDRESS_COLUMNS:
+        if candidate in names:
+            return names.index(candidate)
+    for i, name in enumerate(names):
+        if name:
+            return i
+    return 0
+
+
+class ExcelImport:
+    """Reads the addresses of one sheet of a workbook, in sheet order.
+
+    ``stats`` is filled in while ``addresses()`` is consumed.
+    """
+
+    def __init__(self, file, sheet=None, column=None, max_rows=None):
+        self.file = file
+        self.sheet = sheet
+        self.column = column
+        self.max_rows = Config.IMPORT_MAX_ROWS if max_rows is None else max_rows
+        self.stats = {'column': None, 'rows': 0, 'empty': 0, 'addresses': 0}
+
+    def addresses(self):
+        """Yield (row_number, address) for each non-empty row, repeats included."""
+        # openpyxl (and numpy, which it imports when installed) is loaded on first use
+        from openpyxl import load_workbook
+        workbook = load_workbook(self.file, read_only=True, data_only=True)
+        try:
+            if self.sheet is not None:
+                if self.sheet not in workbook.sheetnames:
+                    raise ValueError(f'Sheet not found: {self.sheet}')
+                worksheet = workbook[self.sheet]
+            else:
+                worksheet = workbook.worksheets[0]
+            rows = worksheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            index = self._column_index(header)
+            self.stats['column'] = header[index] if index < len(header) else None
+            for row_number, row in enumerate(rows, start=2):
+                if self.stats['rows'] >= self.max_rows:
+                    raise ValueError(f'Too many rows (max {self.max_rows})')
+                self.stats['rows'] += 1
+                address = normalize_address(row[index] if index < len(row) else None)
+                if address is None:
+                    self.stats['empty'] += 1
+                    continue
+                self.stats['addresses'] += 1
+                yield row_number, address
+        finally:
+            workbook.close()
+
+    def _column_index(self, header):
+        if self.column is None:
+            return detect_address_column(header)
+        if isinstance(self.column, int):
+            return self.column
+        names = [str(cell).strip().casefold() if cell is not None else '' for cell in header]
+        name = str(self.column).strip().casefold()
+        if name not in names:
+            raise ValueError(f'Column not found: {self.column}')
+        return names.index(name)
+
+
+async def geocode_stops(addresses, geocoder, concurrency=None, session=None):
+    """Geocode (row, address) pairs and yield stop dicts in input order.
+
+    At most ``concurrency`` requests are in flight and at most twice that
+    many results are buffered, so the input iterator is consumed lazily.
+    Rows in the window repeating an address (case-insensitively) share one
+    request; only the window's lookups are kept.
+    """
+    concurrency = concurrency or Config.IMPORT_GEOCODE_CONCURRENCY
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def lookup(session, address):
+        try:
+            async with semaphore:
+                result = await geocoder.geocode(address, session)
+        except Exception as e:
+            return {'error': str(e)}
+        if result is None:
+            return {'error': 'Address not found'}
+        return result
+
+    async def run(session):
+        # key -> [task, rows in the window using it]
+        lookups = {}
+        window = deque()
+
+        async def pop():
+            row, address, key = window.popleft()
+            entry = lookups[key]
+            entry[1] -= 1
+            if not entry[1]:
+                del lookups[key]
+            return {'row': row, 'address': address, **await entry[0]}
+
+        try:
+            for row, address in addresses:
+                key = address.casefold()
+                entry = lookups.get(key)
+                if entry is None:
+                    entry = lookups[key] = [asyncio.ensure_future(lookup(session, address)), 0]
+                entry[1] += 1
+                window.append((row, address, key))
+                if len(window) >= 2 * concurrency:
+                    yield await pop()
+            while window:
+                yield await pop()
+        finally:
+            # Consumer went away (e.g. client disconnected): drop pending lookups
+            for task, _ in lookups.values():
+                task.cancel()
+
+    if session is not None:
+        async for stop in run(session):
+            yield stop
+        return
+    import aiohttp
+    async with aiohttp.ClientSession() as session:
+        async for stop in run(session):
+            yield stop
+
+
+def iter_async(agen):
+    """Drive an async generator from synchronous code (e.g. a streamed Flask
+    response) on the shared event loop."""
+    try:
+        while True:
+            try:
+                yield event_loop.submit(agen.__anext__()).result()
+            except StopAsyncIteration:
+                break
+    finally:
+        event_loop.submit(agen.aclose()).result()
@@ -0,0 +1,109 @@
+"""Directions-shaped routes computed on the local places/edges graph.
+
+Used by ``RoutePlanner`` when the Directions API is failing or its circuit
+is open. Addresses are matched to places by name (the whole address or one
+of its comma-separated parts, case-insensitively) and each leg is routed
+with ``find_route``. The result mimics a Directions response with one route,
+so the normal extraction and ``/route`` serialisation apply unchanged.
+Edge distances are taken as kilometres and times as minutes, and place
+``x``/``y`` as longitude/latitude.
+"""
+from db import get_places_by_id, search_places
+from routing_pool import get_pool
+
+
+def encode_polyline(points):
+    """Google encoded polyline for a sequence of (lat, lng) points."""
+    chunks = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        lat, lng = int(round(lat * 1e5)), int(round(lng * 1e5))
+        for delta in (lat - prev_lat, lng - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+        prev_lat, prev_lng = lat, lng
+    return ''.join(chunks)
+
+
+def resolve_place(address):
+    """ID of the place named like the address (or one of its parts), else None."""
+    candidates = [address] + address.split(',')
+    for name in candidates:
+        name = name.strip()
+        if not name:
+            continue
+        for place in search_places(name):
+            if place['name'].casefold() == name.casefold():
+                return place['id']
+    return None
+
+
+def _text_distance(meters):
+    return f"{meters / 1000:.1f} km"
+
+
+def _text_duration(seconds):
+    minutes = int(round(seconds / 60))
+    if minutes < 60:
+        return f"{minutes} mins"
+    return f"{minutes // 60} hours {minutes % 60} mins"
+
+
+def local_directions(addresses, mode='time', use_highways=True):
+    """Directions-like response for a stop list, or None when a stop cannot be
+    matched to a place or two consecutive stops are not connected."""
+    ids = []
+    for address in addresses:
+        place_id = resolve_place(address)
+        if place_id is None:
+            return None
+        ids.append(place_id)
+
+    pool = get_pool()
+    paths = []
+    for start, end in zip(ids, ids[1:]):
+        if start == end:
+            paths.append({'route': [start], 'distance': 0, 'time': 0, 'tolls': 0})
+            continue
+        path = pool.run('find_route', start, end, mode=mode, use_highways=use_highways)
+        if path is None:
+            return None
+        paths.append(path)
+
+    places = get_places_by_id(node for path in paths for node in path['route'])
+    legs = []
+    overview = []
+    for address_from, address_to, path in zip(addresses, addresses[1:], paths):
+        points = [(places[node]['y'], places[node]['x']) for node in path['route'] if node in places]
+        overview.extend(points if not overview else points[1:])
+        start, end = places[path['route'][0]], places[path['route'][-1]]
+        meters = int(round(path['distance'] * 1000))
+        seconds = int(round(path['time'] * 60))
+        toll = ' (toll road)' if path['tolls'] else ''
+        legs.append({
+            'start_address': address_from,
+            'end_address': address_to,
+            'start_location': {'lat': start['y'], 'lng': start['x']},
+            'end_location': {'lat': end['y'], 'lng': end['x']},
+            'distance': {'text': _text_distance(meters), 'value': meters},
+            'duration': {'text': _text_duration(seconds), 'value': seconds},
+            'steps': [{
+                'html_instructions': f"Drive to <b>{end['name']}</b> via the local road network{toll}",
+                'distance': {'text': _text_distance(meters), 'value': meters},
+                'duration': {'text': _text_duration(seconds), 'value': seconds},
+                'start_location': {'lat': start['y'], 'lng': start['x']},
+                'end_location': {'lat': end['y'], 'lng': end['x']},
+                'polyline': {'points': encode_polyline(points)},
+            }],
+        })
+    return {
+        'status': 'OK',
+        'routes': [{
+            'summary': 'Local road network',
+            'legs': legs,
+            'overview_polyline': {'points': encode_polyline(overview)},
+        }],
+    }
@@ -0,0 +1,202 @@
+"""Streaming export of planned routes to CSV, GPX and XLSX.
+
+Every exporter is a generator of output chunks that walks the routes (the
+``/route`` response objects) once per section, so the document is never
+held in memory as a whole. XLSX goes through openpyxl's write-only mode,
+which spools rows to temporary files; the finished workbook is then sent
+from a temporary file in fixed-size chunks.
+"""
+import csv
+import io
+import re
+import tempfile
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape, quoteattr
+
+
+CHUNK_SIZE = 64 * 1024
+GPX_POINTS_PER_CHUNK = 500
+
+STOP_COLUMNS = ('Route', 'Stop', 'Type', 'Address', 'Latitude', 'Longitude',
+                'Distance', 'Duration', 'Arrival Time')
+STEP_COLUMNS = ('Route', 'Leg', 'Step', 'Instruction', 'Distance (m)', 'Duration (s)')
+SUMMARY_COLUMNS = ('Route', 'Distance (km)', 'Duration (min)', 'Duration in Traffic (min)',
+                   'ETA', 'Tolls', 'Stops')
+
+_TAGS = re.compile(r'<[^>]+>')
+
+
+def decode_polyline(encoded):
+    """Yield (lat, lng) points of a Google encoded polyline.
+
+    Decoding stops at the first truncated or invalid value, so a damaged
+    polyline yields the points before the damage instead of raising in the
+    middle of a streamed export.
+    """
+    index = lat = lng = 0
+    length = len(encoded)
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                if index >= length:
+                    return
+                byte = ord(encoded[index]) - 63
+                if not 0 <= byte < 0x40:
+                    return
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        yield lat / 1e5, lng / 1e5
+
+
+def _stop_label(index):
+    # A..Z, then AA, AB, ... like spreadsheet columns
+    label = ''
+    index += 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        label = chr(65 + rest) + label
+    return label
+
+
+def _text(value):
+    if isinstance(value, dict):
+        return value.get('text', '')
+    return '' if value is None else value
+
+
+def _value(value):
+    if isinstance(value, dict):
+        return value.get('value', '')
+    return '' if value is None else value
+
+
+def _stop_rows(number, route):
+    for i, stop in enumerate(route.get('stops') or []):
+        if not isinstance(stop, dict):
+            continue
+        yield (number, _stop_label(i), stop.get('type', ''), stop.get('address') or '',
+               stop.get('lat', ''), stop.get('lng', ''), stop.get('distance') or '',
+               stop.get('duration') or '', stop.get('arrival_time') or '')
+
+
+def _step_rows(number, route):
+    for leg_index, leg in enumerate(route.get('legs') or [], start=1):
+        if not isinstance(leg, dict):
+            continue
+        for step_index, step in enumerate(leg.get('steps') or [], start=1):
+            if not isinstance(step, dict):
+                continue
+            instruction = _TAGS.sub(' ', step.get('html_instructions') or '')
+            yield (number, leg_index, step_index, ' '.join(instruction.split()),
+                   _value(step.get('distance')), _value(step.get('duration')))
+
+
+def _summary_row(number, route):
+    def minutes(seconds):
+        return round(seconds / 60, 1) if isinstance(seconds, (int, float)) else ''
+    return (number, route.get('distance', ''), minutes(route.get('duration')),
+            minutes(route.get('duration_in_traffic')), route.get('eta') or '',
+            'Yes' if route.get('tolls') else 'No', len(route.get('stops') or []))
+
+
+def _track_points(route):
+    # Step polylines are the full-resolution geometry; the overview is the fallback
+    found = False
+    for leg in route.get('legs') or []:
+        if not isinstance(leg, dict):
+            continue
+        for step in leg.get('steps') or []:
+            polyline = step.get('polyline') if isinstance(step, dict) else None
+            points = polyline.get('points') if isinstance(polyline, dict) else None
+            if points:
+                found = True
+                yield from decode_polyline(points)
+    if not found:
+        polyline = route.get('polyline')
+        if isinstance(polyline, dict):
+            polyline = polyline.get('points')
+        if isinstance(polyline, str):
+            yield from decode_polyline(polyline)
+
+
+def iter_csv(routes):
+    """One row per stop of every route."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(STOP_COLUMNS)
+    for number, route in enumerate(routes, start=1):
+        for row in _stop_rows(number, route):
+            writer.writerow(row)
+            if buffer.tell() >= CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_gpx(routes, name='Planned Route'):
+    """GPX 1.1 with every stop as a waypoint and each route as a track."""
+    now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<gpx version="1.1" creator="Route Planner" xmlns="http://www.topografix.com/GPX/1/1">\n'
+           f'  <metadata>\n    <name>{escape(name)}</name>\n    <time>{now}</time>\n  </metadata>\n')
+    # GPX requires all waypoints before the tracks
+    for number, route in enumerate(routes, start=1):
+        for stop_number, _, _, address, lat, lng, *_ in _stop_rows(number, route):
+            if lat == '' or lng == '' or lat is None or lng is None:
+                continue
+            label = f'Stop {stop_number}' if len(routes) == 1 else f'Route {number} Stop {stop_number}'
+            yield (f'  <wpt lat={quoteattr(str(lat))} lon={quoteattr(str(lng))}>\n'
+                   f'    <name>{escape(label)}</name>\n    <desc>{escape(str(address or label))}</desc>\n'
+                   '  </wpt>\n')
+    for number, route in enumerate(routes, start=1):
+        yield f'  <trk>\n    <name>{escape(name if len(routes) == 1 else f"Route {number}")}</name>\n    <trkseg>\n'
+        chunk = []
+        for lat, lng in _track_points(route):
+            chunk.append(f'      <trkpt lat="{lat:.5f}" lon="{lng:.5f}"/>\n')
+            if len(chunk) >= GPX_POINTS_PER_CHUNK:
+                yield ''.join(chunk)
+                chunk = []
+        chunk.append('    </trkseg>\n  </trk>\n')
+        yield ''.join(chunk)
+    yield '</gpx>\n'
+
+
+def iter_xlsx(routes):
+    """Workbook with Stops, Steps and Summary sheets."""
+    from openpyxl import Workbook  # heavy; imported on the first XLSX export
+    workbook = Workbook(write_only=True)
+    sheets = (
+        ('Stops', STOP_COLUMNS, lambda number, route: _stop_rows(number, route)),
+        ('Steps', STEP_COLUMNS, lambda number, route: _step_rows(number, route)),
+        ('Route Summary', SUMMARY_COLUMNS, lambda number, route: (_summary_row(number, route),)),
+    )
+    for title, columns, rows in sheets:
+        sheet = workbook.create_sheet(title)
+        sheet.append(columns)
+        for number, route in enumerate(routes, start=1):
+            for row in rows(number, route):
+                sheet.append(row)
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while True:
+            chunk = output.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+EXPORTERS = {
+    'csv': (iter_csv, 'text/csv'),
+    'gpx': (iter_gpx, 'application/gpx+xml'),
+    'xlsx': (iter_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
@@ -0,0 +1,208 @@
+"""Compact typed model of a Directions API route.
+
+``Route.from_directions`` walks the legs and steps of one route exactly once
+and computes every total, toll flag and stop field the rest of the
+application needs, so neither ``RoutePlanner`` nor ``/route`` has to loop over
+the raw JSON again.
+"""
+import time
+from dataclasses import dataclass
+
+from utils.metrics import ROUTE_STAGE_SECONDS
+
+
+def _value(field):
+    # Directions fields are {"text", "value"} dicts; tolerate bare numbers too
+    if isinstance(field, dict):
+        return field.get('value') or 0
+    if isinstance(field, (int, float)):
+        return field
+    return 0
+
+
+@dataclass
+class Step:
+    __slots__ = ('distance', 'duration', 'toll')
+    distance: int
+    duration: int
+    toll: bool
+
+
+@dataclass
+class Leg:
+    __slots__ = ('start_address', 'end_address', 'start_lat', 'start_lng', 'end_lat', 'end_lng',
+                 'distance', 'duration', 'duration_in_traffic', 'raw')
+    start_address: object
+    end_address: object
+    start_lat: object
+    start_lng: object
+    end_lat: object
+    end_lng: object
+    distance: int
+    duration: int
+    duration_in_traffic: object
+    raw: dict
+
+    @classmethod
+    def from_directions(cls, leg):
+        start = leg.get('start_location')
+        end = leg.get('end_location')
+        start = start if isinstance(start, dict) else {}
+        end = end if isinstance(end, dict) else {}
+        traffic = leg.get('duration_in_traffic')
+        return cls(
+            start_address=leg.get('start_address'),
+            end_address=leg.get('end_address'),
+            start_lat=start.get('lat'),
+            start_lng=start.get('lng'),
+            end_lat=end.get('lat'),
+            end_lng=end.get('lng'),
+            distance=_value(leg.get('distance')),
+            duration=_value(leg.get('duration')),
+            duration_in_traffic=_value(traffic) if traffic is not None else None,
+            raw=leg,
+        )
+
+    def has_toll(self):
+        # Stops at the first step mentioning a toll
+        for step in self.raw.get('steps') or ():
+            if isinstance(step, dict):
+                html = step.get('html_instructions')
+                if isinstance(html, str) and 'toll' in html.lower():
+                    return True
+        return False
+
+    def steps(self):
+        # Steps are only materialised on demand; most requests never need them
+        steps = []
+        for step in self.raw.get('steps') or ():
+            if isinstance(step, dict):
+                html = step.get('html_instructions')
+                steps.append(Step(_value(step.get('distance')), _value(step.get('duration')),
+                                  isinstance(html, str) and 'toll' in html.lower()))
+        return steps
+
+    @property
+    def effective_duration(self):
+        return self.duration_in_traffic if self.duration_in_traffic is not None else self.duration
+
+    def stop(self, stop_type):
+        # Stop entry for the end of this leg, with optional fields only when present
+        raw = self.raw
+        stop = {'address': self.end_address, 'type': stop_type}
+        for key in ('arrival_time', 'departure_time'):
+            field = raw.get(key)
+            if isinstance(field, dict):
+                stop[key] = field.get('text')
+                stop[key + '_value'] = field.get('value')
+        field = raw.get('distance')
+        if isinstance(field, dict):
+            stop['distance'] = field.get('text')
+            if 'value' in field:
+                stop['distance_value'] = field['value']
+        field = raw.get('duration')
+        if isinstance(field, dict):
+            stop['duration'] = field.get('text')
+            stop['duration_sec'] = field.get('value')
+        field = raw.get('duration_in_traffic')
+        if isinstance(field, dict):
+            stop['duration_in_traffic'] = field.get('text')
+            stop['duration_in_traffic_sec'] = field.get('value')
+        if isinstance(raw.get('end_location'), dict):
+            stop['lat'] = self.end_lat
+            stop['lng'] = self.end_lng
+        return stop
+
+
+@dataclass
+class Route:
+    __slots__ = ('legs', 'distance', 'duration', 'duration_in_traffic', 'selection_duration',
+                 'tolls', 'polyline', 'bounds', 'summary', 'raw_legs')
+    legs: list
+    distance: int
+    duration: int
+    duration_in_traffic: int
+    selection_duration: int
+    tolls: bool
+    polyline: object
+    bounds: object
+    summary: object
+    raw_legs: list
+
+    @classmethod
+    def from_directions(cls, route, scan_tolls=True):
+        raw_legs = route.get('legs', [])
+        if not isinstance(raw_legs, list):
+            raw_legs = []
+        legs = []
+        distance = duration = traffic = selection = 0
+        tolls = False
+        for raw in raw_legs:
+            if not isinstance(raw, dict):
+                continue
+            leg = Leg.from_directions(raw)
+            legs.append(leg)
+            distance += leg.distance
+            duration += leg.duration
+            if leg.duration_in_traffic is not None:
+                traffic += leg.duration_in_traffic
+            selection += leg.effective_duration
+            if scan_tolls and not tolls:
+                tolls = leg.has_toll()
+        polyline = route.get('overview_polyline')
+        if isinstance(polyline, dict):
+            polyline = polyline.get('points')
+        elif not isinstance(polyline, str):
+            polyline = None
+        bounds = route.get('bounds')
+        return cls(legs, distance, duration, traffic, selection, tolls, polyline,
+                   bounds if isinstance(bounds, dict) else None, route.get('summary'), raw_legs)
+
+    @property
+    def effective_duration(self):
+        # Traffic-aware total when Google returned traffic data, else the plain total
+        return self.duration_in_traffic if self.duration_in_traffic > 0 else self.duration
+
+    def stops(self, origin):
+        """Origin stop followed by one stop per leg end."""
+        first = self.raw_legs[0] if self.raw_legs else None
+        if isinstance(first, dict) and 'start_location' in first and 'start_address' in first:
+            departure = first.get('departure_time')
+            departure = departure if isinstance(departure, dict) else {}
+            leg = self.legs[0]
+            stops = [{
+                'address': leg.start_address,
+                'departure_time': departure.get('text'),
+                'departure_time_value': departure.get('value'),
+                'lat': leg.start_lat,
+                'lng': leg.start_lng,
+                'type': 'origin'
+            }]
+        else:
+            # Without start data the frontend geocodes the input origin
+            stops = [{'address': origin, 'type': 'origin'}]
+        last = len(self.legs) - 1
+        for i, leg in enumerate(self.legs):
+            stops.append(leg.stop('waypoint' if i < last else 'destination'))
+        return stops
+
+
+def select_route(directions_data, criterion='fastest'):
+    """Parse all alternatives once and return (raw route, Route) with the
+    shortest traffic-aware duration ('fastest') or distance ('shortest')."""
+    started = time.perf_counter()
+    raw_routes = [route for route in directions_data.get('routes', []) if isinstance(route, dict)]
+    if not raw_routes:
+        return None, None
+    # Step-level toll scanning is only worth doing for the route we return
+    models = [Route.from_directions(route, scan_tolls=False) for route in raw_routes]
+    if criterion == 'shortest':
+        best = min(range(len(models)), key=lambda i: models[i].distance)
+    else:
+        best = min(range(len(models)), key=lambda i: models[i].selection_duration)
+    model = models[best]
+    parsed = time.perf_counter()
+    ROUTE_STAGE_SECONDS.observe(parsed - started, 'parse')
+    model.tolls = any(leg.has_toll() for leg in model.legs)
+    ROUTE_STAGE_SECONDS.observe(time.perf_counter() - parsed, 'tolls')
+    return raw_routes[best], model
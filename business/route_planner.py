@@ -1,13 +1,51 @@
-from data.google_maps_client import GoogleMapsClient
+from data.google_maps_client import GoogleMapsClient, DirectionsAPIError
+from business.local_fallback import local_directions
+from business.route_model import Route, select_route
+from utils.ttl_cache import TTLCache
+from utils.swr_cache import SWRCache
+from utils.circuit_breaker import CircuitBreaker
+from utils.metrics import ROUTE_STAGE_SECONDS
+from config import Config
+import aiohttp
+import asyncio
+import logging
 import time
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 class RoutePlanner:
     def __init__(self, google_maps_client=None):
         self.google_maps_client = google_maps_client or GoogleMapsClient()
         self.last_route_data = None  # Cache for last route data
+        # Directions responses for explicit departure timestamps, reused across sweeps
+        self.directions_cache = TTLCache(maxsize=Config.DIRECTIONS_CACHE_SIZE, ttl=Config.DIRECTIONS_CACHE_TTL)
+        # Live-traffic ("now") directions, served stale-while-revalidate
+        self.live_cache = SWRCache(maxsize=Config.DIRECTIONS_SWR_SIZE, soft_ttl=Config.DIRECTIONS_SWR_SOFT_TTL,
+                                   hard_ttl=Config.DIRECTIONS_SWR_HARD_TTL)
+        # Guards the Directions API; while it is open routes come from the local graph
+        self.breaker = CircuitBreaker(
+            failure_rate=Config.BREAKER_FAILURE_RATE,
+            window=Config.BREAKER_WINDOW,
+            min_calls=Config.BREAKER_MIN_CALLS,
+            slow_call_seconds=Config.BREAKER_SLOW_CALL_SECONDS,
+            open_seconds=Config.BREAKER_OPEN_SECONDS,
+            timeout=Config.UPSTREAM_TIMEOUT_SECONDS,
+            is_failure=self._is_upstream_failure
+        )
+        self.local_fallback = Config.LOCAL_FALLBACK
+
+    TRAFFIC_MODELS = ("optimistic", "best_guess", "pessimistic")
+
+    @staticmethod
+    def _is_upstream_failure(error):
+        # Bad addresses and similar request errors say nothing about upstream health
+        return not (isinstance(error, DirectionsAPIError) and error.is_request_error)
 
-    async def plan_route(self, origin, destination, waypoints=None, mode="driving", departure_time=None, avoid=None, traffic_model=None, optimize_waypoints=False):
+    async def _directions(self, **request):
+        return await self.breaker.call(lambda: self.google_maps_client.plan_route(**request))
+
+    async def plan_route(self, origin, destination, waypoints=None, mode="driving", departure_time=None, avoid=None, traffic_model=None, optimize_waypoints=False, traffic_range=False):
         # Validate inputs
         if not origin or not destination:
             raise ValueError("Origin and destination must be provided")
@@ -31,28 +69,52 @@ class RoutePlanner:
         if not departure_time:
             departure_time = "now"  # Use current time for real-time traffic
 
-        print(f"Planning route: {origin} to {destination}, type: {route_type}, traffic model: {traffic_model}")
+        logger.debug("Planning route: %s to %s, type: %s, traffic model: %s", origin, destination, route_type,
+                     traffic_model)
             
         # Call Google Maps API via Data Layer
+        request = dict(
+            origin=origin,
+            destination=destination,
+            waypoints=waypoints,
+            mode=mode,
+            departure_time=departure_time,
+            avoid=avoid,
+            traffic_model=traffic_model,
+            optimize_waypoints=optimize_waypoints
+        )
+        range_data = None
+        cache_status = cache_age = None
+        started = time.perf_counter()
         try:
-            directions_data = await self.google_maps_client.plan_route(
-                origin=origin,
-                destination=destination,
-                waypoints=waypoints,
-                mode=mode,
-                departure_time=departure_time,
-                avoid=avoid,
-                traffic_model=traffic_model,
-                optimize_waypoints=optimize_waypoints
-            )
+            if traffic_range:
+                # All three traffic models at once; best_guess provides the route itself
+                directions_data, range_data = await self._fetch_traffic_models(request)
+            elif departure_time == "now" and self.live_cache.maxsize > 0:
+                key = (origin, destination, tuple(waypoints or ()), mode, avoid, traffic_model, optimize_waypoints)
+                directions_data, cache_status, cache_age = await self.live_cache.get(
+                    key, lambda: self._directions(**request))
+            else:
+                directions_data = await self._directions(**request)
             
             # Cache the raw directions data for potential reuse
             self.last_route_data = directions_data
             
         except Exception as e:
+            ROUTE_STAGE_SECONDS.observe(time.perf_counter() - started, "upstream")
+            if self.local_fallback and self._is_upstream_failure(e):
+                started = time.perf_counter()
+                route = await self._plan_local_route(origin, destination, waypoints, route_type, avoid)
+                ROUTE_STAGE_SECONDS.observe(time.perf_counter() - started, "local_fallback")
+                if route:
+                    route["degraded"] = {"source": "local_graph", "reason": str(e)}
+                    return route
             # Handle or propagate error
             raise RuntimeError(f"Failed to plan route: {e}") from e
 
+        extract_started = time.perf_counter()
+        ROUTE_STAGE_SECONDS.observe(extract_started - started, "upstream")
+
         # Process directions data
         if directions_data.get("status") != "OK":
             raise RuntimeError(f"Google Maps API error: {directions_data.get('status')}")
@@ -62,183 +124,189 @@ class RoutePlanner:
             route = self._extract_fastest_route(directions_data)
         else:  # shortest
             route = self._extract_shortest_route(directions_data)
-            
+        ROUTE_STAGE_SECONDS.observe(time.perf_counter() - extract_started, "extract")
+
+        if route and traffic_range:
+            with ROUTE_STAGE_SECONDS.time("traffic_range"):
+                route["traffic_range"] = self._merge_traffic_range(route["model"], range_data)
+        if route and cache_status is not None:
+            route["cache"] = {"status": cache_status, "age": round(cache_age, 1)}
+
         return route
 
+    async def _plan_local_route(self, origin, destination, waypoints, route_type, avoid):
+        # The graph search is CPU-bound; keep it off the event loop
+        addresses = [origin] + list(waypoints or []) + [destination]
+        mode = "distance" if route_type == "shortest" else "time"
+        loop = asyncio.get_running_loop()
+        try:
+            directions_data = await loop.run_in_executor(
+                None, lambda: local_directions(addresses, mode=mode, use_highways=avoid != "highways"))
+        except Exception as e:
+            logger.warning("Local fallback routing failed: %s", e)
+            return None
+        if directions_data is None:
+            return None
+        if route_type == "fastest":
+            return self._extract_fastest_route(directions_data)
+        return self._extract_shortest_route(directions_data)
+
+    async def _fetch_traffic_models(self, request):
+        async with aiohttp.ClientSession() as session:
+            results = await asyncio.gather(*(
+                self._directions(**dict(request, traffic_model=model, session=session))
+                for model in self.TRAFFIC_MODELS
+            ), return_exceptions=True)
+        by_model = dict(zip(self.TRAFFIC_MODELS, results))
+        best_guess = by_model.pop("best_guess")
+        if isinstance(best_guess, BaseException):
+            raise best_guess
+        # A failed optimistic/pessimistic call only narrows the range
+        others = {model: data for model, data in by_model.items()
+                  if not isinstance(data, BaseException) and data.get("status") == "OK"}
+        return best_guess, others
+
+    def _merge_traffic_range(self, model, others):
+        """Per-leg min/expected/max durations (seconds) for the chosen route.
+
+        The other traffic models' responses are reduced to durations of the
+        same route (matched by summary, else the first alternative); their
+        geometry is dropped.
+        """
+        models = {"best_guess": model}
+        for name, data in others.items():
+            routes = [route for route in data.get("routes", []) if isinstance(route, dict)]
+            match = next((route for route in routes if model.summary and route.get("summary") == model.summary),
+                         routes[0] if routes else None)
+            if match is not None:
+                other = Route.from_directions(match, scan_tolls=False)
+                if len(other.legs) == len(model.legs):
+                    models[name] = other
+        legs = []
+        for i, leg in enumerate(model.legs):
+            values = [m.legs[i].effective_duration for m in models.values()]
+            legs.append({
+                "min": min(values),
+                "expected": leg.effective_duration,
+                "max": max(values)
+            })
+        return {
+            "models": [name for name in self.TRAFFIC_MODELS if name in models],
+            "legs": legs,
+            "total": {key: sum(leg[key] for leg in legs) for key in ("min", "expected", "max")}
+        }
+
+    async def departure_sweep(self, origin, destination, window_start, window_end, step_minutes=15,
+                              waypoints=None, avoid=None, traffic_model="best_guess",
+                              max_concurrency=None, budget_seconds=None):
+        """Traffic-aware duration for every departure in [window_start, window_end].
+
+        Candidates are requested concurrently (at most ``max_concurrency`` in
+        flight) over one shared HTTP session; the whole sweep is bounded by
+        ``budget_seconds`` and slots that miss it are reported as timed out.
+        Timestamps are epoch seconds. Returns the duration curve and the best slot.
+        """
+        if not origin or not destination:
+            raise ValueError("Origin and destination must be provided")
+        if window_end < window_start or step_minutes <= 0:
+            raise ValueError("Invalid departure window")
+        max_concurrency = max_concurrency or Config.SWEEP_MAX_CONCURRENCY
+        # 0 is a valid budget (every slot times out); only None means the default
+        if budget_seconds is None:
+            budget_seconds = Config.SWEEP_BUDGET_SECONDS
+        if budget_seconds < 0:
+            raise ValueError("budget_seconds must not be negative")
+        step = int(step_minutes * 60)
+        if step < 1:
+            raise ValueError("step_minutes must be at least one second")
+        window_start, window_end = int(window_start), int(window_end)
+        # Counted before the slots are built, so a huge window is rejected cheaply
+        count = (window_end - window_start) // step + 1
+        if count > Config.SWEEP_MAX_POINTS:
+            raise ValueError(f"Too many departure slots ({count}, max {Config.SWEEP_MAX_POINTS})")
+        departures = list(range(window_start, window_end + 1, step))
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+        waypoints = list(waypoints or [])
+
+        async def evaluate(session, departure):
+            key = (origin, destination, tuple(waypoints), departure, avoid, traffic_model)
+            data = self.directions_cache.get(key)
+            cached = data is not None
+            if not cached:
+                async with semaphore:
+                    data = await self._directions(
+                        origin=origin, destination=destination, waypoints=waypoints, mode="driving",
+                        departure_time=departure, avoid=avoid, traffic_model=traffic_model,
+                        session=session
+                    )
+                self.directions_cache.put(key, data)
+            _, model = select_route(data, 'fastest')
+            if model is None:
+                raise RuntimeError("No route found")
+            return {
+                "departure_time": departure,
+                "departure_time_text": datetime.fromtimestamp(departure).strftime('%Y-%m-%d %H:%M'),
+                "duration": model.duration,
+                "duration_in_traffic": model.effective_duration,
+                "arrival_time": departure + model.effective_duration,
+                "distance": model.distance,
+                "cached": cached
+            }
+
+        async with aiohttp.ClientSession() as session:
+            tasks = [asyncio.ensure_future(evaluate(session, departure)) for departure in departures]
+            done, pending = await asyncio.wait(tasks, timeout=budget_seconds)
+            for task in pending:
+                task.cancel()
+            # Let the cancelled requests unwind before the session closes
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        slots = []
+        for departure, task in zip(departures, tasks):
+            if task in pending:
+                slots.append({"departure_time": departure, "error": "timeout"})
+            elif task.exception() is not None:
+                slots.append({"departure_time": departure, "error": str(task.exception())})
+            else:
+                slots.append(task.result())
+        valid = [slot for slot in slots if "error" not in slot]
+        best = min(valid, key=lambda slot: (slot["duration_in_traffic"], slot["departure_time"])) if valid else None
+        return {"departures": slots, "best": best}
+
     def _extract_fastest_route(self, directions_data):
         # Extract the route with the shortest duration considering traffic
-        routes = directions_data.get("routes", [])
-        if not routes:
+        route, model = select_route(directions_data, 'fastest')
+        if model is None:
             return None
-            
-        # If there are multiple routes, find the one with shortest duration in traffic
-        if len(routes) > 1:
-            fastest_route = None
-            min_duration = float('inf')
-            
-            for route in routes:
-                legs = route.get("legs", [])
-                total_duration = 0
-                
-                for leg in legs:
-                    if not isinstance(leg, dict):
-                        continue
-                        
-                    # Prefer duration_in_traffic if available, otherwise use regular duration
-                    if "duration_in_traffic" in leg:
-                        if isinstance(leg["duration_in_traffic"], dict) and "value" in leg["duration_in_traffic"]:
-                            total_duration += leg["duration_in_traffic"]["value"]
-                        elif isinstance(leg["duration_in_traffic"], (int, float)):
-                            total_duration += leg["duration_in_traffic"]
-                    elif "duration" in leg:
-                        if isinstance(leg["duration"], dict) and "value" in leg["duration"]:
-                            total_duration += leg["duration"]["value"]
-                        elif isinstance(leg["duration"], (int, float)):
-                            total_duration += leg["duration"]
-                        
-                if total_duration < min_duration:
-                    min_duration = total_duration
-                    fastest_route = route
-                    
-            if fastest_route:
-                route = fastest_route
-            else:
-                # Fallback to first route if comparison fails
-                route = routes[0]
-        else:
-            # Only one route available
-            route = routes[0]
-            
-        # Extract route details
-        overview_polyline = None
-        if isinstance(route.get("overview_polyline"), dict):
-            overview_polyline = route.get("overview_polyline", {}).get("points")
-        elif isinstance(route.get("overview_polyline"), str):
-            overview_polyline = route.get("overview_polyline")
-        
-        legs = route.get("legs", [])
-        # Ensure legs is a list of dictionaries
-        if not isinstance(legs, list):
-            print(f"Warning: legs is not a list: {type(legs)}")
-            legs = []
-        
-        # Calculate total distance and duration
-        total_distance_meters = 0
-        total_duration_seconds = 0
-        total_duration_in_traffic_seconds = 0
-        
-        for leg in legs:
-            if not isinstance(leg, dict):
-                print(f"Warning: leg is not a dictionary: {type(leg)}")
-                continue
-                
-            # Handle distance
-            if "distance" in leg:
-                if isinstance(leg["distance"], dict) and "value" in leg["distance"]:
-                    total_distance_meters += leg["distance"]["value"]
-                elif isinstance(leg["distance"], (int, float)):
-                    total_distance_meters += leg["distance"]
-                    
-            # Handle duration
-            if "duration" in leg:
-                if isinstance(leg["duration"], dict) and "value" in leg["duration"]:
-                    total_duration_seconds += leg["duration"]["value"]
-                elif isinstance(leg["duration"], (int, float)):
-                    total_duration_seconds += leg["duration"]
-                    
-            # Handle duration in traffic
-            if "duration_in_traffic" in leg:
-                if isinstance(leg["duration_in_traffic"], dict) and "value" in leg["duration_in_traffic"]:
-                    total_duration_in_traffic_seconds += leg["duration_in_traffic"]["value"]
-                elif isinstance(leg["duration_in_traffic"], (int, float)):
-                    total_duration_in_traffic_seconds += leg["duration_in_traffic"]
-        
-        # Use traffic duration if available, otherwise use regular duration
-        effective_duration = total_duration_in_traffic_seconds if total_duration_in_traffic_seconds > 0 else total_duration_seconds
-        
-        # Log the distance calculation for debugging
-        print(f"Total distance in meters: {total_distance_meters}")
-        distance_km = round(total_distance_meters / 1000, 1)  # Convert to kilometers and round to 1 decimal place
-        print(f"Converted to kilometers: {distance_km} km")
-        
+
+        distance_km = round(model.distance / 1000, 1)  # Convert to kilometers and round to 1 decimal place
+        logger.debug("Total distance: %s m (%s km)", model.distance, distance_km)
+
         return {
-            "overview_polyline": overview_polyline,
-            "legs": legs,
+            "overview_polyline": model.polyline,
+            "legs": model.raw_legs,
             "directions": directions_data,  # Include full directions object for rendering
             "distance": distance_km,  # Properly rounded kilometers
-            "time": effective_duration / 60,  # Convert to minutes
-            "duration_without_traffic": total_duration_seconds / 60,  # Minutes
-            "duration_with_traffic": total_duration_in_traffic_seconds / 60 if total_duration_in_traffic_seconds > 0 else None,  # Minutes
-            "timestamp": directions_data.get("timestamp", int(time.time()))
+            "time": model.effective_duration / 60,  # Convert to minutes
+            "duration_without_traffic": model.duration / 60,  # Minutes
+            "duration_with_traffic": model.duration_in_traffic / 60 if model.duration_in_traffic > 0 else None,  # Minutes
+            "timestamp": directions_data.get("timestamp", int(time.time())),
+            "model": model  # Parsed route reused by the /route response
         }
-        
+
     def _extract_shortest_route(self, directions_data):
         # Extract the route with the shortest distance
-        routes = directions_data.get("routes", [])
-        if not routes:
+        route, model = select_route(directions_data, 'shortest')
+        if model is None:
             return None
-            
-        # If there are multiple routes, find the one with shortest distance
-        if len(routes) > 1:
-            shortest_route = None
-            min_distance = float('inf')
-            
-            for route in routes:
-                legs = route.get("legs", [])
-                total_distance = 0
-                
-                for leg in legs:
-                    if not isinstance(leg, dict):
-                        continue
-                        
-                    if "distance" in leg:
-                        if isinstance(leg["distance"], dict) and "value" in leg["distance"]:
-                            total_distance += leg["distance"]["value"]
-                        elif isinstance(leg["distance"], (int, float)):
-                            total_distance += leg["distance"]
-                        
-                if total_distance < min_distance:
-                    min_distance = total_distance
-                    shortest_route = route
-                    
-            if shortest_route:
-                route = shortest_route
-            else:
-                # Fallback to first route if comparison fails
-                route = routes[0]
-        else:
-            # Only one route available
-            route = routes[0]
-            
-        # Extract route details
-        overview_polyline = None
-        if isinstance(route.get("overview_polyline"), dict):
-            overview_polyline = route.get("overview_polyline", {}).get("points")
-        elif isinstance(route.get("overview_polyline"), str):
-            overview_polyline = route.get("overview_polyline")
-        
-        legs = route.get("legs", [])
-        # Ensure legs is a list of dictionaries
-        if not isinstance(legs, list):
-            print(f"Warning: legs is not a list: {type(legs)}")
-            legs = []
-        
-        # Calculate total distance and duration
-        total_distance_meters = 0
-        total_duration_seconds = 0
-        
-        for leg in legs:
-            if "distance" in leg and "value" in leg["distance"]:
-                total_distance_meters += leg["distance"]["value"]
-                
-            if "duration" in leg and "value" in leg["duration"]:
-                total_duration_seconds += leg["duration"]["value"]
-        
+
         return {
-            "overview_polyline": overview_polyline,
-            "legs": legs,
+            "overview_polyline": model.polyline,
+            "legs": model.raw_legs,
             "directions": directions_data,  # Include full directions object for rendering
-            "distance": total_distance_meters / 1000,  # Convert to kilometers
-            "time": total_duration_seconds / 60,  # Convert to minutes
-            "timestamp": directions_data.get("timestamp", int(time.time()))
-        }
\ No newline at end of file
+            "distance": model.distance / 1000,  # Convert to kilometers
+            "time": model.duration / 60,  # Convert to minutes
+            "timestamp": directions_data.get("timestamp", int(time.time())),
+            "model": model  # Parsed route reused by the /route response
+        }
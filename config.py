@@ -1,3 +1,4 @@
+import logging
 import os
 import secrets
 from dotenv import load_dotenv
@@ -5,6 +6,8 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class Config:
     """Base configuration class for the application.
     All configuration is set through environment variables for better portability.
@@ -23,6 +26,92 @@ class Config:
     if not os.path.isabs(DB_PATH):
         DB_PATH = os.path.join(BASE_DIR, DB_PATH)
 
+    # Optional memory-mapped graph snapshot (built with graph_snapshot.py);
+    # workers open it instead of loading the edges table
+    GRAPH_SNAPSHOT_PATH = os.environ.get('GRAPH_SNAPSHOT_PATH', '')
+    if GRAPH_SNAPSHOT_PATH and not os.path.isabs(GRAPH_SNAPSHOT_PATH):
+        GRAPH_SNAPSHOT_PATH = os.path.join(BASE_DIR, GRAPH_SNAPSHOT_PATH)
+
+    # Local routing worker pool (0 = run searches in the request thread)
+    ROUTING_WORKERS = int(os.environ.get('ROUTING_WORKERS', 0))
+    ROUTING_QUEUE_LIMIT = int(os.environ.get('ROUTING_QUEUE_LIMIT', 64))
+    ROUTING_TIMEOUT_SECONDS = float(os.environ.get('ROUTING_TIMEOUT_SECONDS', 10))
+
+    # Local shortest-path result cache (entries), shortest-path trees kept for
+    # hot origins, and how many queries make an origin hot (0 size disables)
+    ROUTE_CACHE_SIZE = int(os.environ.get('ROUTE_CACHE_SIZE', 4096))
+    ROUTE_TREE_CACHE_SIZE = int(os.environ.get('ROUTE_TREE_CACHE_SIZE', 16))
+    ROUTE_TREE_HOT_THRESHOLD = int(os.environ.get('ROUTE_TREE_HOT_THRESHOLD', 5))
+
+    # Directions results cached per explicit departure time, and limits for
+    # departure-window sweeps (concurrent requests, wall-time budget, slots)
+    DIRECTIONS_CACHE_SIZE = int(os.environ.get('DIRECTIONS_CACHE_SIZE', 1024))
+    DIRECTIONS_CACHE_TTL = float(os.environ.get('DIRECTIONS_CACHE_TTL', 300))
+    SWEEP_MAX_CONCURRENCY = int(os.environ.get('SWEEP_MAX_CONCURRENCY', 12))
+    SWEEP_BUDGET_SECONDS = float(os.environ.get('SWEEP_BUDGET_SECONDS', 10))
+    SWEEP_MAX_POINTS = int(os.environ.get('SWEEP_MAX_POINTS', 48))
+
+    # Live-traffic directions cache: served fresh for the soft TTL, then
+    # served stale while refreshing in the background until the hard TTL
+    DIRECTIONS_SWR_SIZE = int(os.environ.get('DIRECTIONS_SWR_SIZE', 1024))
+    DIRECTIONS_SWR_SOFT_TTL = float(os.environ.get('DIRECTIONS_SWR_SOFT_TTL', 60))
+    DIRECTIONS_SWR_HARD_TTL = float(os.environ.get('DIRECTIONS_SWR_HARD_TTL', 300))
+
+    # Directions API circuit breaker: per-call timeout, failure ratio over the
+    # last BREAKER_WINDOW calls that opens it (slow calls count as failures),
+    # and how long it stays open before a probe. While the API is failing,
+    # /route answers from the local graph when LOCAL_FALLBACK is on.
+    UPSTREAM_TIMEOUT_SECONDS = float(os.environ.get('UPSTREAM_TIMEOUT_SECONDS', 8))
+    BREAKER_FAILURE_RATE = float(os.environ.get('BREAKER_FAILURE_RATE', 0.5))
+    BREAKER_WINDOW = int(os.environ.get('BREAKER_WINDOW', 20))
+    BREAKER_MIN_CALLS = int(os.environ.get('BREAKER_MIN_CALLS', 5))
+    BREAKER_SLOW_CALL_SECONDS = float(os.environ.get('BREAKER_SLOW_CALL_SECONDS', 5))
+    BREAKER_OPEN_SECONDS = float(os.environ.get('BREAKER_OPEN_SECONDS', 30))
+    LOCAL_FALLBACK = os.environ.get('LOCAL_FALLBACK', '1') == '1'
+
+    # Distance Matrix requests: tiles in flight, element rate limit (the API's
+    # per-second quota) and cached origin-destination pairs
+    DISTANCE_MATRIX_CONCURRENCY = int(os.environ.get('DISTANCE_MATRIX_CONCURRENCY', 8))
+    DISTANCE_MATRIX_ELEMENTS_PER_SECOND = float(os.environ.get('DISTANCE_MATRIX_ELEMENTS_PER_SECOND', 1000))
+    DISTANCE_MATRIX_CACHE_SIZE = int(os.environ.get('DISTANCE_MATRIX_CACHE_SIZE', 100000))
+
+    # Excel import: row limit per sheet, concurrent geocoding requests, and
+    # cached geocoding results (addresses rarely move, so the TTL is long)
+    IMPORT_MAX_ROWS = int(os.environ.get('IMPORT_MAX_ROWS', 100000))
+    IMPORT_GEOCODE_CONCURRENCY = int(os.environ.get('IMPORT_GEOCODE_CONCURRENCY', 10))
+    GEOCODE_CACHE_SIZE = int(os.environ.get('GEOCODE_CACHE_SIZE', 50000))
+    GEOCODE_CACHE_TTL = float(os.environ.get('GEOCODE_CACHE_TTL', 86400))
+
+    # Maximum number of routes exported into one file
+    EXPORT_MAX_ROUTES = int(os.environ.get('EXPORT_MAX_ROUTES', 100))
+
+    # Prometheus metrics on /metrics (recording stays on; this hides the endpoint)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+
+    # Warm up (upstream clients, routing graph, routing pool) in a background
+    # thread as soon as the app is created. Otherwise everything is created on
+    # first use, or when /ready is first polled.
+    WARMUP_ON_START = os.environ.get('WARMUP_ON_START', '0') == '1'
+
+    # Logging: level, "text" or "json" lines, and 1-in-N sampling of DEBUG
+    # lines per call site. Records are written by a background thread unless
+    # LOG_QUEUE=0.
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+    LOG_DEBUG_SAMPLE = int(os.environ.get('LOG_DEBUG_SAMPLE', 1))
+    LOG_QUEUE = os.environ.get('LOG_QUEUE', '1') == '1'
+
+    # Request profiling (off by default). When enabled, requests sent with
+    # "X-Profile: 1" are profiled, plus one in every PROFILING_SAMPLE_EVERY
+    # requests (0 = none). The most recent on-demand and the slowest sampled
+    # profiles are kept, PROFILING_KEEP of each, under /admin/profiles. With
+    # PROFILING_TOKEN set, the flag and /admin/profiles need a matching
+    # X-Profile-Token header.
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '0') == '1'
+    PROFILING_SAMPLE_EVERY = int(os.environ.get('PROFILING_SAMPLE_EVERY', 0))
+    PROFILING_KEEP = int(os.environ.get('PROFILING_KEEP', 20))
+    PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN', '')
+
     # Application settings
     DEBUG = os.environ.get('FLASK_DEBUG', '1') == '1'
     PORT = int(os.environ.get('FLASK_PORT', 5000))
@@ -31,9 +120,22 @@ class Config:
     # Generate a random secret key if not provided
     SECRET_KEY = os.environ.get('SECRET_KEY', secrets.token_hex(16))
 
+    # How often (seconds) the in-memory routing graph checks the database for
+    # edge updates made by other processes
+    GRAPH_REFRESH_SECONDS = float(os.environ.get('GRAPH_REFRESH_SECONDS', 1.0))
+
     # Google Maps API key - set in .env file
     GOOGLE_MAPS_API_KEY = os.environ.get("GOOGLE_MAPS_API_KEY", "")
 
+    # Base URL of the Google Maps web services; point it at fake_directions.py
+    # to run without network access or quota
+    GOOGLE_MAPS_BASE_URL = os.environ.get("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com/maps/api")
+
+    # Directions responses: "live" (default), "record" (live, saved to
+    # DIRECTIONS_RECORDINGS_DIR) or "replay" (served from that directory only)
+    DIRECTIONS_MODE = os.environ.get("DIRECTIONS_MODE", "live")
+    DIRECTIONS_RECORDINGS_DIR = os.environ.get("DIRECTIONS_RECORDINGS_DIR", os.path.join(BASE_DIR, "recordings"))
+
     @classmethod
     def get_db_uri(cls):
         """Get database URI in a format suitable for SQLAlchemy"""
@@ -48,13 +150,13 @@ class Config:
     def validate_config(cls):
         """Validate the configuration and print warnings for missing values"""
         if not cls.GOOGLE_MAPS_API_KEY:
-            print("WARNING: Google Maps API key is not set. Route planning functionality will not work.")
-            print("Set the GOOGLE_MAPS_API_KEY environment variable in your .env file.")
+            logger.warning("Google Maps API key is not set. Route planning functionality will not work. "
+                           "Set the GOOGLE_MAPS_API_KEY environment variable in your .env file.")
 
         # Check if database file exists
         if not os.path.exists(cls.DB_PATH) and not cls.DB_PATH.endswith(':memory:'):
-            print(f"WARNING: Database file does not exist at {cls.DB_PATH}")
-            print("You may need to initialize the database.")
+            logger.warning("Database file does not exist at %s. You may need to initialize the database.",
+                           cls.DB_PATH)
 
 
 class DevelopmentConfig(Config):
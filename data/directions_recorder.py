@@ -0,0 +1,48 @@
+import hashlib
+import json
+import os
+import tempfile
+
+
+class DirectionsRecorder:
+    """Directions responses stored on disk, one JSON file per normalized request.
+
+    The API key is never part of the key or the file, and the parameter order
+    does not matter, so a recording made with one key replays with any other.
+    """
+
+    IGNORED_PARAMS = ("key",)
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    @classmethod
+    def normalize(cls, params):
+        return {name: str(value) for name, value in sorted(params.items())
+                if name not in cls.IGNORED_PARAMS and value is not None}
+
+    def path(self, params):
+        normalized = json.dumps(self.normalize(params), sort_keys=True, ensure_ascii=False)
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + ".json")
+
+    def load(self, params):
+        """Recorded response for the request, or None."""
+        try:
+            with open(self.path(params), encoding="utf-8") as f:
+                return json.load(f)["response"]
+        except FileNotFoundError:
+            return None
+
+    def save(self, params, response):
+        path = self.path(params)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written to a temporary file first so concurrent readers never see a partial recording
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"request": self.normalize(params), "response": response}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
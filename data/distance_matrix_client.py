@@ -0,0 +1,172 @@
+import aiohttp
+import asyncio
+import threading
+import time
+import numpy as np
+from config import Config
+from utils.ttl_cache import TTLCache
+from utils.metrics import upstream_call
+
+# Distance Matrix API limits per request
+MAX_ORIGINS = 25
+MAX_DESTINATIONS = 25
+MAX_ELEMENTS = 100
+
+
+class RateLimiter:
+    """Token bucket limiting matrix elements per second.
+
+    Callers reserve tokens up front and sleep off any debt, so the bucket
+    holds no event-loop state and can be shared by requests on different
+    threads and loops.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    async def acquire(self, amount):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            await asyncio.sleep(wait)
+
+
+def plan_tiles(n_origins, n_destinations):
+    """Split an origins x destinations matrix into API-sized (row slice, column slice) tiles."""
+    cols = min(n_destinations, MAX_DESTINATIONS, MAX_ELEMENTS)
+    rows = min(n_origins, MAX_ORIGINS, MAX_ELEMENTS // cols) if cols else 0
+    tiles = []
+    for r in range(0, n_origins, rows or 1):
+        for c in range(0, n_destinations, cols or 1):
+            tiles.append((slice(r, min(r + rows, n_origins)), slice(c, min(c + cols, n_destinations))))
+    return tiles
+
+
+class DistanceMatrixClient:
+    """Google Distance Matrix client for cost matrices over stop lists.
+
+    Large origin x destination sets are tiled into API-sized blocks that are
+    fetched concurrently under an element rate limit. Every origin-destination
+    pair is cached on its own, so overlapping stop lists only request the
+    missing pairs. Results are NumPy arrays (NaN where no route exists).
+    """
+
+    def __init__(self, api_key=None, max_concurrency=None, elements_per_second=None, cache=None):
+        self.api_key = api_key or Config.GOOGLE_MAPS_API_KEY
+        self.base_url = Config.GOOGLE_MAPS_BASE_URL.rstrip("/") + "/distancematrix/json"
+        self.max_concurrency = max_concurrency or Config.DISTANCE_MATRIX_CONCURRENCY
+        self.limiter = RateLimiter(elements_per_second or Config.DISTANCE_MATRIX_ELEMENTS_PER_SECOND)
+        self.cache = cache if cache is not None else TTLCache(maxsize=Config.DISTANCE_MATRIX_CACHE_SIZE,
+                                                              ttl=Config.DIRECTIONS_CACHE_TTL)
+
+    async def matrix(self, origins, destinations, mode="driving", departure_time=None, avoid=None,
+                     traffic_model="best_guess", session=None):
+        """Return {"origins", "destinations", "duration", "duration_in_traffic", "distance"}
+        with (len(origins), len(destinations)) float arrays in seconds and meters."""
+        if not origins or not destinations:
+            raise ValueError("Origins and destinations must be provided")
+        # Traffic for "now" changes slowly; cache it in 5-minute buckets
+        if not isinstance(departure_time, int):
+            departure_time = "now"
+        time_key = int(time.time() // 300) if departure_time == "now" else departure_time
+        params = {
+            "key": self.api_key,
+            "mode": mode,
+            "units": "metric",
+            "departure_time": departure_time,
+            "traffic_model": traffic_model or "best_guess"
+        }
+        if avoid:
+            params["avoid"] = avoid
+
+        unique_origins = list(dict.fromkeys(origins))
+        unique_destinations = list(dict.fromkeys(destinations))
+        values = {}
+        # Origins grouped by the destinations they still miss: each group is a
+        # rectangle of uncached pairs, so cached pairs are never requested again
+        groups = {}
+        for o in unique_origins:
+            missing = []
+            for d in unique_destinations:
+                cached = self.cache.get((o, d, mode, time_key, avoid, traffic_model))
+                if cached is None:
+                    missing.append(d)
+                else:
+                    values[(o, d)] = cached
+            if missing:
+                groups.setdefault(tuple(missing), []).append(o)
+
+        if groups:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            async def fetch(session, tile_origins, tile_destinations):
+                async with semaphore:
+                    await self.limiter.acquire(len(tile_origins) * len(tile_destinations))
+                    data = await self._fetch_tile(session, tile_origins, tile_destinations, params)
+                for o, row in zip(tile_origins, data.get("rows", [])):
+                    for d, element in zip(tile_destinations, row.get("elements", [])):
+                        value = self._element_values(element)
+                        values[(o, d)] = value
+                        if element.get("status") in ("OK", "ZERO_RESULTS"):
+                            self.cache.put((o, d, mode, time_key, avoid, traffic_model), value)
+
+            tiles = [(group_origins[rows], list(group_destinations[cols]))
+                     for group_destinations, group_origins in groups.items()
+                     for rows, cols in plan_tiles(len(group_origins), len(group_destinations))]
+            if session is not None:
+                await asyncio.gather(*(fetch(session, o, d) for o, d in tiles))
+            else:
+                async with aiohttp.ClientSession() as session:
+                    await asyncio.gather(*(fetch(session, o, d) for o, d in tiles))
+
+        shape = (len(origins), len(destinations))
+        result = {
+            "origins": list(origins),
+            "destinations": list(destinations),
+            "duration": np.full(shape, np.nan),
+            "duration_in_traffic": np.full(shape, np.nan),
+            "distance": np.full(shape, np.nan)
+        }
+        for i, o in enumerate(origins):
+            for j, d in enumerate(destinations):
+                duration, duration_in_traffic, distance = values.get((o, d), (np.nan, np.nan, np.nan))
+                result["duration"][i, j] = duration
+                result["duration_in_traffic"][i, j] = duration_in_traffic
+                result["distance"][i, j] = distance
+        return result
+
+    @staticmethod
+    def _element_values(element):
+        if element.get("status") != "OK":
+            return (np.nan, np.nan, np.nan)
+        duration = element.get("duration", {}).get("value", np.nan)
+        # Without traffic data the plain duration is the best estimate
+        duration_in_traffic = element.get("duration_in_traffic", {}).get("value", duration)
+        return (duration, duration_in_traffic, element.get("distance", {}).get("value", np.nan))
+
+    async def _fetch_tile(self, session, origins, destinations, params):
+        params = dict(params, origins="|".join(origins), destinations="|".join(destinations))
+        try:
+            with upstream_call("distance_matrix") as call:
+                async with session.get(self.base_url, params=params) as response:
+                    call.status = f"http_{response.status}"
+                    response.raise_for_status()
+                    data = await response.json()
+                call.status = data.get("status", call.status)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # A timeout is an upstream failure too (502), not an internal error
+            raise RuntimeError(f"Distance Matrix API request failed: {e!r}") from e
+        if data.get("status") != "OK":
+            error_message = f"Distance Matrix API error: {data.get('status')}"
+            if data.get("error_message"):
+                error_message += f" - {data.get('error_message')}"
+            raise RuntimeError(error_message)
+        return data
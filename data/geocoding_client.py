@@ -0,0 +1,51 @@
+import aiohttp
+from config import Config
+from utils.ttl_cache import TTLCache
+from utils.metrics import upstream_call
+
+
+class GeocodingClient:
+    """Google Geocoding API client with a per-address result cache."""
+
+    def __init__(self, api_key=None, cache=None):
+        self.api_key = api_key or Config.GOOGLE_MAPS_API_KEY
+        self.base_url = Config.GOOGLE_MAPS_BASE_URL.rstrip("/") + "/geocode/json"
+        self.cache = cache if cache is not None else TTLCache(maxsize=Config.GEOCODE_CACHE_SIZE,
+                                                              ttl=Config.GEOCODE_CACHE_TTL)
+
+    async def geocode(self, address, session):
+        """Return {"formatted_address", "lat", "lng"} for an address, or None
+        when Google does not know it. Other API errors raise RuntimeError."""
+        key = address.casefold()
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached or None  # {} marks a cached miss
+        params = {"address": address, "key": self.api_key, "language": "en"}
+        try:
+            with upstream_call("geocode") as call:
+                async with session.get(self.base_url, params=params) as response:
+                    call.status = f"http_{response.status}"
+                    response.raise_for_status()
+                    data = await response.json()
+                call.status = data.get("status", call.status)
+        except aiohttp.ClientError as e:
+            raise RuntimeError(f"Geocoding API request failed: {e}") from e
+
+        status = data.get("status")
+        if status == "ZERO_RESULTS":
+            self.cache.put(key, {})
+            return None
+        if status != "OK":
+            error_message = f"Geocoding API error: {status}"
+            if data.get("error_message"):
+                error_message += f" - {data.get('error_message')}"
+            raise RuntimeError(error_message)
+        best = data["results"][0]
+        location = best.get("geometry", {}).get("location", {})
+        result = {
+            "formatted_address": best.get("formatted_address"),
+            "lat": location.get("lat"),
+            "lng": location.get("lng")
+        }
+        self.cache.put(key, result)
+        return result
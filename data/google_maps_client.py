@@ -1,15 +1,43 @@
 import aiohttp
 import asyncio
+import logging
 import time
 from datetime import datetime
 from config import Config
+from data.directions_recorder import DirectionsRecorder
+from utils.metrics import upstream_call
+
+logger = logging.getLogger(__name__)
+
+class DirectionsAPIError(RuntimeError):
+    """Non-OK status returned by the Directions API."""
+
+    # Statuses caused by the request itself rather than by the service
+    REQUEST_ERRORS = ("NOT_FOUND", "ZERO_RESULTS", "INVALID_REQUEST", "MAX_WAYPOINTS_EXCEEDED",
+                      "MAX_ROUTE_LENGTH_EXCEEDED")
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def is_request_error(self):
+        return self.status in self.REQUEST_ERRORS
+
 
 class GoogleMapsClient:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, base_url=None, mode=None, recordings_dir=None):
         self.api_key = api_key or Config.GOOGLE_MAPS_API_KEY
-        self.base_url = "https://maps.googleapis.com/maps/api/directions/json"
+        self.base_url = (base_url or Config.GOOGLE_MAPS_BASE_URL).rstrip("/") + "/directions/json"
+        # "live", "record" (live responses are saved) or "replay" (saved responses only)
+        self.mode = mode or Config.DIRECTIONS_MODE
+        if self.mode not in ("live", "record", "replay"):
+            raise ValueError(f"Invalid directions mode: {self.mode}")
+        self.recorder = None
+        if self.mode != "live":
+            self.recorder = DirectionsRecorder(recordings_dir or Config.DIRECTIONS_RECORDINGS_DIR)
 
-    async def plan_route(self, origin, destination, waypoints=None, mode="driving", departure_time=None, avoid=None, traffic_model=None, optimize_waypoints=False):
+    async def plan_route(self, origin, destination, waypoints=None, mode="driving", departure_time=None, avoid=None, traffic_model=None, optimize_waypoints=False, session=None):
         # Set up base parameters
         params = {
             "origin": origin,
@@ -51,28 +79,53 @@ class GoogleMapsClient:
         if avoid:
             params["avoid"] = avoid
 
-        # Make the API request
+        if self.mode == "replay":
+            data = self.recorder.load(params)
+            if data is None:
+                raise RuntimeError(f"No recorded Directions response for {origin} -> {destination}")
+            return self._check(data)
+
+        # Make the API request; callers issuing many requests can share one session
+        if session is not None:
+            return await self._request(session, params)
         async with aiohttp.ClientSession() as session:
-            try:
-                print(f"Requesting route with params: {params}")
+            return await self._request(session, params)
+
+    @staticmethod
+    def _check(data):
+        # Check for API errors
+        if data.get("status") != "OK":
+            error_message = f"Google Maps API error: {data.get('status')}"
+            if data.get("error_message"):
+                error_message += f" - {data.get('error_message')}"
+            raise DirectionsAPIError(error_message, data.get("status"))
+
+        # Add timestamp to the response
+        data["timestamp"] = int(time.time())
+
+        return data
+
+    async def _request(self, session, params):
+        try:
+            # The params carry the API key; log only what identifies the request
+            logger.debug("Requesting route %s -> %s (waypoints: %s, departure: %s, traffic model: %s)",
+                         params["origin"], params["destination"], params.get("waypoints", ""),
+                         params["departure_time"], params["traffic_model"])
+            with upstream_call("directions") as call:
                 async with session.get(self.base_url, params=params) as response:
+                    call.status = f"http_{response.status}"
                     response.raise_for_status()
                     data = await response.json()
+                call.status = data.get("status", call.status)
 
-                    # Check for API errors
-                    if data.get("status") != "OK":
-                        error_message = f"Google Maps API error: {data.get('status')}"
-                        if data.get("error_message"):
-                            error_message += f" - {data.get('error_message')}"
-                        raise RuntimeError(error_message)
-
-                    # Add timestamp to the response
-                    data["timestamp"] = int(time.time())
+            # Error statuses are recorded too so replay reproduces them
+            if self.mode == "record":
+                self.recorder.save(params, data)
 
-                    return data
-            except aiohttp.ClientError as e:
-                # Log or handle error appropriately
-                raise RuntimeError(f"Google Maps API request failed: {e}") from e
+            return self._check(data)
+        except aiohttp.ClientError as e:
+            # Log or handle error appropriately
+            raise RuntimeError(f"Google Maps API request failed: {e}") from e
 
 # Example usage:
 # async def main():
@@ -1,11 +1,30 @@
+import functools
 import sqlite3
+import sys
+import time
+from array import array
 from config import Config
+from utils.metrics import DB_QUERY_SECONDS
 
 DB_PATH = Config.DB_PATH
 
+def _timed(fn):
+    # Query time per function, exported on /metrics
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, name)
+    return wrapper
+
 def get_connection():
     return sqlite3.connect(DB_PATH)
 
+@_timed
 def get_places():
     conn = get_connection()
     cur = conn.cursor()
@@ -14,6 +33,7 @@ def get_places():
     conn.close()
     return places
 
+@_timed
 def get_edges():
     conn = get_connection()
     cur = conn.cursor()
@@ -22,6 +42,22 @@ def get_edges():
     conn.close()
     return edges
 
+@_timed
+def get_places_by_id(ids):
+    # {id: place} for the given IDs, queried in chunks below SQLite's variable limit
+    ids = list(dict.fromkeys(ids))
+    conn = get_connection()
+    cur = conn.cursor()
+    places = {}
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        cur.execute(f'SELECT id, name, x, y FROM places WHERE id IN ({",".join("?" * len(chunk))})', chunk)
+        for row in cur.fetchall():
+            places[row[0]] = dict(id=row[0], name=row[1], x=row[2], y=row[3])
+    conn.close()
+    return places
+
+@_timed
 def search_places(q):
     conn = get_connection()
     cur = conn.cursor()
@@ -30,6 +66,7 @@ def search_places(q):
     conn.close()
     return results
 
+@_timed
 def get_edges_raw():
     conn = get_connection()
     cur = conn.cursor()
@@ -38,6 +75,7 @@ def get_edges_raw():
     conn.close()
     return edges
 
+@_timed
 def get_edge_between(from_id, to_id):
     conn = get_connection()
     cur = conn.cursor()
@@ -45,3 +83,152 @@ def get_edge_between(from_id, to_id):
     result = cur.fetchone()
     conn.close()
     return result
+
+def pack_profile(times):
+    # Travel times (minutes) per bucket packed as little-endian float32
+    packed = array('f', times)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+def unpack_profile(blob):
+    times = array('f')
+    times.frombytes(blob)
+    if sys.byteorder != 'little':
+        times.byteswap()
+    return times
+
+@_timed
+def get_edge_profiles():
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute('SELECT edge_id, bucket_minutes, times FROM edge_profiles')
+    except sqlite3.OperationalError:
+        # Older databases have no profile table; all edges are static
+        conn.close()
+        return {}
+    profiles = {row[0]: (row[1], unpack_profile(row[2])) for row in cur.fetchall()}
+    conn.close()
+    return profiles
+
+@_timed
+def set_edge_profiles(profiles):
+    """Store edge profiles: iterable of (edge_id, bucket_minutes, [time per bucket]).
+
+    Bumps the data version and records it as ``profiles_version``, so
+    routing processes reload their cached profiles. Returns the new version.
+    """
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute('BEGIN IMMEDIATE')
+        cur.execute('''CREATE TABLE IF NOT EXISTS edge_profiles (
+            edge_id INTEGER PRIMARY KEY,
+            bucket_minutes INTEGER NOT NULL,
+            times BLOB NOT NULL,
+            FOREIGN KEY(edge_id) REFERENCES edges(id)
+        )''')
+        cur.execute('CREATE TABLE IF NOT EXISTS graph_meta (key TEXT PRIMARY KEY, value INTEGER)')
+        cur.executemany('INSERT OR REPLACE INTO edge_profiles VALUES (?, ?, ?)',
+                        [(eid, bucket, pack_profile(times)) for eid, bucket, times in profiles])
+        version = get_data_version(conn) + 1
+        cur.execute(f'PRAGMA user_version = {version}')
+        cur.execute('INSERT OR REPLACE INTO graph_meta VALUES (?, ?)', ('profiles_version', version))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return version
+
+@_timed
+def edge_profiles_changed(since_version):
+    # True when profiles were set or the graph was bulk-imported after since_version
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT MAX(value) FROM graph_meta WHERE key IN ('profiles_version', 'rebuild_version')").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    conn.close()
+    return bool(row and row[0] is not None and row[0] > since_version)
+
+@_timed
+def get_data_version(conn=None):
+    # Graph data version, bumped by every edge update (stored in the SQLite header)
+    own = conn is None
+    if own:
+        conn = get_connection()
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if own:
+        conn.close()
+    return version
+
+def _ensure_edge_changes(cur):
+    cur.execute('CREATE TABLE IF NOT EXISTS edge_changes (version INTEGER NOT NULL, edge_id INTEGER NOT NULL)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_edge_changes_version ON edge_changes(version)')
+
+@_timed
+def update_edges(changes):
+    """Apply partial edge updates in one transaction.
+
+    changes: iterable of (edge_id, distance, time, toll); None keeps the
+    current value. Returns (new data version, [(id, distance, time, toll)])
+    with the stored values of the changed edges.
+    """
+    changes = list(changes)
+    ids = [change[0] for change in changes]
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute('BEGIN IMMEDIATE')
+        _ensure_edge_changes(cur)
+        cur.executemany('UPDATE edges SET distance=COALESCE(?, distance), time=COALESCE(?, time), toll=COALESCE(?, toll) WHERE id=?',
+                        [(dist, tm, toll, eid) for eid, dist, tm, toll in changes])
+        rows = []
+        # Chunked to stay below SQLite's bound parameter limit
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            cur.execute(f'SELECT id, distance, time, toll FROM edges WHERE id IN ({",".join("?" * len(chunk))})', chunk)
+            rows.extend(cur.fetchall())
+        missing = set(ids) - {row[0] for row in rows}
+        if missing:
+            raise KeyError(f'Unknown edge IDs: {sorted(missing)}')
+        version = get_data_version(conn) + 1
+        cur.execute(f'PRAGMA user_version = {version}')
+        cur.executemany('INSERT INTO edge_changes VALUES (?, ?)', [(version, row[0]) for row in rows])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return version, rows
+
+@_timed
+def get_edge_changes(since_version):
+    """Current values of edges changed after since_version.
+
+    Returns None when the graph was rebuilt (bulk import) after that
+    version, i.e. the caller has to reload it completely.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT value FROM graph_meta WHERE key='rebuild_version'")
+        row = cur.fetchone()
+        if row and row[0] > since_version:
+            conn.close()
+            return None
+    except sqlite3.OperationalError:
+        pass
+    try:
+        cur.execute('SELECT e.id, e.distance, e.time, e.toll FROM edges e WHERE e.id IN '
+                    '(SELECT edge_id FROM edge_changes WHERE version > ?)', (since_version,))
+    except sqlite3.OperationalError:
+        conn.close()
+        return []
+    rows = cur.fetchall()
+    conn.close()
+    return rows
@@ -0,0 +1,237 @@
+"""Local stand-in for the Google Maps web services.
+
+Serves synthetic but self-consistent Directions, Distance Matrix and
+Geocoding responses so the app can be load-tested and benchmarked offline
+without spending quota. Addresses are hashed to coordinates in Czechia, so
+the same request always gets the same geometry; travel times depend on the
+departure hour and traffic model. Latency follows a log-normal distribution
+and errors are injected at configurable rates.
+
+    python fake_directions.py --port 8765 --latency-ms 120 --error-rate 0.02
+    GOOGLE_MAPS_BASE_URL=http://127.0.0.1:8765/maps/api python app.py
+"""
+import argparse
+import asyncio
+import hashlib
+import math
+import random
+import time
+
+from aiohttp import web
+
+from business.local_fallback import encode_polyline
+
+TRAFFIC_FACTORS = {'optimistic': 0.9, 'best_guess': 1.0, 'pessimistic': 1.3}
+ROUTE_VARIANTS = ((1.0, 1.0, 'D1'), (1.08, 0.97, 'I/38'), (1.15, 1.1, 'II/150'))
+
+
+class FakeSettings:
+    def __init__(self, latency_ms=100.0, latency_sigma=0.5, error_rate=0.0, quota_rate=0.0,
+                 timeout_rate=0.0, timeout_seconds=30.0, steps_per_leg=8, seed=None):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.quota_rate = quota_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.steps_per_leg = steps_per_leg
+        self.rng = random.Random(seed)
+        self.requests = 0
+
+
+def locate(address):
+    """Deterministic (lat, lng) for an address, inside Czechia."""
+    if ',' in address:
+        try:
+            lat, lng = (float(part) for part in address.split(','))
+            return lat, lng
+        except ValueError:
+            pass
+    digest = hashlib.sha1(address.strip().casefold().encode('utf-8')).digest()
+    return 48.6 + digest[0] / 255 * 2.4, 12.2 + int.from_bytes(digest[1:3], 'big') / 65535 * 6.6
+
+
+def haversine_m(a, b):
+    lat1, lng1, lat2, lng2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 6371000 * 2 * math.asin(math.sqrt(h))
+
+
+def traffic_factor(departure_time, traffic_model):
+    hour = time.localtime(departure_time).tm_hour
+    rush = 1.35 if hour in (7, 8, 16, 17) else 1.1 if 6 <= hour <= 19 else 0.95
+    return rush * TRAFFIC_FACTORS.get(traffic_model, 1.0)
+
+
+def _text_distance(meters):
+    return f'{meters / 1000:.1f} km'
+
+
+def _text_duration(seconds):
+    minutes = max(1, int(round(seconds / 60)))
+    return f'{minutes} mins' if minutes < 60 else f'{minutes // 60} hours {minutes % 60} mins'
+
+
+def make_leg(start_address, end_address, stretch, slowness, factor, steps, road, avoid_highways):
+    start, end = locate(start_address), locate(end_address)
+    meters = int(haversine_m(start, end) * 1.25 * stretch) + 200
+    # Highways average 90 km/h, other roads 60 km/h
+    speed = (60 if avoid_highways or road != 'D1' else 90) / 3.6
+    seconds = int(meters / speed * slowness) + 60
+    points = [(start[0] + (end[0] - start[0]) * i / steps, start[1] + (end[1] - start[1]) * i / steps)
+              for i in range(steps + 1)]
+    leg_steps = []
+    for i in range(steps):
+        step_m = meters // steps
+        step_s = seconds // steps
+        toll = road == 'D1' and not avoid_highways and i == steps // 2
+        leg_steps.append({
+            'distance': {'text': _text_distance(step_m), 'value': step_m},
+            'duration': {'text': _text_duration(step_s), 'value': step_s},
+            'html_instructions': f'Continue onto <b>{road}</b>' + (' (Toll road)' if toll else ''),
+            'start_location': {'lat': points[i][0], 'lng': points[i][1]},
+            'end_location': {'lat': points[i + 1][0], 'lng': points[i + 1][1]},
+            'polyline': {'points': encode_polyline(points[i:i + 2])},
+            'travel_mode': 'DRIVING',
+        })
+    traffic = int(seconds * factor)
+    return {
+        'start_address': start_address,
+        'end_address': end_address,
+        'start_location': {'lat': start[0], 'lng': start[1]},
+        'end_location': {'lat': end[0], 'lng': end[1]},
+        'distance': {'text': _text_distance(meters), 'value': meters},
+        'duration': {'text': _text_duration(seconds), 'value': seconds},
+        'duration_in_traffic': {'text': _text_duration(traffic), 'value': traffic},
+        'steps': leg_steps,
+    }, points
+
+
+def make_directions(params, steps_per_leg=8):
+    """Synthetic Directions response for request query parameters."""
+    origin = params.get('origin')
+    destination = params.get('destination')
+    if not origin or not destination:
+        return {'status': 'INVALID_REQUEST', 'routes': [], 'error_message': 'Missing origin or destination'}
+    waypoints = [w for w in params.get('waypoints', '').split('|') if w and w != 'optimize:true']
+    if len(waypoints) > 25:
+        return {'status': 'MAX_WAYPOINTS_EXCEEDED', 'routes': []}
+    departure = params.get('departure_time', 'now')
+    departure = int(time.time()) if departure == 'now' else int(departure)
+    factor = traffic_factor(departure, params.get('traffic_model', 'best_guess'))
+    avoid_highways = 'highways' in params.get('avoid', '')
+    stops = [origin] + waypoints + [destination]
+    variants = ROUTE_VARIANTS if params.get('alternatives') == 'true' else ROUTE_VARIANTS[:1]
+    routes = []
+    for stretch, slowness, road in variants:
+        legs, overview = [], []
+        for a, b in zip(stops, stops[1:]):
+            leg, points = make_leg(a, b, stretch, slowness, factor, steps_per_leg, road, avoid_highways)
+            legs.append(leg)
+            overview.extend(points if not overview else points[1:])
+        lats = [p[0] for p in overview]
+        lngs = [p[1] for p in overview]
+        routes.append({
+            'summary': road,
+            'legs': legs,
+            'overview_polyline': {'points': encode_polyline(overview)},
+            'bounds': {'northeast': {'lat': max(lats), 'lng': max(lngs)},
+                       'southwest': {'lat': min(lats), 'lng': min(lngs)}},
+        })
+    return {'status': 'OK', 'routes': routes, 'geocoded_waypoints': []}
+
+
+def make_matrix(params):
+    origins = [o for o in params.get('origins', '').split('|') if o]
+    destinations = [d for d in params.get('destinations', '').split('|') if d]
+    if not origins or not destinations:
+        return {'status': 'INVALID_REQUEST', 'rows': []}
+    departure = params.get('departure_time', 'now')
+    departure = int(time.time()) if departure == 'now' else int(departure)
+    factor = traffic_factor(departure, params.get('traffic_model', 'best_guess'))
+    rows = []
+    for o in origins:
+        elements = []
+        for d in destinations:
+            meters = int(haversine_m(locate(o), locate(d)) * 1.25)
+            seconds = int(meters / 25) + (60 if o != d else 0)
+            elements.append({'status': 'OK',
+                             'distance': {'text': _text_distance(meters), 'value': meters},
+                             'duration': {'text': _text_duration(seconds), 'value': seconds},
+                             'duration_in_traffic': {'text': _text_duration(seconds * factor),
+                                                     'value': int(seconds * factor)}})
+        rows.append({'elements': elements})
+    return {'status': 'OK', 'origin_addresses': origins, 'destination_addresses': destinations, 'rows': rows}
+
+
+def make_geocode(params):
+    address = params.get('address', '').strip()
+    if not address:
+        return {'status': 'INVALID_REQUEST', 'results': []}
+    lat, lng = locate(address)
+    return {'status': 'OK', 'results': [{'formatted_address': address,
+                                         'geometry': {'location': {'lat': lat, 'lng': lng}}}]}
+
+
+def create_app(settings=None):
+    settings = settings or FakeSettings()
+    app = web.Application()
+    app['settings'] = settings
+
+    def handler(build):
+        async def handle(request):
+            settings.requests += 1
+            rng = settings.rng
+            if settings.latency_ms > 0:
+                await asyncio.sleep(settings.latency_ms / 1000 * rng.lognormvariate(0, settings.latency_sigma))
+            roll = rng.random()
+            if roll < settings.timeout_rate:
+                await asyncio.sleep(settings.timeout_seconds)
+            roll -= settings.timeout_rate
+            if roll < settings.error_rate:
+                return web.json_response({'status': 'UNKNOWN_ERROR'}, status=500)
+            roll -= settings.error_rate
+            if roll < settings.quota_rate:
+                return web.json_response({'status': 'OVER_QUERY_LIMIT', 'routes': [],
+                                          'error_message': 'You have exceeded your rate-limit for this API.'})
+            return web.json_response(build(dict(request.query)))
+        return handle
+
+    app.router.add_get('/maps/api/directions/json',
+                       handler(lambda params: make_directions(params, settings.steps_per_leg)))
+    app.router.add_get('/maps/api/distancematrix/json', handler(make_matrix))
+    app.router.add_get('/maps/api/geocode/json', handler(make_geocode))
+    return app
+
+
+async def start_server(settings=None, host='127.0.0.1', port=0):
+    """Start the fake server in the running loop; returns (runner, base_url)."""
+    runner = web.AppRunner(create_app(settings))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f'http://{host}:{port}/maps/api'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fake Google Maps Directions/Distance Matrix/Geocoding server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=100.0, help='median response latency')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='log-normal spread of the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of HTTP 500 responses')
+    parser.add_argument('--quota-rate', type=float, default=0.0, help='share of OVER_QUERY_LIMIT responses')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='share of requests that hang')
+    parser.add_argument('--timeout-seconds', type=float, default=30.0)
+    parser.add_argument('--steps-per-leg', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+    settings = FakeSettings(args.latency_ms, args.latency_sigma, args.error_rate, args.quota_rate,
+                            args.timeout_rate, args.timeout_seconds, args.steps_per_leg, args.seed)
+    print(f'Fake Google Maps API on http://{args.host}:{args.port}/maps/api')
+    web.run_app(create_app(settings), host=args.host, port=args.port, print=None)
+
+
+if __name__ == '__main__':
+    main()
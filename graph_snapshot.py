@@ -0,0 +1,226 @@
+"""Memory-mapped binary snapshot of the routing graph.
+
+The file holds the places/edges tables as fixed-width little-endian arrays
+in CSR layout (each undirected edge is stored once per direction)::
+
+    header | node_ids q[n] | offsets q[n+1] | targets q[m] | edge_ids q[m]
+           | distance d[m] | time d[m] | x d[n] | y d[n] | toll B[m]
+
+Workers map it read-only, so opening is near-instant and the OS page cache
+shares a single copy between processes. The header records the database's
+graph ID (a random number stamped by every import) and edge count besides
+its data version, because the version alone is only a counter that two
+different databases can share.
+
+Usage:
+    python graph_snapshot.py build [--db places.db] [--out graph.snap]
+    python graph_snapshot.py check [--db places.db] [--snapshot graph.snap]
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+
+MAGIC = b'RPGRAPH\0'
+FORMAT_VERSION = 2
+# magic, format version, db data version, nodes, half-edges, edges, crc32 of the payload, graph ID
+HEADER = struct.Struct('<8sIiQQQI4xq')
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _le_bytes(values):
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def read_identity(conn):
+    """(graph ID, edge count) of an open database; the ID is 0 before the first import."""
+    import sqlite3
+    try:
+        row = conn.execute("SELECT value FROM graph_meta WHERE key='graph_id'").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    edges = conn.execute('SELECT COUNT(*) FROM edges').fetchone()[0]
+    return (row[0] if row else 0), edges
+
+
+def write_snapshot(db_path, out_path):
+    """Build a snapshot from the database; returns the header fields as a dict."""
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    graph_id, _ = read_identity(conn)
+    coords = {row[0]: (row[1], row[2]) for row in conn.execute('SELECT id, x, y FROM places')}
+    edges = conn.execute('SELECT id, from_id, to_id, distance, time, toll FROM edges').fetchall()
+    conn.close()
+
+    node_ids = set(coords)
+    for _, f, t, _, _, _ in edges:
+        node_ids.add(f)
+        node_ids.add(t)
+    node_ids = array('q', sorted(node_ids))
+    n = len(node_ids)
+    m = 2 * len(edges)
+    index = {node: i for i, node in enumerate(node_ids)}
+
+    # Counting sort of half-edges by their tail node
+    offsets = array('q', bytes(8 * (n + 1)))
+    for _, f, t, _, _, _ in edges:
+        offsets[index[f] + 1] += 1
+        offsets[index[t] + 1] += 1
+    for i in range(n):
+        offsets[i + 1] += offsets[i]
+    cursor = array('q', offsets)
+    targets = array('q', bytes(8 * m))
+    edge_ids = array('q', bytes(8 * m))
+    distance = array('d', bytes(8 * m))
+    time = array('d', bytes(8 * m))
+    toll = array('B', bytes(m))
+    for eid, f, t, dist, tm, tl in edges:
+        for a, b in ((f, t), (t, f)):
+            pos = cursor[index[a]]
+            cursor[index[a]] += 1
+            targets[pos] = b
+            edge_ids[pos] = eid
+            distance[pos] = dist
+            time[pos] = tm
+            toll[pos] = 1 if tl else 0
+    nan = float('nan')
+    xs = array('d', (coords.get(node, (nan, nan))[0] for node in node_ids))
+    ys = array('d', (coords.get(node, (nan, nan))[1] for node in node_ids))
+
+    chunks = [_le_bytes(a) for a in (node_ids, offsets, targets, edge_ids, distance, time, xs, ys, toll)]
+    crc = 0
+    for chunk in chunks:
+        crc = zlib.crc32(chunk, crc)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, version, n, m, len(edges), crc, graph_id)
+    # Written next to the target and swapped in atomically; mapped readers keep the old inode
+    tmp_path = f'{out_path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp_path, out_path)
+    return {'db_version': version, 'graph_id': graph_id, 'nodes': n, 'edges': len(edges), 'checksum': crc}
+
+
+class MappedAdjacency:
+    """Dict-like adjacency over a mapped snapshot: ``get(node)`` returns
+    ``[(neighbour, edge_id, distance, time, toll)]`` like the in-memory graph."""
+
+    def __init__(self, path, verify=False):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mm)
+        if len(buf) < HEADER.size:
+            raise SnapshotError(f'{path}: file too short')
+        magic, fmt, version, n, m, edges, crc, graph_id = HEADER.unpack_from(buf)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise SnapshotError(f'{path}: not a graph snapshot (format {fmt})')
+        self.path = path
+        self.db_version = version
+        self.graph_id = graph_id
+        self.node_count = n
+        self.edge_count = edges
+        self.checksum = crc
+        if len(buf) != HEADER.size + 8 * (4 * n + 1 + 4 * m) + m:
+            raise SnapshotError(f'{path}: truncated snapshot')
+        if sys.byteorder != 'little':
+            raise SnapshotError('memory-mapped snapshots require a little-endian host')
+
+        pos = HEADER.size
+
+        def take(typecode, count, size):
+            nonlocal pos
+            view = buf[pos:pos + count * size].cast(typecode)
+            pos += count * size
+            return view
+
+        self.node_ids = take('q', n, 8)
+        self.offsets = take('q', n + 1, 8)
+        self.targets = take('q', m, 8)
+        self.edge_ids = take('q', m, 8)
+        self.distance = take('d', m, 8)
+        self.time = take('d', m, 8)
+        self.x = take('d', n, 8)
+        self.y = take('d', n, 8)
+        self.toll = take('B', m, 1)
+        if verify and zlib.crc32(buf[HEADER.size:]) != crc:
+            raise SnapshotError(f'{path}: checksum mismatch')
+
+    def _index(self, node):
+        i = bisect_left(self.node_ids, node)
+        if i < self.node_count and self.node_ids[i] == node:
+            return i
+        return None
+
+    def get(self, node, default=()):
+        i = self._index(node)
+        if i is None:
+            return default
+        a, b = self.offsets[i], self.offsets[i + 1]
+        return list(zip(self.targets[a:b], self.edge_ids[a:b], self.distance[a:b], self.time[a:b], self.toll[a:b]))
+
+    def items(self):
+        for i in range(self.node_count):
+            node = self.node_ids[i]
+            yield node, self.get(node)
+
+    def coords(self, node):
+        i = self._index(node)
+        return None if i is None else (self.x[i], self.y[i])
+
+
+def check_snapshot(db_path, snapshot_path):
+    """Return a list of problems (empty when the snapshot matches the database)."""
+    import sqlite3
+    try:
+        mapped = MappedAdjacency(snapshot_path, verify=True)
+    except (OSError, SnapshotError) as e:
+        return [str(e)]
+    conn = sqlite3.connect(db_path)
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    graph_id, edges = read_identity(conn)
+    conn.close()
+    problems = []
+    if mapped.graph_id != graph_id:
+        problems.append(f'snapshot was built from graph {mapped.graph_id}, database holds graph {graph_id}')
+    if mapped.db_version != version:
+        problems.append(f'snapshot is at data version {mapped.db_version}, database at {version}')
+    if mapped.edge_count != edges:
+        problems.append(f'snapshot has {mapped.edge_count} edges, database {edges}')
+    return problems
+
+
+def main(argv=None):
+    from config import Config
+    parser = argparse.ArgumentParser(description='Build or check the memory-mapped graph snapshot')
+    parser.add_argument('command', choices=['build', 'check'])
+    parser.add_argument('--db', default=Config.DB_PATH)
+    parser.add_argument('--out', '--snapshot', dest='snapshot',
+                        default=Config.GRAPH_SNAPSHOT_PATH or os.path.join(Config.BASE_DIR, 'graph.snap'))
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        info = write_snapshot(args.db, args.snapshot)
+        print(f"Snapshot {args.snapshot}: {info['nodes']} nodes, {info['edges']} edges, data version {info['db_version']}")
+        return 0
+    problems = check_snapshot(args.db, args.snapshot)
+    for problem in problems:
+        print(f'ERROR: {problem}')
+    if not problems:
+        print(f'Snapshot {args.snapshot} matches {args.db}')
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
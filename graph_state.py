@@ -0,0 +1,280 @@
+import logging
+import os
+import threading
+import time
+from array import array
+from collections import defaultdict
+
+import db
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class GraphView:
+    """Read-only adjacency view of one snapshot.
+
+    ``view[node]`` returns ``[(neighbour, edge_id, distance, time, toll)]``
+    with pending edge updates applied and, when highways are excluded,
+    toll edges filtered out.
+    """
+    __slots__ = ('adjacency', 'delta', 'use_highways')
+
+    def __init__(self, adjacency, delta, use_highways):
+        self.adjacency = adjacency
+        self.delta = delta
+        self.use_highways = use_highways
+
+    def __getitem__(self, node):
+        edges = self.adjacency.get(node, ())
+        delta = self.delta
+        if delta:
+            edges = [(e[0], e[1]) + delta[e[1]] if e[1] in delta else e for e in edges]
+        if not self.use_highways:
+            edges = [e for e in edges if not e[4]]
+        return edges
+
+
+class GraphSnapshot:
+    """Immutable routing graph at one data version.
+
+    Edge updates never touch ``adjacency``; they produce a new snapshot
+    whose ``delta`` maps edge_id -> (distance, time, toll). A search that
+    took a snapshot keeps seeing it even while updates are published.
+    """
+    __slots__ = ('version', 'adjacency', 'delta', 'edge_count', 'db_path')
+
+    def __init__(self, version, adjacency, delta, edge_count, db_path):
+        self.version = version
+        self.adjacency = adjacency
+        self.delta = delta
+        self.edge_count = edge_count
+        self.db_path = db_path
+
+    def view(self, use_highways=True):
+        return GraphView(self.adjacency, self.delta, use_highways)
+
+    def with_changes(self, version, rows):
+        # Copies only the delta, so the cost follows the number of changed edges
+        delta = dict(self.delta)
+        for eid, dist, tm, toll in rows:
+            delta[eid] = (dist, tm, toll)
+        return GraphSnapshot(version, self.adjacency, delta, self.edge_count, self.db_path)
+
+    def compacted(self):
+        # Fold the delta into a fresh adjacency (O(edges), done rarely)
+        delta = self.delta
+        adjacency = {
+            node: [(e[0], e[1]) + delta[e[1]] if e[1] in delta else e for e in edges]
+            for node, edges in self.adjacency.items()
+        }
+        return GraphSnapshot(self.version, adjacency, {}, self.edge_count, self.db_path)
+
+
+class EdgeProfiles:
+    """Time-dependent travel times of the profiled edges in flat arrays.
+
+    ``slots`` maps edge_id -> profile number ``i``; its travel times (minutes)
+    are ``times[offsets[i]:offsets[i + 1]]``, one per ``buckets[i]``-minute
+    interval of the day. ``version`` is the data version they were read at.
+    """
+    __slots__ = ('version', 'db_path', 'slots', 'buckets', 'offsets', 'times')
+
+    def __init__(self, version, db_path, profiles):
+        # profiles: {edge_id: (bucket_minutes, times)} as returned by db.get_edge_profiles
+        self.version = version
+        self.db_path = db_path
+        self.slots = {}
+        self.buckets = array('H')
+        self.offsets = array('q', [0])
+        self.times = array('f')
+        for eid, (bucket_minutes, times) in profiles.items():
+            self.slots[eid] = len(self.buckets)
+            self.buckets.append(bucket_minutes)
+            self.times.extend(times)
+            self.offsets.append(len(self.times))
+
+    def __len__(self):
+        return len(self.slots)
+
+    def travel_time(self, edge_id, minute_of_day):
+        # Piecewise-linear between bucket starts, wrapping at midnight; None without a profile
+        slot = self.slots.get(edge_id)
+        if slot is None:
+            return None
+        start = self.offsets[slot]
+        n = self.offsets[slot + 1] - start
+        pos = (minute_of_day % 1440) / self.buckets[slot]
+        i = int(pos)
+        a = self.times[start + i % n]
+        return a + (self.times[start + (i + 1) % n] - a) * (pos - i)
+
+
+def _load_mapped():
+    # The configured snapshot belongs to the configured database only
+    path = Config.GRAPH_SNAPSHOT_PATH
+    if not path or db.DB_PATH != Config.DB_PATH or not os.path.exists(path):
+        return None
+    from graph_snapshot import MappedAdjacency, SnapshotError, read_identity
+    try:
+        mapped = MappedAdjacency(path)
+    except (OSError, SnapshotError) as e:
+        logger.warning("Ignoring graph snapshot %s: %s", path, e)
+        return None
+    # The data version is only a counter; make sure the file describes this database
+    conn = db.get_connection()
+    try:
+        graph_id, edges = read_identity(conn)
+    finally:
+        conn.close()
+    if (mapped.graph_id, mapped.edge_count) != (graph_id, edges):
+        logger.warning("Graph snapshot %s was built from another database, ignoring it", path)
+        return None
+    snapshot = GraphSnapshot(mapped.db_version, mapped, {}, mapped.edge_count, db.DB_PATH)
+    version = db.get_data_version()
+    if version < mapped.db_version:
+        logger.warning("Graph snapshot %s is newer than the database, ignoring it", path)
+        return None
+    if version == mapped.db_version:
+        return snapshot
+    rows = db.get_edge_changes(mapped.db_version)
+    if rows is None:
+        # Bulk-imported after the snapshot was built: the file describes an old graph
+        logger.warning("Graph snapshot %s predates the last graph import, ignoring it", path)
+        return None
+    # Edge updates made after the snapshot was built are applied as a delta
+    return snapshot.with_changes(version, rows)
+
+
+def load_snapshot():
+    mapped = _load_mapped()
+    if mapped is not None:
+        return mapped
+    conn = db.get_connection()
+    version = db.get_data_version(conn)
+    rows = conn.execute('SELECT id, from_id, to_id, distance, time, toll FROM edges').fetchall()
+    conn.close()
+    adjacency = defaultdict(list)
+    for eid, f, t, dist, tm, toll in rows:
+        adjacency[f].append((t, eid, dist, tm, toll))
+        adjacency[t].append((f, eid, dist, tm, toll))
+    return GraphSnapshot(version, dict(adjacency), {}, len(rows), db.DB_PATH)
+
+
+_lock = threading.Lock()
+_snapshot = None
+_checked_at = 0.0
+_profiles = None
+
+
+def _compact_threshold(snapshot):
+    return max(1024, snapshot.edge_count // 8)
+
+
+def _publish(snapshot):
+    global _snapshot
+    if len(snapshot.delta) > _compact_threshold(snapshot):
+        snapshot = snapshot.compacted()
+    _snapshot = snapshot
+
+
+def _catch_up(snapshot):
+    # Pick up updates written by other processes since our version
+    version = db.get_data_version()
+    if version == snapshot.version:
+        return snapshot
+    rows = db.get_edge_changes(snapshot.version)
+    if rows is None:
+        # The graph was bulk-imported again; nothing to apply incrementally
+        return load_snapshot()
+    return snapshot.with_changes(version, rows)
+
+
+def get_snapshot(min_version=None):
+    """Current graph snapshot; loads it on first use.
+
+    At most every ``GRAPH_REFRESH_SECONDS`` the database version is checked
+    and edges changed by other processes are applied incrementally. Passing
+    ``min_version`` forces that check when our snapshot is older, e.g. in a
+    worker serving a request that must see an update made by the parent.
+    """
+    global _checked_at
+    snapshot = _snapshot
+    now = time.monotonic()
+    stale = min_version is not None and snapshot is not None and snapshot.version < min_version
+    if (snapshot is not None and not stale and snapshot.db_path == db.DB_PATH
+            and now - _checked_at < Config.GRAPH_REFRESH_SECONDS):
+        return snapshot
+    with _lock:
+        snapshot = _snapshot
+        if snapshot is None or snapshot.db_path != db.DB_PATH:
+            snapshot = load_snapshot()
+            _publish(snapshot)
+        elif stale or now - _checked_at >= Config.GRAPH_REFRESH_SECONDS:
+            _publish(_catch_up(snapshot))
+        _checked_at = now
+        return _snapshot
+
+
+def get_version():
+    return get_snapshot().version
+
+
+def update_edges(changes):
+    """Write edge changes to SQLite and publish them to the in-memory graph.
+
+    changes: iterable of (edge_id, distance, time, toll) with None for
+    fields that stay unchanged. Returns the new data version.
+    """
+    get_snapshot()
+    with _lock:
+        before = _snapshot
+        version, rows = db.update_edges(changes)
+        if version == before.version + 1:
+            _publish(before.with_changes(version, rows))
+        else:
+            # Another process updated the graph in between; replay its changes too
+            _publish(_catch_up(before))
+    return version
+
+
+def get_edge_profiles():
+    """Edge profiles for the current snapshot, read from the database once.
+
+    When the snapshot moves to a newer data version the cached profiles are
+    kept unless ``set_edge_profiles`` or a graph import ran in between.
+    """
+    global _profiles
+    snapshot = get_snapshot()
+    profiles = _profiles
+    if (profiles is not None and profiles.db_path == snapshot.db_path
+            and profiles.version >= snapshot.version):
+        return profiles
+    with _lock:
+        profiles = _profiles
+        if profiles is None or profiles.db_path != snapshot.db_path or db.edge_profiles_changed(profiles.version):
+            profiles = EdgeProfiles(snapshot.version, snapshot.db_path, db.get_edge_profiles())
+        else:
+            profiles.version = snapshot.version
+        _profiles = profiles
+        return profiles
+
+
+def set_edge_profiles(profiles):
+    """Store edge profiles and route with them in this process at once.
+
+    profiles: iterable of (edge_id, bucket_minutes, [time per bucket]).
+    Returns the new data version.
+    """
+    version = db.set_edge_profiles(profiles)
+    get_snapshot(min_version=version)
+    return version
+
+
+def reset():
+    # Drop the cached graph; the next search reloads it from the database
+    global _snapshot, _checked_at, _profiles
+    with _lock:
+        _snapshot = None
+        _checked_at = 0.0
+        _profiles = None
@@ -1,16 +1,23 @@
+import argparse
+import csv
+import gzip
+import io
+import random
 import sqlite3
+import sys
+import time
+from itertools import islice
 
-conn = sqlite3.connect('places.db')
-c = conn.cursor()
+from db import pack_profile
 
-# Vytvoření tabulek
-c.execute('''CREATE TABLE IF NOT EXISTS places (
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS places (
     id INTEGER PRIMARY KEY,
     name TEXT NOT NULL,
     x REAL NOT NULL,
     y REAL NOT NULL
-)''')
-c.execute('''CREATE TABLE IF NOT EXISTS edges (
+)''',
+    '''CREATE TABLE IF NOT EXISTS edges (
     id INTEGER PRIMARY KEY,
     from_id INTEGER,
     to_id INTEGER,
@@ -19,22 +26,268 @@ c.execute('''CREATE TABLE IF NOT EXISTS edges (
     toll INTEGER,
     FOREIGN KEY(from_id) REFERENCES places(id),
     FOREIGN KEY(to_id) REFERENCES places(id)
-)''')
-
-# Ukázková data (3 body, 3 silnice)
-places = [
-    (1, 'Praha', 0.2, 0.3),
-    (2, 'Brno', 0.8, 0.7),
-    (3, 'Hradec Králové', 0.5, 0.2)
-]
-edges = [
-    (1, 1, 2, 200, 120, 1), # Praha-Brno
-    (2, 1, 3, 100, 60, 0),  # Praha-Hradec
-    (3, 3, 2, 150, 90, 0)   # Hradec-Brno
+)''',
+    # Časové profily hran: doby jízdy (minuty) po intervalech dne jako float32 blob
+    '''CREATE TABLE IF NOT EXISTS edge_profiles (
+    edge_id INTEGER PRIMARY KEY,
+    bucket_minutes INTEGER NOT NULL,
+    times BLOB NOT NULL,
+    FOREIGN KEY(edge_id) REFERENCES edges(id)
+)''',
+    '''CREATE TABLE IF NOT EXISTS graph_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER
+)''',
 ]
-c.executemany('INSERT OR REPLACE INTO places VALUES (?, ?, ?, ?)', places)
-c.executemany('INSERT OR REPLACE INTO edges VALUES (?, ?, ?, ?, ?, ?)', edges)
 
-conn.commit()
-conn.close()
-print('Databáze inicializována.')
+# Indexy se vytváří až po hromadném načtení, ne průběžně při vkládání
+INDEXES = {
+    'idx_edges_from': 'CREATE INDEX IF NOT EXISTS idx_edges_from ON edges(from_id)',
+    'idx_edges_to': 'CREATE INDEX IF NOT EXISTS idx_edges_to ON edges(to_id)',
+}
+
+# Accepted column names, including the usual names in OSM-derived extracts (osmnx, osm2po, ...)
+PLACE_COLUMNS = {
+    'id': ('id', 'node_id', 'osmid', 'osm_id'),
+    'name': ('name', 'label'),
+    'x': ('x', 'lon', 'lng', 'longitude'),
+    'y': ('y', 'lat', 'latitude'),
+}
+EDGE_COLUMNS = {
+    'id': ('id', 'edge_id'),
+    'from_id': ('from_id', 'source', 'u', 'from'),
+    'to_id': ('to_id', 'target', 'v', 'to'),
+    'distance': ('distance', 'length'),
+    'time': ('time', 'travel_time'),
+    'toll': ('toll', 'is_toll'),
+}
+TRUE_VALUES = {'1', 'true', 'yes', 't', 'y'}
+
+
+def create_schema(conn):
+    for statement in SCHEMA:
+        conn.execute(statement)
+
+
+def stamp_graph_id(conn):
+    # Nový náhodný identifikátor grafu; snímek grafu z jiné databáze se pak nepoužije
+    conn.execute('INSERT OR REPLACE INTO graph_meta VALUES (?, ?)', ('graph_id', random.getrandbits(62) + 1))
+
+
+def load_demo(conn):
+    create_schema(conn)
+    # Ukázková data (3 body, 3 silnice)
+    places = [
+        (1, 'Praha', 0.2, 0.3),
+        (2, 'Brno', 0.8, 0.7),
+        (3, 'Hradec Králové', 0.5, 0.2)
+    ]
+    edges = [
+        (1, 1, 2, 200, 120, 1), # Praha-Brno
+        (2, 1, 3, 100, 60, 0),  # Praha-Hradec
+        (3, 3, 2, 150, 90, 0)   # Hradec-Brno
+    ]
+    conn.executemany('INSERT OR REPLACE INTO places VALUES (?, ?, ?, ?)', places)
+    conn.executemany('INSERT OR REPLACE INTO edges VALUES (?, ?, ?, ?, ?, ?)', edges)
+    # Dálnice Praha-Brno je ve špičce (7-9 a 15-18 h) pomalejší, hodinové intervaly
+    highway_profile = [120] * 24
+    for hour in (7, 8, 15, 16, 17):
+        highway_profile[hour] = 170
+    conn.execute('INSERT OR REPLACE INTO edge_profiles VALUES (?, ?, ?)', (1, 60, pack_profile(highway_profile)))
+    stamp_graph_id(conn)
+    conn.commit()
+
+
+def open_text(path):
+    # Streamed reading; .gz extracts are decompressed on the fly
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def _column_indexes(header, columns, required):
+    header = [name.strip().lower() for name in header]
+    indexes = {}
+    for field, aliases in columns.items():
+        for alias in aliases:
+            if alias in header:
+                indexes[field] = header.index(alias)
+                break
+    missing = [field for field in required if field not in indexes]
+    if missing:
+        raise ValueError(f'Missing columns {missing} in header {header}')
+    return indexes
+
+
+def _reader(f):
+    # Delimiter (comma, semicolon or tab) is detected from the first few KB
+    sample = f.read(4096)
+    dialect = csv.Sniffer().sniff(sample, delimiters=',;\t') if sample else csv.excel
+    if f.seekable():
+        f.seek(0)
+        return csv.reader(f, dialect)
+    # stdin cannot seek back; re-chain the sampled prefix
+    return csv.reader(_chain_sample(sample, f), dialect)
+
+
+def _chain_sample(sample, f):
+    lines = sample.splitlines(keepends=True)
+    if lines and not lines[-1].endswith(('\n', '\r')):
+        lines[-1] += f.readline()
+    yield from lines
+    yield from f
+
+
+def iter_places(f):
+    rows = _reader(f)
+    idx = _column_indexes(next(rows), PLACE_COLUMNS, ('id', 'x', 'y'))
+    i_id, i_x, i_y = idx['id'], idx['x'], idx['y']
+    i_name = idx.get('name')
+    for row in rows:
+        if not row:
+            continue
+        name = row[i_name] if i_name is not None and row[i_name] else row[i_id]
+        yield int(row[i_id]), name, float(row[i_x]), float(row[i_y])
+
+
+def iter_edges(f, distance_scale=1.0, time_scale=1.0):
+    rows = _reader(f)
+    idx = _column_indexes(next(rows), EDGE_COLUMNS, ('from_id', 'to_id', 'distance', 'time'))
+    i_id = idx.get('id')
+    i_from, i_to, i_dist, i_time = idx['from_id'], idx['to_id'], idx['distance'], idx['time']
+    i_toll = idx.get('toll')
+    for row in rows:
+        if not row:
+            continue
+        toll = 1 if i_toll is not None and row[i_toll].strip().lower() in TRUE_VALUES else 0
+        yield (int(row[i_id]) if i_id is not None else None, int(row[i_from]), int(row[i_to]),
+               float(row[i_dist]) * distance_scale, float(row[i_time]) * time_scale, toll)
+
+
+class Progress:
+    def __init__(self, label, every, out=sys.stderr):
+        self.label = label
+        self.every = every
+        self.out = out
+        self.count = 0
+        self.started = time.perf_counter()
+
+    def add(self, n):
+        before = self.count
+        self.count += n
+        if self.every and self.count // self.every != before // self.every:
+            self.report()
+
+    def report(self, final=False):
+        elapsed = time.perf_counter() - self.started
+        rate = self.count / elapsed if elapsed else 0
+        suffix = ' done' if final else ''
+        print(f'{self.label}: {self.count:,} rows, {elapsed:.1f} s ({rate:,.0f} rows/s){suffix}', file=self.out)
+
+
+def _insert_batches(conn, sql, rows, batch_size, progress):
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        conn.executemany(sql, batch)
+        progress.add(len(batch))
+    progress.report(final=True)
+
+
+def import_graph(db_path, places_path=None, edges_path=None, replace=False, batch_size=50000,
+                 distance_scale=1.0, time_scale=1.0, progress_every=500000):
+    """Bulk-load places and edges from CSV/TSV (optionally gzipped) extracts.
+
+    Rows are streamed and inserted with batched executemany inside a single
+    transaction, with journaling and fsync switched off and the edge indexes
+    built only after the load. Without a journal a failed import cannot be
+    rolled back cleanly; re-run it with ``replace=True``, which clears only
+    the tables that are being loaded (places and/or edges). Returns
+    (places, edges) counts.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    counts = [0, 0]
+    try:
+        conn.execute('PRAGMA journal_mode=OFF')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute('PRAGMA cache_size=-200000')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        create_schema(conn)
+        for name in INDEXES:
+            conn.execute(f'DROP INDEX IF EXISTS {name}')
+
+        conn.execute('BEGIN')
+        # Mažou se jen tabulky, které se znovu načítají
+        if replace and places_path:
+            conn.execute('DELETE FROM places')
+        if replace and edges_path:
+            conn.execute('DELETE FROM edge_profiles')
+            conn.execute('DELETE FROM edges')
+        if places_path:
+            with open_text(places_path) as f:
+                progress = Progress('places', progress_every)
+                _insert_batches(conn, 'INSERT OR REPLACE INTO places VALUES (?, ?, ?, ?)',
+                                iter_places(f), batch_size, progress)
+                counts[0] = progress.count
+        if edges_path:
+            with open_text(edges_path) as f:
+                progress = Progress('edges', progress_every)
+                _insert_batches(conn, 'INSERT OR REPLACE INTO edges VALUES (?, ?, ?, ?, ?, ?)',
+                                iter_edges(f, distance_scale, time_scale), batch_size, progress)
+                counts[1] = progress.count
+        # Nová data grafu: zvýšíme verzi a označíme ji jako úplné přestavění
+        version = conn.execute('PRAGMA user_version').fetchone()[0] + 1
+        conn.execute('INSERT OR REPLACE INTO graph_meta VALUES (?, ?)', ('rebuild_version', version))
+        stamp_graph_id(conn)
+        conn.execute(f'PRAGMA user_version = {version}')
+        conn.execute('COMMIT')
+
+        started = time.perf_counter()
+        for statement in INDEXES.values():
+            conn.execute(statement)
+        conn.execute('ANALYZE')
+        print(f'indexes: {time.perf_counter() - started:.1f} s', file=sys.stderr)
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.execute('PRAGMA synchronous=FULL')
+        conn.execute('PRAGMA journal_mode=DELETE')
+        conn.close()
+    return tuple(counts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Inicializace databáze a hromadný import grafu')
+    parser.add_argument('--db', default='places.db', help='cesta k databázi')
+    sub = parser.add_subparsers(dest='command')
+    imp = sub.add_parser('import', help='hromadný import míst a hran z CSV/TSV (i .gz)')
+    imp.add_argument('--places', help='soubor s místy (id,name,x,y)')
+    imp.add_argument('--edges', help='soubor s hranami (id,from_id,to_id,distance,time,toll)')
+    imp.add_argument('--replace', action='store_true', help='před importem smazat načítaná data (místa a/nebo hrany)')
+    imp.add_argument('--batch-size', type=int, default=50000)
+    imp.add_argument('--distance-scale', type=float, default=1.0, help='násobitel vzdálenosti (např. 0.001 pro metry)')
+    imp.add_argument('--time-scale', type=float, default=1.0, help='násobitel času (např. 1/60 pro sekundy)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'import':
+        if not args.places and not args.edges:
+            parser.error('import vyžaduje --places a/nebo --edges')
+        places, edges = import_graph(args.db, args.places, args.edges, replace=args.replace,
+                                     batch_size=args.batch_size, distance_scale=args.distance_scale,
+                                     time_scale=args.time_scale)
+        print(f'Importováno {places} míst a {edges} hran.')
+        return
+
+    conn = sqlite3.connect(args.db)
+    load_demo(conn)
+    conn.close()
+    print('Databáze inicializována.')
+
+
+if __name__ == '__main__':
+    main()
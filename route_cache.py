@@ -0,0 +1,124 @@
+"""LRU caches for local shortest-path results.
+
+Entries belong to one graph data version: the first lookup with a newer
+version empties the cache, so edge updates invalidate it automatically.
+A lookup with an older version (a search still running on a previous
+snapshot) is a miss and leaves the cache alone.
+Besides single paths, full shortest-path trees are kept for hot origins so
+any destination from such an origin is a lookup.
+"""
+import threading
+from collections import OrderedDict
+
+from config import Config
+
+
+def _is_newer(version, current):
+    # Versions are data versions or (db_path, data version); another database starts over
+    if current is None:
+        return True
+    if isinstance(version, tuple):
+        return version[:-1] != current[:-1] or version[-1] > current[-1]
+    return version > current
+
+
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.version = None
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version, key):
+        with self._lock:
+            if version != self.version:
+                if not _is_newer(version, self.version):
+                    self.misses += 1
+                    return None
+                self._data.clear()
+                self.version = version
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, version, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'version': self.version,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class RouteCache:
+    """Path cache keyed on (start, end, mode, use_highways) plus tree cache
+    keyed on (origin, mode, use_highways)."""
+
+    def __init__(self, maxsize=None, tree_maxsize=None, hot_threshold=None):
+        self.paths = LRUCache(Config.ROUTE_CACHE_SIZE if maxsize is None else maxsize)
+        self.trees = LRUCache(Config.ROUTE_TREE_CACHE_SIZE if tree_maxsize is None else tree_maxsize)
+        self.hot_threshold = Config.ROUTE_TREE_HOT_THRESHOLD if hot_threshold is None else hot_threshold
+        self._origin_counts = LRUCache(4096)
+
+    def is_hot(self, version, origin_key):
+        # Counts queries per origin; an origin becomes hot at the threshold
+        if self.trees.maxsize <= 0:
+            return False
+        count = (self._origin_counts.get(version, origin_key) or 0) + 1
+        self._origin_counts.put(version, origin_key, count)
+        return count >= self.hot_threshold
+
+    def clear(self):
+        self.paths.clear()
+        self.trees.clear()
+        self._origin_counts.clear()
+
+    def stats(self):
+        return {'paths': self.paths.stats(), 'trees': self.trees.stats()}
+
+
+def merge_stats(stats):
+    """Sum ``RouteCache.stats()`` of several processes (routing workers)."""
+    merged = {}
+    for name in ('paths', 'trees'):
+        parts = [entry[name] for entry in stats]
+        hits = sum(part['hits'] for part in parts)
+        misses = sum(part['misses'] for part in parts)
+        versions = [part['version'] for part in parts if part['version'] is not None]
+        merged[name] = {
+            'size': sum(part['size'] for part in parts),
+            'maxsize': sum(part['maxsize'] for part in parts),
+            'version': max(versions) if versions else None,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+        }
+    return merged
+
+
+route_cache = RouteCache()
@@ -1,16 +1,180 @@
-from flask import Blueprint, request, jsonify, send_from_directory
+from flask import Blueprint, Response, g, request, jsonify, send_from_directory, stream_with_context
 from db import get_places, get_edges, search_places
+import graph_state
+import warmup
+import routing_pool
+from routing_pool import get_pool, PoolBusyError, RoutingTimeout
 from config import Config
-import traceback
-import asyncio
+import json
+import logging
 import os
-import requests
-from business.route_planner import RoutePlanner
+import time
+import uuid
+import threading
+import zipfile
+from types import SimpleNamespace
+from business.route_model import Route
+from business.excel_import import ExcelImport, geocode_stops, iter_async
+from business.route_export import EXPORTERS
+from utils import event_loop, log, metrics
+from utils.metrics import ROUTE_STAGE_SECONDS
+from utils.profiling import ProfileStore
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
 routes_bp = Blueprint('routes_bp', __name__)
-
-route_planner = RoutePlanner()
+logger = logging.getLogger(__name__)
+
+def _create_route_planner():
+    from business.route_planner import RoutePlanner
+    return RoutePlanner()
+
+def _create_distance_matrix_client():
+    from data.distance_matrix_client import DistanceMatrixClient
+    return DistanceMatrixClient()
+
+def _create_geocoding_client():
+    from data.geocoding_client import GeocodingClient
+    return GeocodingClient()
+
+# Upstream clients are created on first use (or by the warm-up) rather than at
+# import: their modules pull in aiohttp and numpy, which dominate start-up time
+_SERVICES = {
+    'route_planner': _create_route_planner,
+    'distance_matrix_client': _create_distance_matrix_client,
+    'geocoding_client': _create_geocoding_client,
+}
+_services_lock = threading.Lock()
+
+def service(name):
+    """Shared client ``name`` (a key of _SERVICES), created on first use."""
+    value = globals().get(name)
+    if value is None:
+        with _services_lock:
+            value = globals().get(name)
+            if value is None:
+                value = globals()[name] = _SERVICES[name]()
+    return value
+
+warmup.register('upstream_clients', lambda: [service(name) for name in _SERVICES])
+warmup.register('routing_pool', get_pool)
+
+def __getattr__(name):
+    # routes.route_planner and friends still work as module attributes (and
+    # can be replaced with monkeypatch.setattr)
+    if name in _SERVICES:
+        return service(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Hit ratios are read from the caches when /metrics is scraped
+def _caches():
+    # Local searches run in the routing workers when ROUTING_WORKERS > 0
+    route_stats = routing_pool.cache_stats()
+    caches = {'local_route_paths': SimpleNamespace(**route_stats['paths']),
+              'local_route_trees': SimpleNamespace(**route_stats['trees'])}
+    # Clients not created yet have nothing to report
+    planner = globals().get('route_planner')
+    if planner is not None:
+        caches['directions_live'] = planner.live_cache
+        caches['directions_departure'] = planner.directions_cache
+    if globals().get('distance_matrix_client') is not None:
+        caches['distance_matrix'] = distance_matrix_client.cache
+    if globals().get('geocoding_client') is not None:
+        caches['geocode'] = geocoding_client.cache
+    return caches
+
+metrics.REGISTRY.register_collector(metrics.cache_collector(_caches))
+
+# Request IDs: taken from X-Request-ID when the caller sends one, echoed in the response
+@routes_bp.before_app_request
+def _assign_request_id():
+    incoming = request.headers.get('X-Request-ID', '')
+    g.request_id = incoming[:64] if incoming.isprintable() and incoming else uuid.uuid4().hex[:16]
+    g.request_id_token = log.request_id.set(g.request_id)
+
+@routes_bp.after_app_request
+def _return_request_id(response):
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+@routes_bp.teardown_app_request
+def _clear_request_id(error=None):
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        log.request_id.reset(token)
+
+@routes_bp.before_app_request
+def _start_request_metrics():
+    g.metrics_endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    g.metrics_started = time.perf_counter()
+    metrics.HTTP_IN_FLIGHT.inc(g.metrics_endpoint)
+
+@routes_bp.after_app_request
+def _record_response_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+@routes_bp.teardown_app_request
+def _finish_request_metrics(error=None):
+    endpoint = g.pop('metrics_endpoint', None)
+    if endpoint is None:
+        return
+    metrics.HTTP_IN_FLIGHT.dec(endpoint)
+    metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - g.metrics_started, endpoint)
+    status = g.pop('metrics_status', 500)
+    metrics.HTTP_REQUESTS.inc(endpoint, request.method, str(status))
+
+# Filled by utils.profiling.ProfilingMiddleware, installed by create_app when enabled
+profile_store = ProfileStore(keep=Config.PROFILING_KEEP)
+
+def _profiles_forbidden():
+    if not Config.PROFILING_ENABLED:
+        return jsonify({'error': 'Profiling is disabled'}), 404
+    if Config.PROFILING_TOKEN and request.headers.get('X-Profile-Token') != Config.PROFILING_TOKEN:
+        return jsonify({'error': 'Invalid profiling token'}), 403
+    return None
+
+@routes_bp.route('/admin/profiles', methods=['GET', 'DELETE'])
+def list_profiles():
+    error = _profiles_forbidden()
+    if error:
+        return error
+    if request.method == 'DELETE':
+        profile_store.clear()
+        return '', 204
+    return jsonify({'profiles': [profile.summary() for profile in profile_store.list()]})
+
+@routes_bp.route('/admin/profiles/<profile_id>')
+def get_profile(profile_id):
+    error = _profiles_forbidden()
+    if error:
+        return error
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        return jsonify({'error': 'Unknown profile'}), 404
+    if request.args.get('format') == 'pstats':
+        return Response(profile.dump(), mimetype='application/octet-stream',
+                        headers={'Content-Disposition': f'attachment; filename="{profile_id}.prof"'})
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime', 'ncalls'):
+        return jsonify({'error': 'sort must be one of: cumulative, tottime, ncalls'}), 400
+    limit = request.args.get('limit', 40, type=int)
+    return Response(profile.text(sort, limit), mimetype='text/plain')
+
+@routes_bp.route('/ready')
+def ready():
+    # Readiness probe: 200 once warmed up; the first probe starts the warm-up
+    if not warmup.is_ready():
+        warmup.start()
+    state = warmup.status()
+    return jsonify(state), 200 if state['status'] == warmup.READY else 503
+
+@routes_bp.route('/metrics')
+def metrics_endpoint():
+    if not Config.METRICS_ENABLED:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
 
 @routes_bp.route('/api/maps-key', methods=['GET', 'POST'])
 def maps_key():
@@ -33,6 +197,7 @@ def maps_key():
         try:
             # Make a simple request to the Google Maps API
             url = f"https://maps.googleapis.com/maps/api/directions/json?origin=Prague&destination=Brno&key={new_key}"
+            import requests
             response = requests.get(url)
             data = response.json()
 
@@ -74,10 +239,7 @@ def maps_key():
             # Update the API key in the config again to ensure it's updated
             Config.GOOGLE_MAPS_API_KEY = new_key
 
-            # Print confirmation for debugging
-            print(f"API key updated to: {new_key}")
-            print(f"Config API key: {Config.GOOGLE_MAPS_API_KEY}")
-            print(f"Environment API key: {os.environ.get('GOOGLE_MAPS_API_KEY')}")
+            logger.info("Google Maps API key updated")
 
             return jsonify({'success': True, 'key': new_key}), 200
         except Exception as e:
@@ -125,8 +287,420 @@ def search():
     results = search_places(q)
     return jsonify(results)
 
+@routes_bp.route('/edges', methods=['PATCH'])
+def patch_edges():
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('edges'), list) or not data['edges']:
+        return jsonify({'error': 'edges must be a non-empty list'}), 400
+
+    changes = []
+    for i, edge in enumerate(data['edges']):
+        if not isinstance(edge, dict):
+            return jsonify({'error': f'Edge {i+1} must be an object'}), 400
+        eid = edge.get('id')
+        if not isinstance(eid, int) or isinstance(eid, bool):
+            return jsonify({'error': f'Edge {i+1}: id must be an integer'}), 400
+        values = []
+        for field in ('distance', 'time'):
+            value = edge.get(field)
+            if value is not None and (not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0):
+                return jsonify({'error': f'Edge {i+1}: {field} must be a non-negative number'}), 400
+            values.append(value)
+        toll = edge.get('toll')
+        if toll is not None:
+            if toll not in (0, 1):
+                return jsonify({'error': f'Edge {i+1}: toll must be 0/1 or a boolean'}), 400
+            toll = int(toll)
+        if values == [None, None] and toll is None:
+            return jsonify({'error': f'Edge {i+1}: nothing to update'}), 400
+        changes.append((eid, values[0], values[1], toll))
+
+    try:
+        version = graph_state.update_edges(changes)
+    except KeyError as e:
+        return jsonify({'error': str(e.args[0])}), 404
+    return jsonify({'version': version, 'updated': len(changes)})
+
+@routes_bp.route('/edges/version')
+def edges_version():
+    return jsonify({'version': graph_state.get_version()})
+
+@routes_bp.route('/local-route', methods=['POST'])
+def local_route():
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Invalid JSON data'}), 400
+
+    start = data.get('start')
+    end = data.get('end')
+    for name, value in (('start', start), ('end', end)):
+        if not isinstance(value, int) or isinstance(value, bool):
+            return jsonify({'error': f'{name} must be a place ID (integer)'}), 400
+
+    mode = data.get('mode', 'distance')
+    valid_modes = ['time', 'distance']
+    if mode not in valid_modes:
+        return jsonify({'error': f'Invalid mode. Must be one of: {valid_modes}'}), 400
+
+    use_highways = data.get('use_highways', True)
+    if not isinstance(use_highways, bool):
+        return jsonify({'error': 'use_highways must be a boolean value'}), 400
+
+    departure_time = data.get('departure_time')
+    if departure_time is not None and not isinstance(departure_time, str):
+        return jsonify({'error': 'departure_time must be a string in format YYYY-MM-DDTHH:MM'}), 400
+
+    alternatives = data.get('alternatives', 1)
+    if not isinstance(alternatives, int) or isinstance(alternatives, bool) or not 1 <= alternatives <= 5:
+        return jsonify({'error': 'alternatives must be an integer between 1 and 5'}), 400
+
+    # Pareto mode returns every time/distance/toll trade-off in one query
+    pareto = data.get('pareto', False)
+    if not isinstance(pareto, bool):
+        return jsonify({'error': 'pareto must be a boolean value'}), 400
+    if pareto and alternatives > 1:
+        return jsonify({'error': 'pareto and alternatives cannot be combined'}), 400
+
+    pool = get_pool()
+    try:
+        if pareto:
+            routes = pool.run('find_pareto_routes', start, end, use_highways=use_highways,
+                              departure_time=departure_time)
+        elif alternatives > 1:
+            routes = pool.run('find_alternatives', start, end, k=alternatives, mode=mode,
+                              use_highways=use_highways, departure_time=departure_time)
+        else:
+            result = pool.run('find_route', start, end, mode=mode, use_highways=use_highways,
+                              departure_time=departure_time)
+            routes = [result] if result else []
+    except PoolBusyError as e:
+        return jsonify({'error': str(e)}), 503
+    except RoutingTimeout as e:
+        return jsonify({'error': str(e)}), 504
+
+    if not routes:
+        return jsonify({'error': 'No route found'}), 404
+    return jsonify({'routes': routes})
+
+@routes_bp.route('/local-route/cache')
+def local_route_cache():
+    # Hit rates of the path and shortest-path-tree caches, summed over routing workers
+    return jsonify(routing_pool.cache_stats())
+
+@routes_bp.route('/local-matrix', methods=['POST'])
+def local_matrix():
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Invalid JSON data'}), 400
+
+    origins = data.get('origins')
+    destinations = data.get('destinations')
+    for name, ids in (('origins', origins), ('destinations', destinations)):
+        if not isinstance(ids, list) or not ids:
+            return jsonify({'error': f'{name} must be a non-empty list of place IDs'}), 400
+        if any(not isinstance(i, int) or isinstance(i, bool) for i in ids):
+            return jsonify({'error': f'{name} must contain integer place IDs'}), 400
+    if len(origins) * len(destinations) > 250000:
+        return jsonify({'error': 'Matrix too large (max 250000 cells)'}), 400
+
+    mode = data.get('mode', 'time')
+    valid_modes = ['time', 'distance']
+    if mode not in valid_modes:
+        return jsonify({'error': f'Invalid mode. Must be one of: {valid_modes}'}), 400
+
+    use_highways = data.get('use_highways', True)
+    if not isinstance(use_highways, bool):
+        return jsonify({'error': 'use_highways must be a boolean value'}), 400
+
+    try:
+        matrix = get_pool().matrix(origins, destinations, mode=mode, use_highways=use_highways)
+    except PoolBusyError as e:
+        return jsonify({'error': str(e)}), 503
+    except RoutingTimeout as e:
+        return jsonify({'error': str(e)}), 504
+    return jsonify({'origins': origins, 'destinations': destinations, 'mode': mode, 'matrix': matrix})
+
+@routes_bp.route('/isochrone', methods=['POST'])
+def isochrone_route():
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Invalid JSON data'}), 400
+
+    start = data.get('start')
+    if not isinstance(start, int) or isinstance(start, bool):
+        return jsonify({'error': 'start must be a place ID (integer)'}), 400
+
+    # Accept either a single budget or a list of budgets answered in one pass
+    budgets = data.get('budgets')
+    if budgets is None:
+        budgets = [data.get('budget')]
+    if not isinstance(budgets, list) or not budgets:
+        return jsonify({'error': 'budgets must be a non-empty list of numbers'}), 400
+    for budget in budgets:
+        if not isinstance(budget, (int, float)) or isinstance(budget, bool) or budget < 0:
+            return jsonify({'error': 'Each budget must be a non-negative number'}), 400
+
+    mode = data.get('mode', 'time')
+    valid_modes = ['time', 'distance']
+    if mode not in valid_modes:
+        return jsonify({'error': f'Invalid mode. Must be one of: {valid_modes}'}), 400
+
+    use_highways = data.get('use_highways', True)
+    if not isinstance(use_highways, bool):
+        return jsonify({'error': 'use_highways must be a boolean value'}), 400
+
+    hull = data.get('hull', False)
+    if not isinstance(hull, bool):
+        return jsonify({'error': 'hull must be a boolean value'}), 400
+
+    try:
+        result = get_pool().run('isochrone', start, budgets, mode=mode, use_highways=use_highways, with_hull=hull)
+    except PoolBusyError as e:
+        return jsonify({'error': str(e)}), 503
+    except RoutingTimeout as e:
+        return jsonify({'error': str(e)}), 504
+    return jsonify({'start': start, 'mode': mode, 'isochrones': result})
+
+def _parse_timestamp(value):
+    # ISO date string or epoch seconds -> epoch seconds (None if invalid)
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(datetime.fromisoformat(value).timestamp())
+        except ValueError:
+            return None
+    return None
+
+@routes_bp.route('/route/departure-sweep', methods=['POST'])
+def departure_sweep():
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Invalid JSON data'}), 400
+
+    origin = data.get('start')
+    destination = data.get('end')
+    if not origin or not isinstance(origin, str) or len(origin.strip()) == 0:
+        return jsonify({'error': 'Origin is required and must be a non-empty string'}), 400
+    if not destination or not isinstance(destination, str) or len(destination.strip()) == 0:
+        return jsonify({'error': 'Destination is required and must be a non-empty string'}), 400
+
+    waypoints = data.get('waypoints', [])
+    if not isinstance(waypoints, list) or any(not isinstance(w, str) or not w.strip() for w in waypoints):
+        return jsonify({'error': 'Waypoints must be a list of non-empty strings'}), 400
+    waypoints = [w.strip() for w in waypoints]
+
+    window_start = _parse_timestamp(data.get('window_start'))
+    window_end = _parse_timestamp(data.get('window_end'))
+    if window_start is None or window_end is None:
+        return jsonify({'error': 'window_start and window_end must be ISO date strings or timestamps'}), 400
+    if window_end < window_start:
+        return jsonify({'error': 'window_end must not be before window_start'}), 400
+
+    step_minutes = data.get('step_minutes', 15)
+    if not isinstance(step_minutes, (int, float)) or isinstance(step_minutes, bool) or not step_minutes >= 1:
+        return jsonify({'error': 'step_minutes must be a number of at least 1'}), 400
+
+    use_highways = data.get('use_highways')
+    if use_highways is not None and not isinstance(use_highways, bool):
+        return jsonify({'error': 'use_highways must be a boolean value'}), 400
+    avoid = None if data.get('use_highways', True) else 'highways'
+
+    traffic_model = data.get('traffic_model', 'best_guess')
+    if traffic_model not in ['best_guess', 'pessimistic', 'optimistic']:
+        traffic_model = 'best_guess'
+
+    # Clients may shorten the sweep, never extend it past the configured budget
+    budget_seconds = data.get('budget_seconds')
+    if budget_seconds is not None:
+        if not isinstance(budget_seconds, (int, float)) or isinstance(budget_seconds, bool) or not 0 <= budget_seconds:
+            return jsonify({'error': 'budget_seconds must be a non-negative number'}), 400
+        budget_seconds = min(budget_seconds, Config.SWEEP_BUDGET_SECONDS)
+
+    try:
+        result = event_loop.run(service('route_planner').departure_sweep(
+            origin=origin,
+            destination=destination,
+            window_start=window_start,
+            window_end=window_end,
+            step_minutes=step_minutes,
+            waypoints=waypoints,
+            avoid=avoid,
+            traffic_model=traffic_model,
+            budget_seconds=budget_seconds
+        ))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if result['best'] is None:
+        return jsonify(dict(result, error='No departure slot could be evaluated')), 502
+    return jsonify(result)
+
+@routes_bp.route('/matrix', methods=['POST'])
+def distance_matrix():
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Invalid JSON data'}), 400
+
+    origins = data.get('origins')
+    destinations = data.get('destinations')
+    for name, addresses in (('origins', origins), ('destinations', destinations)):
+        if not isinstance(addresses, list) or not addresses:
+            return jsonify({'error': f'{name} must be a non-empty list of addresses'}), 400
+        if any(not isinstance(a, str) or not a.strip() for a in addresses):
+            return jsonify({'error': f'{name} must contain non-empty strings'}), 400
+    origins = [a.strip() for a in origins]
+    destinations = [a.strip() for a in destinations]
+    if len(origins) * len(destinations) > 10000:
+        return jsonify({'error': 'Matrix too large (max 10000 cells)'}), 400
+
+    departure_time = data.get('departure_time')
+    if departure_time is not None:
+        departure_time = _parse_timestamp(departure_time)
+        if departure_time is None:
+            return jsonify({'error': 'departure_time must be an ISO date string or timestamp'}), 400
+
+    use_highways = data.get('use_highways', True)
+    if not isinstance(use_highways, bool):
+        return jsonify({'error': 'use_highways must be a boolean value'}), 400
+
+    traffic_model = data.get('traffic_model', 'best_guess')
+    if traffic_model not in ['best_guess', 'pessimistic', 'optimistic']:
+        traffic_model = 'best_guess'
+
+    try:
+        result = event_loop.run(service('distance_matrix_client').matrix(
+            origins, destinations,
+            departure_time=departure_time,
+            avoid=None if use_highways else 'highways',
+            traffic_model=traffic_model
+        ))
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 502
+    # NaN (no route) is not valid JSON
+    for key in ('duration', 'duration_in_traffic', 'distance'):
+        result[key] = [[None if value != value else value for value in row] for row in result[key].tolist()]
+    return jsonify(result)
+
+@routes_bp.route('/import/excel', methods=['POST'])
+def import_excel():
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'error': 'An Excel file must be uploaded as "file"'}), 400
+    if not upload.filename.lower().endswith(('.xlsx', '.xlsm')):
+        return jsonify({'error': 'Only .xlsx and .xlsm workbooks are supported'}), 400
+    if not zipfile.is_zipfile(upload.stream):
+        return jsonify({'error': 'File is not a valid Excel workbook'}), 400
+    upload.stream.seek(0)
+
+    column = request.form.get('column') or request.args.get('column')
+    if column is not None and column.isdigit():
+        column = int(column)
+    sheet = request.form.get('sheet') or request.args.get('sheet')
+    geocode = (request.form.get('geocode') or request.args.get('geocode', '1')).lower() not in ('0', 'false', 'no')
+    workbook = ExcelImport(upload.stream, sheet=sheet, column=column)
+
+    def generate():
+        # One JSON object per line: stops as they are ready, then a summary
+        stops = workbook.addresses()
+        if geocode:
+            stops = iter_async(geocode_stops(stops, service('geocoding_client')))
+        else:
+            stops = ({'row': row, 'address': address} for row, address in stops)
+        geocoded = failed = 0
+        try:
+            for stop in stops:
+                if 'error' in stop:
+                    failed += 1
+                elif 'lat' in stop:
+                    geocoded += 1
+                yield json.dumps(dict(stop, type='stop')) + '\n'
+        except Exception as e:
+            yield json.dumps({'type': 'error', 'error': str(e)}) + '\n'
+            return
+        summary = dict(workbook.stats, type='summary', geocoded=geocoded, failed=failed)
+        summary['column'] = None if summary['column'] is None else str(summary['column'])
+        yield json.dumps(summary) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@routes_bp.route('/export/<fmt>', methods=['POST'])
+def export_routes(fmt):
+    if fmt not in EXPORTERS:
+        return jsonify({'error': f'Invalid format. Must be one of: {sorted(EXPORTERS)}'}), 400
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data, dict):
+        return jsonify({'error': 'Invalid JSON data'}), 400
+
+    # A single /route result, or {"routes": [...]} for a batch in one file
+    routes = data.get('routes') if 'routes' in data else [data.get('route', data)]
+    if not isinstance(routes, list) or not routes or any(not isinstance(r, dict) for r in routes):
+        return jsonify({'error': 'routes must be a non-empty list of route objects'}), 400
+    if len(routes) > Config.EXPORT_MAX_ROUTES:
+        return jsonify({'error': f'Too many routes (max {Config.EXPORT_MAX_ROUTES})'}), 400
+    if not any(isinstance(r.get('stops'), list) and r['stops'] for r in routes):
+        return jsonify({'error': 'No route data available for export'}), 400
+
+    exporter, mimetype = EXPORTERS[fmt]
+    filename = f"route_{datetime.now().strftime('%Y-%m-%d')}.{fmt}"
+    return Response(stream_with_context(exporter(routes)), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+def build_route_response(route, origin, departure_time=None):
+    """Serialise a RoutePlanner result for /route from its parsed route model."""
+    model = route.get('model')
+    if model is None:
+        model = Route.from_directions({'legs': route.get('legs', []), 'overview_polyline': route.get('overview_polyline')})
+
+    # Totals, tolls and stops were computed in one pass when the model was built
+    distance_km = round(model.distance / 1000, 1) if model.distance else 0
+    total_duration_seconds = model.duration
+    total_duration_with_traffic_seconds = model.duration_in_traffic or total_duration_seconds
+
+    # Calculate ETA based on departure time and duration
+    eta = None
+    if departure_time and total_duration_seconds > 0:
+        try:
+            eta_dt = datetime.fromtimestamp(int(departure_time)) + timedelta(seconds=total_duration_seconds)
+            eta = eta_dt.strftime('%Y-%m-%d %H:%M')
+        except Exception as e:
+            logger.warning("Error calculating ETA: %s", e)
+
+    # Use the values from the route object if they exist, otherwise use calculated values
+    route_distance = route.get('distance')
+    route_time = route.get('time')
+    response_data = {
+        'stops': model.stops(origin),
+        'distance': route_distance if route_distance is not None else distance_km,  # km from route_planner
+        'duration': route_time * 60 if route_time is not None else total_duration_seconds,  # Convert minutes to seconds
+        'duration_in_traffic': total_duration_with_traffic_seconds,
+        'tolls': model.tolls,
+        'eta': eta,
+        'legs': route.get('legs', []),  # Include the original legs data for detailed processing
+        'directions': route.get('directions'),  # Include the complete directions object
+        'polyline': model.polyline,
+        # Add raw distance and time values for debugging
+        'raw_distance_km': distance_km,
+        'raw_duration_sec': total_duration_seconds,
+        'raw_route_distance': route_distance,
+        'raw_route_time': route_time
+    }
+    if model.bounds is not None:
+        response_data['bounds'] = model.bounds
+    if route.get('traffic_range') is not None:
+        response_data['traffic_range'] = route['traffic_range']
+    if route.get('degraded') is not None:
+        # Upstream unavailable: answered from the local graph
+        response_data['degraded'] = route['degraded']
+    if route.get('cache') is not None:
+        # Served from the live-traffic cache: 'fresh', 'stale' (refreshing) or 'miss'
+        response_data['cache'] = route['cache']
+    return response_data
+
 @routes_bp.route('/route', methods=['POST'])
 def route():
+    started = time.perf_counter()
     try:
         data = request.get_json()
         if not data:
@@ -172,7 +746,7 @@ def route():
                 elif not isinstance(departure_time, (int, float)):
                     return jsonify({'error': 'Departure time must be an ISO date string or timestamp'}), 400
             except Exception as e:
-                print(f"Error parsing departure time: {e}")
+                logger.debug("Invalid departure time %r: %s", departure_time, e)
                 return jsonify({'error': 'Invalid departure time format. Use ISO format (YYYY-MM-DDTHH:MM:SS)'}), 400
 
         # Validate use_highways
@@ -187,6 +761,11 @@ def route():
         if traffic_model not in valid_traffic_models:
             traffic_model = 'best_guess'  # Default to best_guess if invalid
 
+        # Validate traffic_range (query all traffic models for a min/expected/max range)
+        traffic_range = data.get('traffic_range', False)
+        if not isinstance(traffic_range, bool):
+            return jsonify({'error': 'traffic_range must be a boolean value'}), 400
+
         # Validate route mode
         route_mode = data.get('mode')
         valid_modes = ['time', 'distance', 'shortest']
@@ -202,21 +781,24 @@ def route():
         if optimize_waypoints is None:
             optimize_waypoints = route_mode == 'distance' or route_mode == 'shortest'
 
-        print(f"Route mode: {data.get('mode')}, Optimizing waypoints: {optimize_waypoints}")
+        logger.debug("Route mode: %s, optimizing waypoints: %s", route_mode, optimize_waypoints)
 
+        ROUTE_STAGE_SECONDS.observe(time.perf_counter() - started, 'validate')
         try:
-            route = asyncio.run(route_planner.plan_route(
-                origin=origin,
-                destination=destination,
-                waypoints=waypoints,
-                mode=mode,
-                departure_time=departure_time,
-                avoid=avoid,
-                traffic_model=traffic_model,
-                optimize_waypoints=optimize_waypoints
-            ))
+            with ROUTE_STAGE_SECONDS.time('plan'):
+                route = event_loop.run(service('route_planner').plan_route(
+                    origin=origin,
+                    destination=destination,
+                    waypoints=waypoints,
+                    mode=mode,
+                    departure_time=departure_time,
+                    avoid=avoid,
+                    traffic_model=traffic_model,
+                    optimize_waypoints=optimize_waypoints,
+                    traffic_range=traffic_range
+                ))
         except Exception as e:
-            print(f"Error in route_planner.plan_route: {e}")
+            logger.warning("Route planning failed: %s", e)
             # Return a simplified response for debugging
             return jsonify({
                 'error': f"Route planning failed: {str(e)}",
@@ -229,173 +811,13 @@ def route():
         if not route:
             return jsonify({'error': 'No route found'}), 404
 
-        stops = []
-        legs = route.get('legs', [])
-        # Calculate total distance and duration from legs
-        total_distance_meters = 0
-        total_duration_seconds = 0
-        total_duration_with_traffic_seconds = 0
-
-        # Add the origin location as the first stop
-        if legs and len(legs) > 0 and isinstance(legs[0], dict):
-            if 'start_location' in legs[0] and 'start_address' in legs[0]:
-                stops.append({
-                    'address': legs[0].get('start_address'),
-                    'departure_time': legs[0].get('departure_time', {}).get('text') if isinstance(legs[0].get('departure_time'), dict) else None,
-                    'departure_time_value': legs[0].get('departure_time', {}).get('value') if isinstance(legs[0].get('departure_time'), dict) else None,
-                    'lat': legs[0].get('start_location', {}).get('lat') if isinstance(legs[0].get('start_location'), dict) else None,
-                    'lng': legs[0].get('start_location', {}).get('lng') if isinstance(legs[0].get('start_location'), dict) else None,
-                    'type': 'origin'
-                })
-                print(f"Added origin stop: {legs[0].get('start_address')}")
-            else:
-                # If we can't get the origin from legs, try to use the input origin
-                print(f"No start/end location in legs, using input origin: {origin}")
-                stops.append({
-                    'address': origin,
-                    'type': 'origin'
-                    # We don't have coordinates here, but the frontend will geocode it
-                })
-        else:
-            # If legs is empty or not a dictionary, use the input origin
-            print(f"No valid legs data, using input origin: {origin}")
-            stops.append({
-                'address': origin,
-                'type': 'origin'
-                # We don't have coordinates here, but the frontend will geocode it
-            })
-
-        # Add the waypoints and destination
-        for leg in legs:
-            if not isinstance(leg, dict):
-                print(f"Skipping invalid leg data: {leg}")
-                continue
-
-            leg_data = {
-                'address': leg.get('end_address'),
-                'type': 'waypoint' if leg != legs[-1] else 'destination'
-            }
-
-            # Safely add optional fields
-            if isinstance(leg.get('arrival_time'), dict):
-                leg_data['arrival_time'] = leg['arrival_time'].get('text')
-                leg_data['arrival_time_value'] = leg['arrival_time'].get('value')
-
-            if isinstance(leg.get('departure_time'), dict):
-                leg_data['departure_time'] = leg['departure_time'].get('text')
-                leg_data['departure_time_value'] = leg['departure_time'].get('value')
-
-            if isinstance(leg.get('distance'), dict):
-                leg_data['distance'] = leg['distance'].get('text')
-                if 'value' in leg['distance']:
-                    leg_data['distance_value'] = leg['distance']['value']
-
-            if isinstance(leg.get('duration'), dict):
-                leg_data['duration'] = leg['duration'].get('text')
-                leg_data['duration_sec'] = leg['duration'].get('value')
-
-            if isinstance(leg.get('duration_in_traffic'), dict):
-                leg_data['duration_in_traffic'] = leg['duration_in_traffic'].get('text')
-                leg_data['duration_in_traffic_sec'] = leg['duration_in_traffic'].get('value')
-
-            if isinstance(leg.get('end_location'), dict):
-                leg_data['lat'] = leg['end_location'].get('lat')
-                leg_data['lng'] = leg['end_location'].get('lng')
-
-            stops.append(leg_data)
-            # Don't double-count distances and durations here
-            # We already calculated them above
-
-        distance_km = round(total_distance_meters / 1000, 1) if total_distance_meters else 0
-        # Duration in seconds is used directly in the response
-
-        # Safely check for tolls
-        tolls = False
-        try:
-            for leg in legs:
-                if isinstance(leg, dict) and 'steps' in leg:
-                    for step in leg['steps']:
-                        if isinstance(step, dict) and 'html_instructions' in step:
-                            if 'toll' in step['html_instructions'].lower():
-                                tolls = True
-                                break
-        except Exception as e:
-            print(f"Error checking for tolls: {e}")
-            tolls = False
-        eta = None
-        if legs and isinstance(legs[0], dict):
-            from datetime import datetime, timedelta
-
-            # Calculate ETA based on departure time and duration
-            if departure_time:
-                try:
-                    dep_epoch = int(departure_time)
-                    total_seconds = total_duration_seconds
-
-                    if total_seconds > 0:
-                        eta_dt = datetime.fromtimestamp(dep_epoch) + timedelta(seconds=total_seconds)
-                        eta = eta_dt.strftime('%Y-%m-%d %H:%M')
-                except Exception as e:
-                    print(f"Error calculating ETA: {e}")
-                    eta = None
-
-        # Calculate total duration with traffic
-        total_duration_with_traffic_seconds = 0
-        for leg in legs:
-            if isinstance(leg, dict) and 'duration_in_traffic' in leg:
-                if isinstance(leg['duration_in_traffic'], dict) and 'value' in leg['duration_in_traffic']:
-                    total_duration_with_traffic_seconds += leg['duration_in_traffic']['value']
-
-        # If no traffic data, use regular duration
-        if total_duration_with_traffic_seconds == 0:
-            total_duration_with_traffic_seconds = total_duration_seconds
-
-        # Return the route with additional information
         try:
-            # Extract total distance and duration from the route object if available
-            route_distance = route.get('distance')
-            route_time = route.get('time')
-
-            # Debug logging
-            print(f"Backend route data - distance: {route_distance} km, time: {route_time} min")
-            print(f"Calculated values - distance: {distance_km} km, duration: {total_duration_seconds/60 if total_duration_seconds else 0} min")
-
-            # Use the values from the route object if they exist, otherwise use calculated values
-            final_distance = route_distance if route_distance is not None else distance_km
-            final_duration = route_time * 60 if route_time is not None else total_duration_seconds  # Convert minutes to seconds
-
-            response_data = {
-                'stops': stops,
-                'distance': final_distance,  # Use the distance from route_planner in km
-                'duration': final_duration,  # Use the duration from route_planner in seconds
-                'duration_in_traffic': total_duration_with_traffic_seconds if total_duration_with_traffic_seconds is not None else 0,
-                'tolls': tolls,
-                'eta': eta,
-                'legs': legs,  # Include the original legs data for detailed processing
-                'directions': route.get('directions')  # Include the complete directions object
-            }
-
-            # Safely add polyline data
-            polyline = None
-            if isinstance(route.get('overview_polyline'), dict):
-                polyline = route.get('overview_polyline', {}).get('points')
-            elif isinstance(route.get('overview_polyline'), str):
-                polyline = route.get('overview_polyline')
-            response_data['polyline'] = polyline
-
-            # Add raw distance and time values for debugging
-            response_data['raw_distance_km'] = distance_km
-            response_data['raw_duration_sec'] = total_duration_seconds
-            response_data['raw_route_distance'] = route.get('distance')
-            response_data['raw_route_time'] = route.get('time')
-
-            # Safely add bounds data
-            if isinstance(route.get('bounds'), dict):
-                response_data['bounds'] = route.get('bounds')
-
-            return jsonify(response_data)
+            with ROUTE_STAGE_SECONDS.time('build_response'):
+                response_data = build_route_response(route, origin, departure_time)
+            with ROUTE_STAGE_SECONDS.time('serialize'):
+                return jsonify(response_data)
         except Exception as e:
-            print(f"Error preparing response: {e}")
+            logger.exception("Error preparing route response")
             # Return a simplified response for debugging
             return jsonify({
                 'stops': [{'address': origin, 'type': 'origin'}, {'address': destination, 'type': 'destination'}],
@@ -405,5 +827,5 @@ def route():
             })
 
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Unhandled error in /route")
         return jsonify({'error': str(e)}), 500
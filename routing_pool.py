@@ -0,0 +1,185 @@
+"""Process pool for CPU-bound local routing.
+
+Searches over the local graph are pure Python and hold the GIL, so running
+them in the Flask request thread stalls every other request of the process.
+``RoutingPool`` dispatches them to worker processes instead. Workers open
+the graph themselves (the memory-mapped snapshot when configured, so the
+page cache shares one copy), and a job only carries its arguments plus the
+graph version the caller has seen; nothing graph-sized is pickled.
+
+With ``ROUTING_WORKERS=0`` (the default) jobs run inline in the caller.
+Every result comes back with the worker's route cache counters, so
+``cache_stats`` can report the caches that actually serve the searches.
+"""
+import atexit
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+import algorithms
+import db
+import graph_state
+from config import Config
+from route_cache import merge_stats, route_cache
+
+# Functions a job may name; keeps arbitrary callables out of the queue
+JOBS = {
+    'find_route': algorithms.find_route,
+    'find_alternatives': algorithms.find_alternatives,
+    'find_pareto_routes': algorithms.find_pareto_routes,
+    'isochrone': algorithms.isochrone,
+    'route_matrix': algorithms.route_matrix,
+}
+
+
+class PoolBusyError(RuntimeError):
+    """Raised when the number of queued and running jobs reaches the limit."""
+
+
+class RoutingTimeout(RuntimeError):
+    """Raised when a job does not finish within its timeout."""
+
+
+def _init_worker(db_path, snapshot_path):
+    db.DB_PATH = db_path
+    Config.DB_PATH = db_path
+    Config.GRAPH_SNAPSHOT_PATH = snapshot_path
+    graph_state.reset()
+    # The parent handles Ctrl+C and shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _on_alarm(signum, frame):
+    raise RoutingTimeout('Routing job timed out')
+
+
+def _run_job(name, args, kwargs, min_version, timeout):
+    # Runs in the worker's main thread, so SIGALRM can interrupt a search that
+    # overruns; on platforms without setitimer the caller just stops waiting
+    graph_state.get_snapshot(min_version)
+    alarm = timeout and hasattr(signal, 'setitimer')
+    if alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return JOBS[name](*args, **kwargs), os.getpid(), route_cache.stats()
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+class RoutingPool:
+    def __init__(self, workers=None, max_queue=None, timeout=None):
+        self.workers = Config.ROUTING_WORKERS if workers is None else workers
+        self.max_queue = Config.ROUTING_QUEUE_LIMIT if max_queue is None else max_queue
+        self.timeout = Config.ROUTING_TIMEOUT_SECONDS if timeout is None else timeout
+        self._slots = threading.BoundedSemaphore(self.max_queue)
+        self._executor = None
+        # Latest route cache stats per worker pid, taken from job results
+        self._worker_stats = {}
+        if self.workers > 0:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                # Fresh interpreters: forking a threaded Flask process is unsafe
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(db.DB_PATH, Config.GRAPH_SNAPSHOT_PATH),
+            )
+
+    def submit(self, name, *args, **kwargs):
+        """Queue a job; returns a Future. Raises PoolBusyError when full."""
+        if name not in JOBS:
+            raise ValueError(f'Unknown routing job: {name}')
+        if not self._slots.acquire(blocking=False):
+            raise PoolBusyError(f'Routing queue is full ({self.max_queue} jobs)')
+        try:
+            future = self._executor.submit(_run_job, name, args, kwargs,
+                                           db.get_data_version(), self.timeout)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def result(self, future, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            # Small grace period so the worker-side alarm normally fires first
+            value, pid, stats = future.result(timeout=timeout + 0.5 if timeout else None)
+        except FutureTimeoutError:
+            # Cancels a job that is still queued; a running one is stopped by its alarm
+            future.cancel()
+            raise RoutingTimeout('Routing job timed out')
+        self._worker_stats[pid] = stats
+        return value
+
+    def run(self, name, *args, **kwargs):
+        """Run a job and wait for its result."""
+        if self._executor is None:
+            if name not in JOBS:
+                raise ValueError(f'Unknown routing job: {name}')
+            if not self._slots.acquire(blocking=False):
+                raise PoolBusyError(f'Routing queue is full ({self.max_queue} jobs)')
+            try:
+                return JOBS[name](*args, **kwargs)
+            finally:
+                self._slots.release()
+        return self.result(self.submit(name, *args, **kwargs))
+
+    def matrix(self, origins, destinations, mode='time', use_highways=True):
+        """route_matrix split into origin blocks that run on all workers."""
+        if self._executor is None or len(origins) < 2:
+            return self.run('route_matrix', origins, destinations, mode=mode, use_highways=use_highways)
+        size = -(-len(origins) // self.workers)
+        futures = []
+        try:
+            for i in range(0, len(origins), size):
+                futures.append(self.submit('route_matrix', origins[i:i + size], destinations,
+                                           mode=mode, use_highways=use_highways))
+            rows = []
+            for future in futures:
+                rows.extend(self.result(future))
+            return rows
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+
+    def cache_stats(self):
+        """Route cache stats of the processes running the searches.
+
+        Inline that is this process; otherwise the workers' caches summed
+        (a worker shows up after its first job).
+        """
+        if self._executor is None:
+            return route_cache.stats()
+        stats = merge_stats(list(self._worker_stats.values()))
+        stats['workers'] = len(self._worker_stats)
+        return stats
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = RoutingPool()
+                atexit.register(_pool.shutdown)
+    return _pool
+
+
+def cache_stats():
+    # Without creating the pool: before its first job nothing was cached
+    pool = _pool
+    return route_cache.stats() if pool is None else pool.cache_stats()
@@ -230,103 +230,94 @@ export class UIController {
     }
 
     /**
-     * Read and process Excel file
+     * Upload Excel file to the server and read addresses as they stream back
      * @param {File} file - Excel file to read
      */
-    readExcelFile(file) {
-        const reader = new FileReader();
-
-        reader.onload = (e) => {
-            try {
-                const data = new Uint8Array(e.target.result);
-                const workbook = XLSX.read(data, { type: 'array' });
-                this.processExcelData(workbook);
-            } catch (error) {
-                console.error('Error processing Excel file:', error);
-                this.showError('Error processing Excel file: ' + error.message);
-            } finally {
-                this.showSpinner(false);
-            }
-        };
-
-        reader.onerror = (error) => {
-            console.error('Error reading Excel file:', error);
-            this.showError('Error reading Excel file');
-            this.showSpinner(false);
-        };
-
-        reader.readAsArrayBuffer(file);
-    }
+    async readExcelFile(file) {
+        const formData = new FormData();
+        formData.append('file', file);
+        formData.append('geocode', '0');
 
-    /**
-     * Process Excel data and extract addresses
-     * @param {Object} workbook - XLSX workbook object
-     */
-    processExcelData(workbook) {
         try {
-            // Get the first sheet
-            const firstSheetName = workbook.SheetNames[0];
-            const worksheet = workbook.Sheets[firstSheetName];
-
-            // Convert to JSON
-            const data = XLSX.utils.sheet_to_json(worksheet);
-
-            if (data.length === 0) {
-                this.showError('Excel file does not contain any data');
-                return;
+            const response = await fetch('/import/excel', { method: 'POST', body: formData });
+            if (!response.ok) {
+                let errorMessage = `Server returned ${response.status} ${response.statusText}`;
+                try {
+                    const errorData = await response.json();
+                    if (errorData.error) {
+                        errorMessage = errorData.error;
+                    }
+                } catch (e) {
+                    // Keep the status message
+                }
+                throw new Error(errorMessage);
             }
 
-            console.log('Excel data:', data);
-
-            // Look for address columns
-            const possibleAddressColumns = ['Address', 'Adresa', 'Místo', 'Location', 'Lokalita'];
-            let addressColumn = null;
-
-            // Find the first matching column
-            for (const column of possibleAddressColumns) {
-                if (data[0].hasOwnProperty(column)) {
-                    addressColumn = column;
+            // The server sends one JSON object per line
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            const addresses = [];
+            let buffer = '';
+            let summary = null;
+            for (;;) {
+                const { done, value } = await reader.read();
+                buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+                const lines = buffer.split('\n');
+                buffer = done ? '' : lines.pop();
+                for (const line of lines) {
+                    if (!line.trim()) {
+                        continue;
+                    }
+                    const item = JSON.parse(line);
+                    if (item.type === 'stop') {
+                        addresses.push(item.address);
+                    } else if (item.type === 'error') {
+                        throw new Error(item.error);
+                    } else if (item.type === 'summary') {
+                        summary = item;
+                    }
+                }
+                if (done) {
                     break;
                 }
             }
 
-            // If no address column found, use the first column
-            if (!addressColumn) {
-                addressColumn = Object.keys(data[0])[0];
-            }
+            console.log('Excel import summary:', summary);
+            this.processExcelData(addresses);
+        } catch (error) {
+            console.error('Error processing Excel file:', error);
+            this.showError('Error processing Excel file: ' + error.message);
+        } finally {
+            this.showSpinner(false);
+        }
+    }
 
-            console.log('Using address column:', addressColumn);
+    /**
+     * Fill origin, destination and waypoints from imported addresses
+     * @param {Array<string>} addresses - Addresses in sheet order, repeats included
+     */
+    processExcelData(addresses) {
+        if (addresses.length === 0) {
+            this.showError('No addresses found in Excel file');
+            return;
+        }
 
-            // Extract addresses
-            const addresses = data.map(row => row[addressColumn]).filter(Boolean);
+        // Set origin, destination, and waypoints
+        if (addresses.length >= 2) {
+            this.originInput.value = addresses[0];
+            this.destinationInput.value = addresses[addresses.length - 1];
 
-            if (addresses.length === 0) {
-                this.showError('No addresses found in Excel file');
-                return;
+            // Add waypoints
+            this.waypointsManager.clearWaypoints();
+            for (let i = 1; i < addresses.length - 1; i++) {
+                this.waypointsManager.addWaypoint(addresses[i]);
             }
+            this.waypointsManager.updateWaypointLetters();
 
-            console.log('Extracted addresses:', addresses);
-
-            // Set origin, destination, and waypoints
-            if (addresses.length >= 2) {
-                this.originInput.value = addresses[0];
-                this.destinationInput.value = addresses[addresses.length - 1];
-
-                // Add waypoints
-                this.waypointsManager.clearWaypoints();
-                for (let i = 1; i < addresses.length - 1; i++) {
-                    this.waypointsManager.addWaypoint(addresses[i]);
-                }
-                this.waypointsManager.updateWaypointLetters();
-
-                // Show success message
-                this.showNotification(`Loaded ${addresses.length} addresses from Excel file`, 3000);
-            } else {
-                this.showError('Excel file must contain at least 2 addresses');
-            }
-        } catch (error) {
-            console.error('Error processing Excel data:', error);
-            this.showError('Error processing data from Excel file');
+            // Show success message
+            this.showNotification(`Loaded ${addresses.length} addresses from Excel file`, 3000);
+        } else {
+            this.showError('Excel file must contain at least 2 addresses');
         }
     }
 
@@ -1,5 +1,5 @@
 import pytest
-from algorithms import find_route
+from algorithms import find_route, find_alternatives, find_pareto_routes, reachable_within, isochrone, route_matrix
 
 def test_find_route_basic():
     # Praha (1) -> Brno (2) v demo datech
@@ -14,3 +14,85 @@ def test_find_route_no_path():
     # Neexistující cesta (např. mezi neexistujícími body)
     result = find_route(999, 1000)
     assert result is None
+
+def test_reachable_within_budget():
+    # Praha (1): Hradec (3) je 60 minut, Brno (2) 120 minut po dálnici
+    costs = reachable_within(1, 100)
+    assert costs == {1: 0, 3: 60}
+    assert reachable_within(1, 120)[2] == 120
+    assert reachable_within(1, 120, use_highways=False).get(2) is None
+
+def test_isochrone_multiple_budgets_with_hull(monkeypatch):
+    import algorithms
+    looked_up = []
+    get_places_by_id = algorithms.get_places_by_id
+    monkeypatch.setattr(algorithms, 'get_places_by_id', lambda ids: looked_up.append(sorted(ids)) or get_places_by_id(ids))
+    result = isochrone(1, [150, 60], with_hull=True)
+    # Souřadnice se načítají jen pro dosažené uzly
+    assert looked_up == [[1, 2, 3]]
+    assert [entry['budget'] for entry in result] == [60, 150]
+    assert [p['id'] for p in result[0]['places']] == [1, 3]
+    assert [p['id'] for p in result[1]['places']] == [1, 3, 2]
+    assert len(result[1]['hull']) == 3
+
+def test_find_route_time_dependent(tmp_path, monkeypatch):
+    import shutil
+    import db
+    db_path = tmp_path / 'places.db'
+    shutil.copy(db.DB_PATH, db_path)
+    monkeypatch.setattr(db, 'DB_PATH', str(db_path))
+    # Dálnice Praha-Brno (hrana 1) je ráno ve špičce pomalejší než objížďka přes Hradec
+    profile = [120] * 24
+    profile[8] = 170
+    db.set_edge_profiles([(1, 60, profile)])
+    rush = find_route(1, 2, mode='time', departure_time='2024-05-06T08:00')
+    assert rush['route'] == [1, 3, 2]
+    assert rush['time'] == 150
+    noon = find_route(1, 2, mode='time', departure_time='2024-05-06T12:00')
+    assert noon['route'] == [1, 2]
+    assert noon['eta'] == '2024-05-06 14:00'
+
+def test_edge_profiles_are_cached_until_changed(tmp_path, monkeypatch):
+    import shutil
+    import db
+    import graph_state
+    db_path = tmp_path / 'places.db'
+    shutil.copy(db.DB_PATH, db_path)
+    monkeypatch.setattr(db, 'DB_PATH', str(db_path))
+    reads = []
+    get_edge_profiles = db.get_edge_profiles
+    monkeypatch.setattr(db, 'get_edge_profiles', lambda: reads.append(1) or get_edge_profiles())
+    graph_state.set_edge_profiles([(1, 60, [170] * 24)])
+    for _ in range(3):
+        assert find_route(1, 2, mode='time', departure_time='2024-05-06T12:00')['route'] == [1, 3, 2]
+    assert len(reads) == 1
+    # Úprava hrany profily nezneplatní, nové profily ano
+    graph_state.update_edges([(3, None, 95, None)])
+    assert find_route(1, 2, mode='time', departure_time='2024-05-06T12:00')['time'] == 155
+    assert len(reads) == 1
+    graph_state.set_edge_profiles([(1, 60, [120] * 24)])
+    assert find_route(1, 2, mode='time', departure_time='2024-05-06T12:00')['route'] == [1, 2]
+    assert len(reads) == 2
+    graph_state.reset()
+
+def test_find_alternatives():
+    routes = find_alternatives(1, 2, k=3)
+    assert [r['route'] for r in routes] == [[1, 2], [1, 3, 2]]
+    assert routes[0]['distance'] == 200
+    assert routes[1]['distance'] == 250
+    assert routes[1]['tolls'] == 0
+    # Objížďka je o 25 % delší, přísnější limit ji vyřadí
+    assert len(find_alternatives(1, 2, k=3, max_stretch=1.2)) == 1
+    assert find_alternatives(999, 1000) == []
+
+def test_find_pareto_routes():
+    routes = find_pareto_routes(1, 2)
+    # Dálnice je rychlejší i kratší, objížďka přes Hradec je bez mýta
+    assert [r['route'] for r in routes] == [[1, 2], [1, 3, 2]]
+    assert routes[0]['tags'] == ['fastest', 'shortest']
+    assert routes[1]['tags'] == ['toll_free']
+    assert [r['route'] for r in find_pareto_routes(1, 2, use_highways=False)] == [[1, 3, 2]]
+
+def test_route_matrix():
+    assert route_matrix([1, 3], [2, 3, 999]) == [[120, 60, None], [90, 0, None]]
+    assert route_matrix([1], [2], mode='distance', use_highways=False) == [[250]]
@@ -0,0 +1,101 @@
+import asyncio
+import time
+import numpy as np
+import pytest
+from data.distance_matrix_client import DistanceMatrixClient, plan_tiles
+
+class FakeMatrixClient(DistanceMatrixClient):
+    """Answers tiles locally: duration = 60 * (i + j), unreachable when origin == destination."""
+
+    def __init__(self, **kwargs):
+        super().__init__(api_key='test', **kwargs)
+        self.tiles = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _fetch_tile(self, session, origins, destinations, params):
+        self.tiles.append((list(origins), list(destinations)))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.05)
+        self.in_flight -= 1
+        rows = []
+        for o in origins:
+            elements = []
+            for d in destinations:
+                if o == d:
+                    elements.append({'status': 'ZERO_RESULTS'})
+                    continue
+                seconds = 60 * (int(o[1:]) + int(d[1:]))
+                elements.append({'status': 'OK', 'duration': {'value': seconds},
+                                 'duration_in_traffic': {'value': seconds + 30},
+                                 'distance': {'value': seconds * 10}})
+            rows.append({'elements': elements})
+        return {'status': 'OK', 'rows': rows}
+
+def stops(n):
+    return [f'S{i}' for i in range(n)]
+
+def test_plan_tiles_respects_api_limits():
+    tiles = plan_tiles(60, 60)
+    cells = 0
+    for rows, cols in tiles:
+        n_rows = rows.stop - rows.start
+        n_cols = cols.stop - cols.start
+        assert n_rows <= 25 and n_cols <= 25 and n_rows * n_cols <= 100
+        cells += n_rows * n_cols
+    assert cells == 3600
+    assert plan_tiles(1, 3) == [(slice(0, 1), slice(0, 3))]
+
+def test_matrix_is_tiled_and_concurrent():
+    client = FakeMatrixClient(max_concurrency=8, elements_per_second=1e6)
+    places = stops(30)
+    result = asyncio.run(client.matrix(places, places, session=object()))
+    assert len(client.tiles) == len(plan_tiles(30, 30))
+    assert client.max_in_flight == 8
+    assert result['duration'].shape == (30, 30)
+    assert result['duration'][2, 5] == 420
+    assert result['duration_in_traffic'][2, 5] == 450
+    assert result['distance'][2, 5] == 4200
+    assert np.isnan(result['duration'][3, 3])
+
+def test_cached_pairs_are_not_requested_again():
+    client = FakeMatrixClient(elements_per_second=1e6)
+    asyncio.run(client.matrix(stops(4), stops(4), session=object()))
+    client.tiles.clear()
+    # Duplicates are collapsed and only the new stop is fetched
+    result = asyncio.run(client.matrix(['S0', 'S4', 'S0'], ['S1', 'S2'], session=object()))
+    assert client.tiles == [(['S4'], ['S1', 'S2'])]
+    assert result['duration'].tolist() == [[60, 120], [300, 360], [60, 120]]
+
+def test_new_stops_fetch_only_new_pairs():
+    client = FakeMatrixClient(elements_per_second=1e6)
+    asyncio.run(client.matrix(stops(50), stops(50), session=object()))
+    client.tiles.clear()
+    # Jeden nový počátek a jeden nový cíl: 50 + 51 prvků, ne celá matice 51 x 51
+    result = asyncio.run(client.matrix(stops(51), stops(51), session=object()))
+    assert sum(len(o) * len(d) for o, d in client.tiles) == 101
+    assert result['duration'][50, 3] == 60 * 53
+    assert result['duration'][3, 50] == 60 * 53
+
+def test_rate_limit_spreads_tiles():
+    client = FakeMatrixClient(elements_per_second=200)
+    began = time.perf_counter()
+    asyncio.run(client.matrix(stops(20), stops(20), session=object()))
+    # 400 elements at 200/s with a one-second burst take at least a second
+    assert time.perf_counter() - began >= 0.9
+
+class TimeoutSession:
+    def get(self, url, params=None):
+        return self
+
+    async def __aenter__(self):
+        raise asyncio.TimeoutError()
+
+    async def __aexit__(self, *exc):
+        return False
+
+def test_upstream_timeout_is_a_runtime_error():
+    client = DistanceMatrixClient(api_key='test', elements_per_second=1e6)
+    with pytest.raises(RuntimeError, match='Distance Matrix API request failed'):
+        asyncio.run(client.matrix(['A'], ['B'], session=TimeoutSession()))
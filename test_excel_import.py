@@ -0,0 +1,95 @@
+import asyncio
+import io
+import json
+from openpyxl import Workbook
+from business.excel_import import ExcelImport, geocode_stops, iter_async, normalize_address
+import routes
+from app import create_app
+
+class FakeGeocoder:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+
+    async def geocode(self, address, session):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+        if address == 'Nowhere':
+            return None
+        number = int(address.split()[-1]) if address[-1].isdigit() else 0
+        return {'formatted_address': address.upper(), 'lat': 50.0 + number / 1000, 'lng': 14.0}
+
+def make_workbook(path, rows, header=('Name', 'Adresa')):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Stops')
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    return path
+
+def test_normalize_address():
+    assert normalize_address('  Praha   1, ') == 'Praha 1'
+    assert normalize_address('') is None
+    assert normalize_address(None) is None
+    assert normalize_address(11000.0) == '11000'
+
+def test_import_detects_column_and_keeps_repeats(tmp_path):
+    path = make_workbook(tmp_path / 'stops.xlsx', [
+        ('a', 'Praha 1'), ('b', 'praha  1'), ('c', None), ('d', 'Brno 2'),
+    ])
+    workbook = ExcelImport(str(path))
+    assert list(workbook.addresses()) == [(2, 'Praha 1'), (3, 'praha 1'), (5, 'Brno 2')]
+    assert workbook.stats == {'column': 'Adresa', 'rows': 4, 'empty': 1, 'addresses': 3}
+
+def test_geocoding_is_bounded_and_ordered(tmp_path):
+    path = make_workbook(tmp_path / 'stops.xlsx', [(i, f'Street {i}') for i in range(200)] + [('x', 'Nowhere')])
+    geocoder = FakeGeocoder()
+    stops = list(iter_async(geocode_stops(ExcelImport(str(path)).addresses(), geocoder,
+                                          concurrency=5, session=object())))
+    assert [stop['row'] for stop in stops] == list(range(2, 203))
+    assert geocoder.max_in_flight == 5
+    assert stops[10]['lat'] == 50.01
+    assert stops[-1]['error'] == 'Address not found'
+
+def test_repeated_addresses_are_geocoded_once(tmp_path):
+    path = make_workbook(tmp_path / 'stops.xlsx', [('a', 'Depot 1'), ('b', 'Street 2'), ('c', 'DEPOT 1')])
+    geocoder = FakeGeocoder()
+    stops = list(iter_async(geocode_stops(ExcelImport(str(path)).addresses(), geocoder, session=object())))
+    assert [(stop['row'], stop['address']) for stop in stops] == [(2, 'Depot 1'), (3, 'Street 2'), (4, 'DEPOT 1')]
+    assert stops[2]['lat'] == stops[0]['lat'] == 50.001
+    assert geocoder.calls == 2
+
+def test_only_the_window_is_deduplicated(tmp_path):
+    # Opakování mimo okno řeší cache geokodéru, import si adresy nepamatuje
+    rows = [('a', 'Depot 1')] + [(i, f'Street {i}') for i in range(10)] + [('z', 'Depot 1')]
+    path = make_workbook(tmp_path / 'stops.xlsx', rows)
+    geocoder = FakeGeocoder()
+    stops = list(iter_async(geocode_stops(ExcelImport(str(path)).addresses(), geocoder,
+                                          concurrency=2, session=object())))
+    assert len(stops) == 12 and stops[-1]['address'] == 'Depot 1'
+    assert geocoder.calls == 12
+
+def test_import_endpoint_streams_ndjson(tmp_path, monkeypatch):
+    geocoder = FakeGeocoder()
+    monkeypatch.setattr(routes, 'geocoding_client', geocoder)
+    path = make_workbook(tmp_path / 'stops.xlsx', [('a', 'Praha 1'), ('b', 'Brno 2'), ('c', 'Praha 1')],
+                         header=('Note', 'Location'))
+    client = create_app().test_client()
+    with open(path, 'rb') as f:
+        response = client.post('/import/excel', data={'file': (f, 'stops.xlsx')})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    # Okružní trasa: poslední zastávka se opakuje a zůstává
+    assert [line['address'] for line in lines[:-1]] == ['Praha 1', 'Brno 2', 'Praha 1']
+    assert lines[-1]['type'] == 'summary'
+    assert lines[-1]['geocoded'] == 3 and lines[-1]['addresses'] == 3
+    assert geocoder.calls == 2
+
+    bad = client.post('/import/excel', data={'file': (io.BytesIO(b'not a workbook'), 'stops.xlsx')})
+    assert bad.status_code == 400
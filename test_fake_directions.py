@@ -0,0 +1,53 @@
+import asyncio
+import os
+import pytest
+from data.google_maps_client import GoogleMapsClient, DirectionsAPIError
+from business.route_planner import RoutePlanner
+from fake_directions import FakeSettings, start_server
+
+async def with_server(settings, work):
+    runner, base_url = await start_server(settings)
+    try:
+        return await work(base_url)
+    finally:
+        await runner.cleanup()
+
+def test_record_then_replay_offline(tmp_path):
+    async def record(base_url):
+        client = GoogleMapsClient(api_key='secret', base_url=base_url, mode='record', recordings_dir=str(tmp_path))
+        return await client.plan_route('Praha', 'Brno', waypoints=['Jihlava'], departure_time=1900000000)
+
+    recorded = asyncio.run(with_server(FakeSettings(latency_ms=0), record))
+    assert len(recorded['routes']) == 3
+    assert [leg['end_address'] for leg in recorded['routes'][0]['legs']] == ['Jihlava', 'Brno']
+    files = [name for _, _, names in os.walk(tmp_path) for name in names]
+    assert len(files) == 1
+    assert 'secret' not in open(next(tmp_path.rglob('*.json')), encoding='utf-8').read()
+
+    # No server is running now; a different key still matches the recording
+    replay = GoogleMapsClient(api_key='other', base_url='http://127.0.0.1:9', mode='replay',
+                              recordings_dir=str(tmp_path))
+    replayed = asyncio.run(replay.plan_route('Praha', 'Brno', waypoints=['Jihlava'], departure_time=1900000000))
+    assert replayed['routes'] == recorded['routes']
+    with pytest.raises(RuntimeError, match='No recorded'):
+        asyncio.run(replay.plan_route('Praha', 'Ostrava', departure_time=1900000000))
+
+def test_fake_server_drives_route_planner():
+    async def plan(base_url):
+        planner = RoutePlanner(google_maps_client=GoogleMapsClient(base_url=base_url, mode='live'))
+        return await planner.plan_route('Praha', 'Brno', departure_time=1900000000)
+
+    route = asyncio.run(with_server(FakeSettings(latency_ms=5, seed=1), plan))
+    assert 'degraded' not in route
+    assert route['model'].summary == 'D1'  # the highway variant is fastest
+    assert route['distance'] > 0 and route['time'] > 0
+
+def test_fake_server_injects_errors():
+    async def plan(base_url):
+        client = GoogleMapsClient(base_url=base_url, mode='live')
+        return await client.plan_route('Praha', 'Brno')
+
+    with pytest.raises(DirectionsAPIError, match='OVER_QUERY_LIMIT'):
+        asyncio.run(with_server(FakeSettings(latency_ms=0, quota_rate=1.0), plan))
+    with pytest.raises(RuntimeError, match='request failed'):
+        asyncio.run(with_server(FakeSettings(latency_ms=0, error_rate=1.0), plan))
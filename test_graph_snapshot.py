@@ -0,0 +1,80 @@
+import shutil
+import pytest
+import db
+import graph_state
+from config import Config
+from graph_snapshot import MappedAdjacency, SnapshotError, write_snapshot, check_snapshot
+from algorithms import find_route
+from init_db import import_graph
+
+@pytest.fixture
+def snapshot_env(tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'places.db')
+    snap_path = str(tmp_path / 'graph.snap')
+    shutil.copy(db.DB_PATH, db_path)
+    monkeypatch.setattr(db, 'DB_PATH', db_path)
+    monkeypatch.setattr(Config, 'DB_PATH', db_path)
+    monkeypatch.setattr(Config, 'GRAPH_SNAPSHOT_PATH', snap_path)
+    graph_state.reset()
+    yield db_path, snap_path
+    graph_state.reset()
+
+def test_snapshot_matches_database(snapshot_env):
+    db_path, snap_path = snapshot_env
+    info = write_snapshot(db_path, snap_path)
+    assert info['edges'] == 3
+    mapped = MappedAdjacency(snap_path, verify=True)
+    assert sorted(mapped.get(1)) == [(2, 1, 200.0, 120.0, 1), (3, 2, 100.0, 60.0, 0)]
+    assert mapped.get(999) == ()
+    assert mapped.coords(2) == (0.8, 0.7)
+    assert check_snapshot(db_path, snap_path) == []
+
+def test_routing_uses_mapped_snapshot(snapshot_env):
+    db_path, snap_path = snapshot_env
+    write_snapshot(db_path, snap_path)
+    assert isinstance(graph_state.get_snapshot().adjacency, MappedAdjacency)
+    assert find_route(1, 2)['route'] == [1, 2]
+    # Změna po sestavení snímku se projeví jako delta a kontrola ji nahlásí
+    graph_state.update_edges([(1, 900, None, None)])
+    assert find_route(1, 2)['route'] == [1, 3, 2]
+    assert check_snapshot(db_path, snap_path) == ['snapshot is at data version 0, database at 1']
+    graph_state.reset()
+    snapshot = graph_state.get_snapshot()
+    assert isinstance(snapshot.adjacency, MappedAdjacency)
+    assert snapshot.delta == {1: (900.0, 120.0, 1)}
+
+def test_corrupted_snapshot_is_rejected(snapshot_env):
+    db_path, snap_path = snapshot_env
+    write_snapshot(db_path, snap_path)
+    with open(snap_path, 'r+b') as f:
+        f.seek(-1, 2)
+        f.write(b'\x07')
+    with pytest.raises(SnapshotError):
+        MappedAdjacency(snap_path, verify=True)
+
+def test_snapshot_older_than_import_is_ignored(snapshot_env, tmp_path):
+    db_path, snap_path = snapshot_env
+    write_snapshot(db_path, snap_path)
+    edges = tmp_path / 'edges.tsv'
+    edges.write_text('u\tv\tlength\ttravel_time\ttoll\n1\t3\t50\t30\tno\n3\t2\t50\t30\tno\n', encoding='utf-8')
+    import_graph(db_path, edges_path=str(edges), replace=True, progress_every=0)
+    graph_state.reset()
+    snapshot = graph_state.get_snapshot()
+    assert not isinstance(snapshot.adjacency, MappedAdjacency)
+    assert snapshot.edge_count == 2
+    assert find_route(1, 2)['route'] == [1, 3, 2]
+
+def test_snapshot_of_another_database_is_ignored(snapshot_env, tmp_path):
+    import sqlite3
+    from init_db import load_demo
+    db_path, snap_path = snapshot_env
+    other = str(tmp_path / 'other.db')
+    for path in (db_path, other):
+        conn = sqlite3.connect(path)
+        load_demo(conn)
+        conn.close()
+    # Both databases are at data version 0 with three edges, but they are different graphs
+    write_snapshot(other, snap_path)
+    assert check_snapshot(db_path, snap_path)[0].startswith('snapshot was built from graph')
+    graph_state.reset()
+    assert not isinstance(graph_state.get_snapshot().adjacency, MappedAdjacency)
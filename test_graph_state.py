@@ -0,0 +1,49 @@
+import shutil
+import pytest
+import db
+import graph_state
+from algorithms import find_route
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    db_path = tmp_path / 'places.db'
+    shutil.copy(db.DB_PATH, db_path)
+    monkeypatch.setattr(db, 'DB_PATH', str(db_path))
+    graph_state.reset()
+    yield db_path
+    graph_state.reset()
+
+def test_update_edges_applies_without_reload(temp_db):
+    snapshot = graph_state.get_snapshot()
+    assert find_route(1, 2, mode='time')['route'] == [1, 2]
+    # Uzavírka na dálnici Praha-Brno
+    version = graph_state.update_edges([(1, None, 500, None)])
+    assert version == snapshot.version + 1
+    assert graph_state.get_version() == version
+    assert graph_state.get_snapshot().adjacency is snapshot.adjacency
+    assert find_route(1, 2, mode='time')['route'] == [1, 3, 2]
+    assert db.get_edge_changes(snapshot.version) == [(1, 200.0, 500.0, 1)]
+
+def test_snapshot_is_isolated_from_updates(temp_db):
+    snapshot = graph_state.get_snapshot()
+    graph_state.update_edges([(2, None, 1, None)])
+    assert [e[3] for e in snapshot.view()[3] if e[1] == 2] == [60.0]
+    assert [e[3] for e in graph_state.get_snapshot().view()[3] if e[1] == 2] == [1]
+
+def test_update_unknown_edge_rolls_back(temp_db):
+    version = graph_state.get_version()
+    with pytest.raises(KeyError):
+        graph_state.update_edges([(1, None, 10, None), (999, None, 10, None)])
+    assert db.get_data_version() == version
+    assert find_route(1, 2, mode='time')['time'] == 120
+
+def test_snapshot_catches_up_with_other_writers(temp_db, monkeypatch):
+    from config import Config
+    monkeypatch.setattr(Config, 'GRAPH_REFRESH_SECONDS', 0)
+    snapshot = graph_state.get_snapshot()
+    # Zápis z jiného procesu jde přímo do databáze
+    version, _ = db.update_edges([(1, None, 500, None)])
+    refreshed = graph_state.get_snapshot()
+    assert refreshed.version == version
+    assert refreshed.adjacency is snapshot.adjacency
+    assert refreshed.delta == {1: (200.0, 500.0, 1)}
@@ -0,0 +1,36 @@
+import sqlite3
+import db
+import graph_state
+from init_db import import_graph
+
+def test_import_graph_from_csv(tmp_path, monkeypatch):
+    places = tmp_path / 'places.csv'
+    places.write_text('osmid,name,lon,lat\n1,A,14.4,50.1\n2,B,16.6,49.2\n3,,15.8,50.2\n', encoding='utf-8')
+    edges = tmp_path / 'edges.tsv'
+    edges.write_text('u\tv\tlength\ttravel_time\ttoll\n1\t2\t200000\t7200\tyes\n1\t3\t100000\t3600\tno\n',
+                     encoding='utf-8')
+    db_path = tmp_path / 'graph.db'
+    counts = import_graph(str(db_path), str(places), str(edges), batch_size=1,
+                          distance_scale=0.001, time_scale=1 / 60, progress_every=0)
+    assert counts == (3, 2)
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT name FROM places WHERE id=3').fetchone() == ('3',)
+    assert conn.execute('SELECT from_id, to_id, distance, time, toll FROM edges ORDER BY id').fetchall() == [
+        (1, 2, 200.0, 120.0, 1), (1, 3, 100.0, 60.0, 0)]
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+    assert {'idx_edges_from', 'idx_edges_to'} <= indexes
+    conn.close()
+
+    # Opakovaný import vynutí úplné znovunačtení grafu v paměti
+    monkeypatch.setattr(db, 'DB_PATH', str(db_path))
+    graph_state.reset()
+    snapshot = graph_state.get_snapshot()
+    import_graph(str(db_path), edges_path=str(edges), replace=True, progress_every=0)
+    assert db.get_edge_changes(snapshot.version) is None
+    # Načítaly se jen hrany, místa zůstávají
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT COUNT(*) FROM places').fetchone() == (3,)
+    assert conn.execute('SELECT COUNT(*) FROM edges').fetchone() == (2,)
+    conn.close()
+    graph_state.reset()
@@ -0,0 +1,106 @@
+import io
+import json
+import logging
+import threading
+import routes
+from app import create_app
+from benchmarks.directions_fixtures import FakeDirectionsClient
+from business.route_planner import RoutePlanner
+from config import Config
+from data.google_maps_client import GoogleMapsClient
+from fake_directions import FakeSettings, start_server
+from utils import event_loop, log
+
+def capture(**options):
+    stream = io.StringIO()
+    log.configure(stream=stream, use_queue=False, **options)
+    return stream
+
+def test_redaction():
+    text = log.redact("GET /json?origin=A&key=AIzaSyABC123&mode=driving {'key': 'AIzaSyABC123', 'token': \"t0k\"}")
+    assert 'AIza' not in text and 't0k' not in text
+    assert 'origin=A&key=***&mode=driving' in text
+    assert log.redact('api key is s3cr3t-value', secrets=('s3cr3t-value',)) == 'api key is ***'
+
+def test_debug_lines_are_sampled_per_call_site():
+    stream = capture(level='DEBUG', debug_sample=4)
+    logger = logging.getLogger('test.sampling')
+    try:
+        for i in range(8):
+            logger.debug('debug %d', i)
+            logger.info('info %d', i)
+    finally:
+        log.configure(level='WARNING', use_queue=False)
+    lines = stream.getvalue().splitlines()
+    assert sum('debug' in line for line in lines) == 2
+    assert sum('info' in line for line in lines) == 8
+
+def test_queue_handler_formats_off_thread():
+    stream = io.StringIO()
+    log.configure(level='INFO', fmt='json', stream=stream, secrets=lambda: ('hidden-key-1',))
+    try:
+        logging.getLogger('test.queue').info('calling with %s', 'hidden-key-1')
+        log.flush()
+    finally:
+        log.configure(level='WARNING', use_queue=False)
+    entry = json.loads(stream.getvalue().splitlines()[0])
+    assert entry['level'] == 'INFO' and entry['logger'] == 'test.queue'
+    assert entry['message'] == 'calling with ***'
+
+def test_json_exception_is_formatted_by_the_listener():
+    class ThreadRecorder:
+        def __str__(self):
+            threads.append(threading.current_thread().name)
+            return 'arg'
+
+    threads = []
+    stream = io.StringIO()
+    log.configure(level='INFO', fmt='json', stream=stream)
+    try:
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            logging.getLogger('test.queue').exception('failed with %s', ThreadRecorder())
+        log.flush()
+    finally:
+        log.configure(level='WARNING', use_queue=False)
+    entry = json.loads(stream.getvalue().splitlines()[0])
+    assert entry['message'] == 'failed with arg'
+    assert 'Traceback' in entry['exc_info'] and 'ValueError: boom' in entry['exc_info']
+    # Náš handler formátuje ve vlákně listeneru (pytest má na rootu vlastní handlery)
+    assert any(name != threading.current_thread().name for name in threads)
+
+def test_request_id_reaches_event_loop_logs(monkeypatch):
+    monkeypatch.setattr(Config, 'LOG_QUEUE', False)
+    monkeypatch.setattr(routes, 'route_planner', RoutePlanner(google_maps_client=FakeDirectionsClient(legs=1, steps=2, routes=1)))
+    client = create_app().test_client()
+    stream = capture(level='INFO', fmt='json')
+    try:
+        response = client.post('/route', json={'start': 'Praha', 'end': 'Brno', 'departure_time': 1900000000},
+                               headers={'X-Request-ID': 'req-42'})
+    finally:
+        log.configure(level='WARNING', use_queue=False)
+    assert response.headers['X-Request-ID'] == 'req-42'
+    entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert {'logger': 'benchmarks.directions_fixtures', 'request_id': 'req-42'}.items() <= next(
+        entry for entry in entries if entry['message'] == 'Fake directions request Praha -> Brno').items()
+    assert client.get('/search?q=x').headers['X-Request-ID'] != 'req-42'
+
+def test_directions_client_never_logs_the_key():
+    stream = capture(level='DEBUG')
+
+    async def plan():
+        runner, base_url = await start_server(FakeSettings(latency_ms=0))
+        try:
+            client = GoogleMapsClient(api_key='AIzaSecretKey', base_url=base_url, mode='live')
+            return await client.plan_route('Praha', 'Brno')
+        finally:
+            await runner.cleanup()
+
+    try:
+        event_loop.run(plan())
+    finally:
+        log.configure(level='WARNING', use_queue=False)
+    output = stream.getvalue()
+    assert 'Requesting route Praha -> Brno' in output
+    assert 'AIzaSecretKey' not in output
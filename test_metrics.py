@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+import routes
+from app import create_app
+from benchmarks.directions_fixtures import FakeDirectionsClient
+from business.route_planner import RoutePlanner
+from utils.metrics import Counter, Gauge, Histogram, Registry, upstream_call, ROUTE_STAGE_SECONDS, UPSTREAM_SECONDS
+
+def test_text_format():
+    registry = Registry()
+    requests = Counter('requests_total', 'Requests', ('path',), registry=registry)
+    in_flight = Gauge('in_flight', 'In flight', registry=registry)
+    latency = Histogram('latency_seconds', 'Latency', ('path',), buckets=(0.1, 1), registry=registry)
+    requests.inc('/a "quoted"')
+    requests.inc('/a "quoted"', amount=2)
+    in_flight.inc()
+    for value in (0.05, 0.5, 5):
+        latency.observe(value, '/a')
+    registry.register_collector(lambda: [('cache_hit_ratio', 'gauge', 'Ratio', [({'cache': 'x'}, 0.25)])])
+
+    text = registry.render()
+    assert '# TYPE requests_total counter\nrequests_total{path="/a \\"quoted\\""} 3\n' in text
+    assert 'in_flight 1\n' in text
+    assert 'latency_seconds_bucket{path="/a",le="0.1"} 1\n' in text
+    assert 'latency_seconds_bucket{path="/a",le="1"} 2\n' in text
+    assert 'latency_seconds_bucket{path="/a",le="+Inf"} 3\n' in text
+    assert 'latency_seconds_sum{path="/a"} 5.55\n' in text
+    assert 'latency_seconds_count{path="/a"} 3\n' in text
+    assert 'cache_hit_ratio{cache="x"} 0.25\n' in text
+    with pytest.raises(ValueError):
+        requests.inc()
+    with pytest.raises(ValueError):
+        Counter('requests_total', 'Again', registry=registry)
+
+def test_upstream_call_status():
+    async def call(status, error=None):
+        with upstream_call('test_api') as timer:
+            timer.status = status
+            if error:
+                raise error
+
+    before = UPSTREAM_SECONDS.count('test_api', 'OK')
+    asyncio.run(call('OK'))
+    assert UPSTREAM_SECONDS.count('test_api', 'OK') == before + 1
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(call(None, asyncio.TimeoutError()))
+    assert UPSTREAM_SECONDS.count('test_api', 'timeout') >= 1
+
+def test_route_records_stages_and_metrics_endpoint(monkeypatch):
+    monkeypatch.setattr(routes, 'route_planner', RoutePlanner(google_maps_client=FakeDirectionsClient()))
+    client = create_app().test_client()
+    stages = ('validate', 'plan', 'upstream', 'extract', 'parse', 'tolls', 'build_response', 'serialize')
+    before = {stage: ROUTE_STAGE_SECONDS.count(stage) for stage in stages}
+
+    response = client.post('/route', json={'start': 'Praha', 'end': 'Brno', 'departure_time': 1900000000})
+    assert response.status_code == 200
+    for stage in stages:
+        assert ROUTE_STAGE_SECONDS.count(stage) == before[stage] + 1, stage
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'route_stage_seconds_bucket{stage="serialize",le="0.0005"}' in text
+    assert 'http_requests_total{endpoint="/route",method="POST",status="200"}' in text
+    assert 'http_requests_in_flight{endpoint="/metrics"} 1' in text
+    assert 'cache_hit_ratio{cache="directions_live"}' in text
+    assert '# TYPE db_query_seconds histogram' in text
+
+    monkeypatch.setattr(routes.Config, 'METRICS_ENABLED', False)
+    assert client.get('/metrics').status_code == 404
@@ -0,0 +1,71 @@
+import pstats
+import time
+import routes
+from app import create_app
+from benchmarks.directions_fixtures import FakeDirectionsClient
+from business.route_planner import RoutePlanner
+from config import Config
+from utils.profiling import Profile, ProfileStore, ProfilingMiddleware
+
+def make_client(monkeypatch, **settings):
+    monkeypatch.setattr(Config, 'PROFILING_ENABLED', True)
+    for name, value in settings.items():
+        monkeypatch.setattr(Config, name, value)
+    monkeypatch.setattr(routes, 'route_planner', RoutePlanner(google_maps_client=FakeDirectionsClient()))
+    monkeypatch.setattr(routes, 'profile_store', ProfileStore(keep=3))
+    return create_app().test_client()
+
+def test_disabled_by_default():
+    app = create_app()
+    assert not isinstance(app.wsgi_app, ProfilingMiddleware)
+    client = app.test_client()
+    response = client.get('/search?q=x', headers={'X-Profile': '1'})
+    assert 'X-Profile-Id' not in response.headers
+    assert client.get('/admin/profiles').status_code == 404
+
+def test_on_demand_profile_covers_route_planning(monkeypatch, tmp_path):
+    client = make_client(monkeypatch)
+    response = client.post('/route', json={'start': 'Praha', 'end': 'Brno', 'departure_time': 1900000000},
+                           headers={'X-Profile': '1'})
+    assert response.status_code == 200
+    profile_id = response.headers['X-Profile-Id']
+
+    listed = client.get('/admin/profiles').get_json()['profiles']
+    assert [(p['id'], p['mode'], p['path'], p['status']) for p in listed] == [(profile_id, 'on_demand', '/route', 200)]
+    # Work done inside plan_route is seen although it is a coroutine
+    report = client.get(f'/admin/profiles/{profile_id}?limit=1000').get_data(as_text=True)
+    assert '(plan_route)' in report and '(select_route)' in report
+
+    path = tmp_path / 'route.prof'
+    path.write_bytes(client.get(f'/admin/profiles/{profile_id}?format=pstats').data)
+    assert pstats.Stats(str(path)).total_calls > 0
+    assert client.get('/admin/profiles/unknown').status_code == 404
+    assert client.get('/search?q=x').headers.get('X-Profile-Id') is None
+
+def test_token_guards_flag_and_admin(monkeypatch):
+    client = make_client(monkeypatch, PROFILING_TOKEN='s3cret')
+    assert 'X-Profile-Id' not in client.get('/search?q=x&profile=1').headers
+    assert client.get('/admin/profiles').status_code == 403
+    response = client.get('/search?q=x&profile=1', headers={'X-Profile-Token': 's3cret'})
+    assert 'X-Profile-Id' in response.headers
+    assert len(client.get('/admin/profiles', headers={'X-Profile-Token': 's3cret'}).get_json()['profiles']) == 1
+
+def test_store_keeps_slowest_sampled():
+    store = ProfileStore(keep=2)
+    for i, duration in enumerate([0.3, 0.1, 0.5, 0.2]):
+        store.add(Profile(f's{i}', 'sampled', 'GET', '/x', '', 200, duration, {}))
+    store.add(Profile('d0', 'on_demand', 'GET', '/x', '', 200, 0.01, {}))
+    assert [p.id for p in store.list()] == ['d0', 's2', 's0']
+
+def test_sampling_one_in_n():
+    def app(environ, start_response):
+        time.sleep(0.001)
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [b'ok']
+
+    store = ProfileStore(keep=10)
+    middleware = ProfilingMiddleware(app, store, sample_every=3)
+    for _ in range(9):
+        assert middleware({'PATH_INFO': '/x', 'REQUEST_METHOD': 'GET'}, lambda *args: None) == [b'ok']
+    assert len(store.list()) == 3
+    assert all(p.mode == 'sampled' and p.status == 200 for p in store.list())
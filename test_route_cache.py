@@ -0,0 +1,65 @@
+import shutil
+import pytest
+import db
+import graph_state
+from algorithms import find_route
+from route_cache import route_cache, LRUCache
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    db_path = tmp_path / 'places.db'
+    shutil.copy(db.DB_PATH, db_path)
+    monkeypatch.setattr(db, 'DB_PATH', str(db_path))
+    graph_state.reset()
+    route_cache.clear()
+    yield db_path
+    graph_state.reset()
+    route_cache.clear()
+
+def test_lru_eviction_and_version():
+    cache = LRUCache(2)
+    assert cache.get(1, 'a') is None
+    cache.put(1, 'a', 1)
+    cache.put(1, 'b', 2)
+    cache.get(1, 'a')
+    cache.put(1, 'c', 3)
+    assert cache.get(1, 'b') is None
+    assert cache.get(1, 'a') == 1
+    # Nová verze grafu cache vyprázdní
+    assert cache.get(2, 'a') is None
+    assert cache.stats()['size'] == 0
+    # Dotaz se starší verzí je jen minutí, novější položky zůstávají
+    cache.put(2, 'a', 4)
+    assert cache.get(1, 'a') is None
+    assert cache.get(2, 'a') == 4
+    assert cache.stats()['version'] == 2
+    # Verze (databáze, verze dat): jiná databáze cache vždy vyprázdní
+    cache = LRUCache(2)
+    cache.get(('b.db', 5), 'a')
+    cache.put(('b.db', 5), 'a', 1)
+    assert cache.get(('b.db', 4), 'a') is None
+    assert cache.get(('b.db', 5), 'a') == 1
+    assert cache.get(('a.db', 0), 'a') is None
+    assert cache.stats()['size'] == 0
+
+def test_find_route_hits_cache_and_invalidates(temp_db):
+    first = find_route(1, 2, mode='time')
+    first['route'].append('x')
+    assert find_route(1, 2, mode='time')['route'] == [1, 2]
+    assert route_cache.paths.hits == 1
+    graph_state.update_edges([(1, None, 500, None)])
+    assert find_route(1, 2, mode='time')['route'] == [1, 3, 2]
+    assert find_route(999, 1, mode='time') is None
+    assert find_route(999, 1, mode='time') is None
+
+def test_hot_origin_uses_tree(temp_db):
+    route_cache.hot_threshold = 2
+    try:
+        find_route(1, 2)
+        find_route(1, 3)
+        assert route_cache.trees.stats()['size'] == 1
+        assert find_route(1, 3)['distance'] == 100
+        assert find_route(1, 1)['route'] == [1]
+        assert route_cache.trees.hits == 1
+    finally:
+        route_cache.hot_threshold = 5
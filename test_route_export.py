@@ -0,0 +1,77 @@
+import csv
+import io
+import xml.etree.ElementTree as ET
+from openpyxl import load_workbook
+from business.route_export import decode_polyline, iter_csv, iter_gpx, iter_xlsx
+from app import create_app
+
+GPX = '{http://www.topografix.com/GPX/1/1}'
+
+def make_route(stops=3, steps=4):
+    return {
+        'stops': [{'address': f'Stop <{i}> & co', 'lat': 50 + i / 10, 'lng': 14.0, 'type': 'waypoint',
+                   'distance': f'{i} km', 'duration': f'{i} mins'} for i in range(stops)],
+        'legs': [{'steps': [{'html_instructions': f'Turn <b>left</b> {j}', 'distance': {'value': 100 * j},
+                             'duration': {'value': 10 * j},
+                             'polyline': {'points': '_p~iF~ps|U_ulLnnqC_mqNvxq`@'}}
+                            for j in range(steps)]}
+                 for _ in range(stops - 1)],
+        'polyline': '_p~iF~ps|U_ulLnnqC_mqNvxq`@',
+        'distance': 12.3, 'duration': 900, 'duration_in_traffic': 960, 'tolls': False
+    }
+
+def test_decode_polyline():
+    assert list(decode_polyline('_p~iF~ps|U_ulLnnqC_mqNvxq`@')) == [
+        (38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+
+def test_malformed_polyline_is_cut_short():
+    # Useknutý řetězec i neplatné znaky: vrátí se jen body před chybou
+    assert list(decode_polyline('_p~iF~ps|U_')) == [(38.5, -120.2)]
+    assert list(decode_polyline('_p~iF~ps|U_ul\n')) == [(38.5, -120.2)]
+    assert list(decode_polyline('_')) == []
+
+def test_csv_export():
+    text = ''.join(iter_csv([make_route(), make_route(stops=2)]))
+    rows = list(csv.reader(io.StringIO(text)))
+    assert rows[0][:4] == ['Route', 'Stop', 'Type', 'Address']
+    assert len(rows) == 1 + 3 + 2
+    assert rows[1][:2] == ['1', 'A'] and rows[4][:2] == ['2', 'A']
+    assert rows[1][3] == 'Stop <0> & co'
+
+def test_gpx_export_is_valid_xml():
+    root = ET.fromstring(''.join(iter_gpx([make_route(), make_route()])))
+    assert len(root.findall(f'{GPX}wpt')) == 6
+    tracks = root.findall(f'{GPX}trk')
+    assert len(tracks) == 2
+    # 2 legs x 4 steps x 3 points per step polyline
+    assert len(tracks[0].findall(f'{GPX}trkseg/{GPX}trkpt')) == 24
+    assert root.find(f'{GPX}wpt/{GPX}desc').text == 'Stop <0> & co'
+
+def test_xlsx_export(tmp_path):
+    path = tmp_path / 'route.xlsx'
+    path.write_bytes(b''.join(iter_xlsx([make_route()])))
+    workbook = load_workbook(path, read_only=True)
+    assert workbook.sheetnames == ['Stops', 'Steps', 'Route Summary']
+    steps = list(workbook['Steps'].iter_rows(values_only=True))
+    assert len(steps) == 1 + 2 * 4
+    assert steps[2][3] == 'Turn left 1'
+    summary = list(workbook['Route Summary'].iter_rows(values_only=True))
+    assert summary[1][:4] == (1, 12.3, 15, 16)
+
+def test_export_endpoint():
+    client = create_app().test_client()
+    response = client.post('/export/gpx', json={'routes': [make_route()]})
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.headers['Content-Disposition'].startswith('attachment; filename="route_')
+    assert b'<trkpt' in response.get_data()
+    assert client.post('/export/pdf', json=make_route()).status_code == 400
+    assert client.post('/export/csv', json={'routes': []}).status_code == 400
+    assert client.post('/export/csv', json=make_route()).status_code == 200
+
+def test_gpx_export_with_malformed_polyline():
+    client = create_app().test_client()
+    response = client.post('/export/gpx', json={'stops': ['A', 'B'], 'polyline': '_p~iF~ps|U_'})
+    assert response.status_code == 200
+    root = ET.fromstring(response.get_data(as_text=True))
+    assert len(root.findall(f'{GPX}trk/{GPX}trkseg/{GPX}trkpt')) == 1
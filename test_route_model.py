@@ -0,0 +1,40 @@
+from business.route_model import Route, select_route
+from business.route_planner import RoutePlanner
+from benchmarks.directions_fixtures import make_directions
+
+def test_select_route_single_pass_totals():
+    data = make_directions(legs=3, steps=5, routes=2, toll_every=4)
+    raw, model = select_route(data, 'fastest')
+    # Druhá alternativa má o sekundu delší dobu v provozu na každém úseku
+    assert raw is data['routes'][0]
+    legs = raw['legs']
+    assert model.distance == sum(leg['distance']['value'] for leg in legs)
+    assert model.duration_in_traffic == sum(leg['duration_in_traffic']['value'] for leg in legs)
+    assert model.tolls is True
+    assert len(model.legs[0].steps()) == 5
+
+def test_stops_and_numeric_fields():
+    model = Route.from_directions({'legs': [
+        {'distance': 1500, 'duration': {'value': 60, 'text': '1 min'}, 'end_address': 'B',
+         'steps': [{'html_instructions': 'Toll road'}]},
+        {'distance': {'value': 500, 'text': '0.5 km'}, 'end_address': 'C', 'end_location': {'lat': 1, 'lng': 2}},
+    ]})
+    assert model.distance == 2000
+    assert model.effective_duration == 60
+    assert model.tolls is True
+    stops = model.stops('A')
+    assert stops[0] == {'address': 'A', 'type': 'origin'}
+    assert stops[1] == {'address': 'B', 'type': 'waypoint', 'duration': '1 min', 'duration_sec': 60}
+    assert stops[2] == {'address': 'C', 'type': 'destination', 'distance': '0.5 km', 'distance_value': 500,
+                        'lat': 1, 'lng': 2}
+
+def test_extract_routes_keep_response_shape():
+    planner = RoutePlanner(google_maps_client=object())
+    data = make_directions(legs=2, steps=3, routes=3)
+    fastest = planner._extract_fastest_route(data)
+    shortest = planner._extract_shortest_route(data)
+    assert fastest['legs'] is fastest['model'].raw_legs
+    assert fastest['time'] == fastest['model'].duration_in_traffic / 60
+    assert shortest['distance'] == min(
+        sum(leg['distance']['value'] for leg in route['legs']) for route in data['routes']) / 1000
+    assert planner._extract_fastest_route({'routes': []}) is None
@@ -0,0 +1,230 @@
+import asyncio
+import threading
+import time
+import pytest
+from business.route_planner import RoutePlanner
+from benchmarks.directions_fixtures import make_directions
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+class SlowTrafficClient:
+    """Fake Directions client: 0.2 s per call, least traffic at 09:00."""
+
+    def __init__(self):
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def plan_route(self, departure_time=None, **kwargs):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.2)
+        finally:
+            self.in_flight -= 1
+        data = make_directions(legs=1, steps=2, routes=1)
+        hour = time.localtime(departure_time).tm_hour
+        data['routes'][0]['legs'][0]['duration_in_traffic']['value'] = 3600 + abs(hour - 9) * 600
+        return data
+
+def test_departure_sweep_is_concurrent_and_cached():
+    client = SlowTrafficClient()
+    planner = RoutePlanner(google_maps_client=client)
+    start = int(time.mktime((2030, 5, 6, 6, 0, 0, 0, 0, -1)))
+    end = start + 11 * 3600
+    result = asyncio.run(planner.departure_sweep('Praha', 'Brno', start, end, step_minutes=60))
+    assert len(result['departures']) == 12
+    assert client.max_in_flight == 12  # všechny odjezdy se ptají současně
+    assert result['best']['departure_time'] == start + 3 * 3600
+    assert result['best']['duration_in_traffic'] == 3600
+
+    again = asyncio.run(planner.departure_sweep('Praha', 'Brno', start, end, step_minutes=60))
+    assert client.calls == 12
+    assert all(slot['cached'] for slot in again['departures'])
+
+def test_departure_sweep_budget():
+    planner = RoutePlanner(google_maps_client=SlowTrafficClient())
+    start = int(time.mktime((2030, 5, 6, 6, 0, 0, 0, 0, -1)))
+    result = asyncio.run(planner.departure_sweep('Praha', 'Brno', start, start + 3600, budget_seconds=0.05))
+    assert result['best'] is None
+    assert {slot['error'] for slot in result['departures']} == {'timeout'}
+    # Nulový limit se nebere jako výchozí hodnota
+    result = asyncio.run(planner.departure_sweep('Praha', 'Brno', start, start + 3600, budget_seconds=0))
+    assert {slot['error'] for slot in result['departures']} == {'timeout'}
+    with pytest.raises(ValueError):
+        asyncio.run(planner.departure_sweep('Praha', 'Brno', start, start + 3600, budget_seconds=-1))
+
+def test_departure_sweep_rejects_tiny_steps_and_huge_windows():
+    planner = RoutePlanner(google_maps_client=SlowTrafficClient())
+    start = int(time.mktime((2030, 5, 6, 6, 0, 0, 0, 0, -1)))
+    with pytest.raises(ValueError, match='at least one second'):
+        asyncio.run(planner.departure_sweep('Praha', 'Brno', start, start + 3600, step_minutes=0.001))
+    # Rok po sekundách: odmítnuto podle počtu, seznam se nevytváří
+    with pytest.raises(ValueError, match='Too many departure slots'):
+        asyncio.run(planner.departure_sweep('Praha', 'Brno', start, start + 365 * 86400, step_minutes=1 / 60))
+
+def test_departure_sweep_endpoint_validates_budget():
+    from app import create_app
+    client = create_app().test_client()
+    payload = {'start': 'Praha', 'end': 'Brno', 'window_start': 1900000000, 'window_end': 1900003600}
+    for budget in (-1, 'x', True):
+        response = client.post('/route/departure-sweep', json=dict(payload, budget_seconds=budget))
+        assert response.status_code == 400
+        assert 'budget_seconds' in response.get_json()['error']
+    response = client.post('/route/departure-sweep', json=dict(payload, step_minutes=0.001))
+    assert response.status_code == 400
+    assert 'step_minutes' in response.get_json()['error']
+
+class TrafficModelClient:
+    """Fake client: 0.2 s per call, leg durations scaled by traffic model."""
+    FACTORS = {'optimistic': 0.8, 'best_guess': 1.0, 'pessimistic': 1.5}
+
+    def __init__(self, fail=()):
+        self.fail = fail
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def plan_route(self, traffic_model=None, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.2)
+        finally:
+            self.in_flight -= 1
+        if traffic_model in self.fail:
+            raise RuntimeError('quota')
+        data = make_directions(legs=2, steps=2, routes=1)
+        for leg in data['routes'][0]['legs']:
+            leg['duration_in_traffic']['value'] = int(1000 * self.FACTORS[traffic_model])
+        return data
+
+def test_traffic_range_is_concurrent():
+    client = TrafficModelClient()
+    planner = RoutePlanner(google_maps_client=client)
+    route = asyncio.run(planner.plan_route('Praha', 'Brno', traffic_range=True))
+    assert client.max_in_flight == 3  # tři modely provozu naráz
+    assert route['traffic_range']['legs'] == [{'min': 800, 'expected': 1000, 'max': 1500}] * 2
+    assert route['traffic_range']['total'] == {'min': 1600, 'expected': 2000, 'max': 3000}
+    assert route['time'] == 2000 / 60
+
+def test_traffic_range_tolerates_failed_model():
+    planner = RoutePlanner(google_maps_client=TrafficModelClient(fail=('pessimistic',)))
+    route = asyncio.run(planner.plan_route('Praha', 'Brno', traffic_range=True))
+    assert route['traffic_range']['models'] == ['optimistic', 'best_guess']
+    assert route['traffic_range']['total']['max'] == 2000
+
+class CountingClient:
+    def __init__(self, delay=0.2):
+        self.calls = 0
+        self.finished = 0
+        self.delay = delay
+        self.release = threading.Event()
+        self.release.set()
+
+    async def plan_route(self, **kwargs):
+        self.calls += 1
+        calls = self.calls
+        await asyncio.sleep(self.delay)
+        # Zadržený požadavek čeká na uvolnění testem (nejvýš 5 s)
+        for _ in range(500):
+            if self.release.is_set():
+                break
+            await asyncio.sleep(0.01)
+        data = make_directions(legs=1, steps=2, routes=1)
+        data['routes'][0]['legs'][0]['duration_in_traffic']['value'] = 1000 + calls
+        self.finished += 1
+        return data
+
+def test_live_routes_are_served_stale_while_revalidating():
+    client = CountingClient()
+    planner = RoutePlanner(google_maps_client=client)
+    planner.live_cache.soft_ttl = 0.3
+
+    first = asyncio.run(planner.plan_route('Praha', 'Brno'))
+    assert first['cache']['status'] == 'miss'
+    assert asyncio.run(planner.plan_route('Praha', 'Brno'))['cache']['status'] == 'fresh'
+
+    time.sleep(0.35)
+    client.release.clear()
+    stale = asyncio.run(planner.plan_route('Praha', 'Brno'))
+    # Obnova je zadržená, odpověď na ni tedy nečekala
+    assert client.finished == 1
+    assert stale['cache']['status'] == 'stale'
+    assert stale['time'] == 1001 / 60
+
+    client.release.set()
+    deadline = time.monotonic() + 5
+    refreshed = stale
+    while refreshed['cache']['status'] != 'fresh' and time.monotonic() < deadline:
+        time.sleep(0.01)
+        refreshed = asyncio.run(planner.plan_route('Praha', 'Brno'))
+    assert refreshed['cache']['status'] == 'fresh'
+    assert refreshed['time'] == 1002 / 60
+    assert client.calls == 2
+
+def test_concurrent_misses_share_one_request():
+    client = CountingClient()
+    planner = RoutePlanner(google_maps_client=client)
+
+    async def burst():
+        return await asyncio.gather(*(planner.plan_route('Praha', 'Brno') for _ in range(5)))
+
+    routes = asyncio.run(burst())
+    assert client.calls == 1
+    assert {route['cache']['status'] for route in routes} == {'miss'}
+    # Explicit departure times bypass the live cache
+    asyncio.run(planner.plan_route('Praha', 'Brno', departure_time=1900000000))
+    assert client.calls == 2
+
+class FailingClient:
+    def __init__(self):
+        self.calls = 0
+
+    async def plan_route(self, **kwargs):
+        self.calls += 1
+        raise RuntimeError('Google Maps API error: OVER_QUERY_LIMIT')
+
+def test_upstream_failure_falls_back_to_local_graph():
+    client = FailingClient()
+    planner = RoutePlanner(google_maps_client=client)
+    route = asyncio.run(planner.plan_route('Praha, Czechia', 'Brno', departure_time=1900000000))
+    assert route['degraded']['source'] == 'local_graph'
+    assert 'OVER_QUERY_LIMIT' in route['degraded']['reason']
+    model = route['model']
+    assert [leg.end_address for leg in model.legs] == ['Brno']
+    assert model.distance == 200000 and model.duration == 7200  # Praha -> Brno edge: 200 km, 120 min
+    assert model.tolls
+    assert route['overview_polyline']
+
+    # Once the failure rate trips the breaker the upstream is no longer called
+    for _ in range(planner.breaker.min_calls):
+        asyncio.run(planner.plan_route('Praha', 'Brno', departure_time=1900000000))
+    calls = client.calls
+    assert planner.breaker.state == 'open'
+    assert asyncio.run(planner.plan_route('Praha', 'Brno', departure_time=1900000000))['degraded']
+    assert client.calls == calls
+
+def test_unknown_places_are_not_answered_locally():
+    planner = RoutePlanner(google_maps_client=FailingClient())
+    with pytest.raises(RuntimeError, match='OVER_QUERY_LIMIT'):
+        asyncio.run(planner.plan_route('Nowhere', 'Brno', departure_time=1900000000))
+
+def test_circuit_breaker_half_open_probe():
+    breaker = CircuitBreaker(failure_rate=0.5, window=4, min_calls=2, open_seconds=0.05)
+
+    async def fail():
+        raise RuntimeError('down')
+
+    async def ok():
+        return 'ok'
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match='down'):
+            asyncio.run(breaker.call(fail))
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(breaker.call(ok))
+    time.sleep(0.06)
+    assert breaker.state == 'half_open'
+    assert asyncio.run(breaker.call(ok)) == 'ok'
+    assert breaker.state == 'closed'
@@ -0,0 +1,32 @@
+import pytest
+from routing_pool import RoutingPool, PoolBusyError
+
+def test_inline_pool_runs_jobs():
+    pool = RoutingPool(workers=0, max_queue=2, timeout=5)
+    assert pool.run('find_route', 1, 2)['route'] == [1, 2]
+    assert pool.matrix([1, 3], [2]) == [[120], [90]]
+    with pytest.raises(ValueError):
+        pool.run('eval', '1')
+
+def test_queue_limit():
+    pool = RoutingPool(workers=0, max_queue=1, timeout=5)
+    pool._slots.acquire()
+    with pytest.raises(PoolBusyError):
+        pool.run('find_route', 1, 2)
+    pool._slots.release()
+
+def test_process_pool_matches_inline():
+    pool = RoutingPool(workers=2, max_queue=8, timeout=30)
+    try:
+        assert pool.run('find_alternatives', 1, 2, k=2)[1]['route'] == [1, 3, 2]
+        assert pool.matrix([1, 2, 3], [1, 2]) == [[0, 120], [120, 0], [60, 90]]
+        # Statistiky cache se sčítají z workerů, ne z tohoto procesu
+        before = pool.cache_stats()['paths']
+        for _ in range(3):
+            assert pool.run('find_route', 1, 2)['route'] == [1, 2]
+        stats = pool.cache_stats()
+        assert 1 <= stats['workers'] <= 2
+        assert stats['paths']['hits'] + stats['paths']['misses'] == before['hits'] + before['misses'] + 3
+        assert stats['paths']['hits'] >= 1
+    finally:
+        pool.shutdown()
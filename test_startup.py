@@ -0,0 +1,83 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import app as app_module
+import routes
+import warmup
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Generous for slow CI machines; a cold import was over 0.5 s before lazy initialisation
+IMPORT_BUDGET = float(os.environ.get('STARTUP_IMPORT_BUDGET', 0.5))
+FIRST_REQUEST_BUDGET = float(os.environ.get('STARTUP_FIRST_REQUEST_BUDGET', 1.0))
+HEAVY_MODULES = ('aiohttp', 'numpy', 'openpyxl', 'requests')
+
+IMPORT_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+''' % (HEAVY_MODULES,)
+
+FIRST_REQUEST_SCRIPT = '''
+import json, time
+from app import create_app
+from benchmarks.directions_fixtures import FakeDirectionsClient
+import routes
+
+client = create_app().test_client()
+timings = {}
+started = time.perf_counter()
+routes.service('route_planner').google_maps_client = FakeDirectionsClient(steps=8)
+response = client.post('/route', json={'start': 'Praha', 'end': 'Brno', 'departure_time': 1900000000})
+assert response.status_code == 200, response.get_data(as_text=True)
+timings['route'] = time.perf_counter() - started
+started = time.perf_counter()
+response = client.post('/local-route', json={'start': 1, 'end': 2})
+assert response.status_code == 200, response.get_data(as_text=True)
+timings['local_route'] = time.perf_counter() - started
+print(json.dumps(timings))
+'''
+
+def run_script(script):
+    env = dict(os.environ, LOG_LEVEL='WARNING', WARMUP_ON_START='0', ROUTING_WORKERS='0')
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, capture_output=True,
+                            text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_import_is_lazy_and_within_budget():
+    runs = [run_script(IMPORT_SCRIPT) for _ in range(3)]
+    assert runs[0]['loaded'] == [], f'heavy modules imported by "import app": {runs[0]["loaded"]}'
+    seconds = statistics.median(run['seconds'] for run in runs)
+    assert seconds < IMPORT_BUDGET, f'import app took {seconds:.3f} s (budget {IMPORT_BUDGET} s)'
+
+def test_first_requests_within_budget():
+    timings = run_script(FIRST_REQUEST_SCRIPT)
+    for name, seconds in timings.items():
+        assert seconds < FIRST_REQUEST_BUDGET, f'first {name} took {seconds:.3f} s (budget {FIRST_REQUEST_BUDGET} s)'
+
+def test_app_attribute_is_created_on_access():
+    assert app_module.app is app_module.app
+    assert app_module.app.name == 'app'
+
+def test_readiness_reports_warm_up():
+    warmup.reset()
+    try:
+        client = app_module.create_app().test_client()
+        first = client.get('/ready')
+        assert first.status_code in (200, 503)
+        deadline = time.time() + 30
+        while client.get('/ready').status_code != 200 and time.time() < deadline:
+            time.sleep(0.05)
+        state = client.get('/ready').get_json()
+        assert state['status'] == 'ready'
+        assert set(state['steps']) == {'database', 'event_loop', 'graph', 'upstream_clients', 'routing_pool'}
+        assert routes.route_planner is not None
+        assert warmup.warm_up() is True  # already warm: returns at once
+    finally:
+        warmup.reset()
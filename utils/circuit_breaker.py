@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the upstream while the circuit is open."""
+
+
+class CircuitBreaker:
+    """Failure-rate and latency circuit breaker for an async upstream.
+
+    The circuit opens when at least ``min_calls`` of the last ``window``
+    calls were recorded and ``failure_rate`` of them failed; a call slower
+    than ``slow_call_seconds`` counts as a failure even if it succeeded.
+    After ``open_seconds`` the circuit is half-open and lets
+    ``half_open_calls`` probes through: a successful probe closes it, a
+    failed one opens it again. ``is_failure`` decides which exceptions count.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_rate=0.5, window=20, min_calls=5, slow_call_seconds=None,
+                 open_seconds=30, half_open_calls=1, timeout=None, is_failure=None):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.timeout = timeout
+        self.is_failure = is_failure or (lambda e: True)
+        self._results = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now):
+        if self._state == self.OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def allow(self):
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                return True
+            return False
+
+    def record(self, ok):
+        with self._lock:
+            now = time.monotonic()
+            if self._current_state(now) == self.HALF_OPEN:
+                if ok:
+                    self._state = self.CLOSED
+                    self._results.clear()
+                else:
+                    self._open(now)
+                return
+            self._results.append(ok)
+            failures = self._results.count(False)
+            if len(self._results) >= self.min_calls and failures >= self.failure_rate * len(self._results):
+                self._open(now)
+
+    def _release_probe(self):
+        # A cancelled probe gives its slot back so the circuit cannot stay stuck half-open
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def _open(self, now):
+        self._state = self.OPEN
+        self._opened_at = now
+        self._results.clear()
+
+    async def call(self, fetch):
+        """Await ``fetch()`` through the breaker (``fetch`` returns a coroutine)."""
+        if not self.allow():
+            raise CircuitOpenError('Upstream circuit is open')
+        started = time.monotonic()
+        try:
+            if self.timeout:
+                result = await asyncio.wait_for(fetch(), self.timeout)
+            else:
+                result = await fetch()
+        except asyncio.CancelledError:
+            self._release_probe()
+            raise
+        except asyncio.TimeoutError:
+            self.record(False)
+            raise RuntimeError(f'Upstream request timed out after {self.timeout} s') from None
+        except Exception as e:
+            self.record(not self.is_failure(e))
+            raise
+        slow = self.slow_call_seconds is not None and time.monotonic() - started > self.slow_call_seconds
+        self.record(not slow)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self._current_state(time.monotonic()),
+                'calls': len(self._results),
+                'failures': self._results.count(False),
+            }
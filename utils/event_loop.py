@@ -0,0 +1,60 @@
+"""Process-wide asyncio event loop running in a daemon thread.
+
+Flask handlers are synchronous; they hand coroutines to this loop instead of
+starting a fresh loop per request, so tasks that outlive a request (such as
+background cache refreshes) have somewhere to run.
+"""
+import asyncio
+import contextvars
+import threading
+from contextlib import contextmanager
+
+_loop = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_loop():
+    global _loop
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='event-loop', daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+async def _in_context(coro, context):
+    # Tasks run in their own copy of the loop thread's context; carry over the
+    # caller's context variables (such as the request ID used in log lines)
+    for var, value in context.items():
+        var.set(value)
+    return await coro
+
+
+def submit(coro):
+    """Schedule a coroutine on the shared loop; returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(_in_context(coro, contextvars.copy_context()), get_loop())
+
+
+@contextmanager
+def inline():
+    """Make ``run`` execute coroutines on the calling thread, in a private loop.
+
+    Used while a request is profiled so its async work is seen by the
+    thread's profiler; background tasks still go to the shared loop.
+    """
+    previous = getattr(_local, 'inline', False)
+    _local.inline = True
+    try:
+        yield
+    finally:
+        _local.inline = previous
+
+
+def run(coro, timeout=None):
+    """Run a coroutine on the shared loop and wait for its result."""
+    if getattr(_local, 'inline', False):
+        return asyncio.run(asyncio.wait_for(coro, timeout))
+    return submit(coro).result(timeout)
@@ -0,0 +1,161 @@
+"""Application logging: levels, request IDs, redaction and a queue handler.
+
+Modules log through ``logging.getLogger(__name__)`` with %-style arguments,
+so a record below the configured level costs one level check and nothing
+is formatted. ``configure`` routes records through a ``QueueHandler``: the
+request thread only puts the record on a queue, and a listener thread
+formats and writes it. On the way out, API keys and ``key=``/``token=``
+parameters are masked and every line gets the ID of the request that
+logged it. Debug lines can be sampled to one in N per call site.
+"""
+import atexit
+import contextvars
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+import threading
+import time
+
+# ID of the request being handled; copied into tasks run on the shared event loop
+request_id = contextvars.ContextVar('request_id', default='-')
+
+REDACTED = '***'
+# key=..., "key": "...", 'api_key': '...' (URLs, query strings and dict reprs)
+_SECRET_FIELDS = re.compile(
+    r'''(?P<prefix>(?:\b|["'])(?:key|api_key|apikey|token|secret|password)["']?\s*[=:]\s*["']?)(?P<value>[^&\s"',}]+)''',
+    re.IGNORECASE)
+
+_listener = None
+_lock = threading.Lock()
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = request_id.get()
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """Passes one in ``every`` DEBUG records per call site; other levels always pass."""
+
+    def __init__(self, every=1):
+        super().__init__()
+        self.every = max(1, int(every))
+        self._counters = {}
+
+    def filter(self, record):
+        if self.every == 1 or record.levelno != logging.DEBUG:
+            return True
+        site = (record.pathname, record.lineno)
+        counter = self._counters.get(site)
+        if counter is None:
+            counter = self._counters.setdefault(site, itertools.count())
+        return next(counter) % self.every == 0
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queues the record as it is; the listener's formatter does all the work.
+
+    The stock ``prepare`` formats the message (and any traceback) on the
+    logging thread and drops ``exc_info``. Records stay in this process, so
+    they can be passed unformatted; arguments are rendered when the
+    listener writes them.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def redact(text, secrets=()):
+    """Mask secret query/dict fields and any of the literal ``secrets`` in ``text``."""
+    for secret in secrets:
+        if secret and len(secret) >= 4:
+            text = text.replace(secret, REDACTED)
+    return _SECRET_FIELDS.sub(lambda m: m.group('prefix') + REDACTED, text)
+
+
+class RedactingFormatter(logging.Formatter):
+    """Plain-text lines with secrets masked. ``secrets`` is a callable
+    returning the current literal secrets (keys can change at runtime)."""
+
+    def __init__(self, fmt=None, secrets=None):
+        super().__init__(fmt or '%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s')
+        self.secrets = secrets or (lambda: ())
+
+    def format(self, record):
+        return redact(super().format(record), self.secrets())
+
+
+class JsonFormatter(RedactingFormatter):
+    """One JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return redact(json.dumps(entry, ensure_ascii=False, default=str), self.secrets())
+
+
+def configure(level='INFO', fmt='text', debug_sample=1, use_queue=True, stream=None, secrets=None):
+    """Configure the root logger; safe to call again (the previous setup is replaced)."""
+    global _listener
+    formatter_class = JsonFormatter if fmt == 'json' else RedactingFormatter
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(formatter_class(secrets=secrets))
+
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        if use_queue:
+            records = queue.SimpleQueue()
+            handler = DeferredQueueHandler(records)
+            _listener = logging.handlers.QueueListener(records, output, respect_handler_level=False)
+            _listener.start()
+        else:
+            handler = output
+        # Request IDs are read in the logging thread, before the record is queued
+        handler.addFilter(RequestIdFilter())
+        handler.addFilter(DebugSampler(debug_sample))
+
+        root = logging.getLogger()
+        for old in [h for h in root.handlers if getattr(h, '_app_handler', False)]:
+            root.removeHandler(old)
+        handler._app_handler = True
+        root.addHandler(handler)
+        root.setLevel(level if isinstance(level, int) else level.upper())
+    return handler
+
+
+def flush():
+    """Write out queued records (tests, shutdown)."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener.start()
+
+
+def shutdown():
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(shutdown)
@@ -0,0 +1,291 @@
+"""In-process metrics exported in the Prometheus text format.
+
+Counters, gauges and histograms are plain locked updates on the request
+path; nothing is formatted until ``/metrics`` is scraped. Values that other
+objects already count (cache hits, for example) are read at scrape time by
+collectors instead of being mirrored on every lookup.
+
+Label values are passed positionally, in the order of ``labelnames``::
+
+    UPSTREAM = Histogram('upstream_request_seconds', 'Upstream latency', ('api', 'status'))
+    UPSTREAM.observe(0.12, 'directions', 'OK')
+    with STAGES.time('serialize'):
+        ...
+"""
+import asyncio
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Seconds; fine enough at the low end for sub-millisecond handler stages
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    labels = list(labels)
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'Metric already registered: {metric.name}')
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def register_collector(self, collect):
+        """``collect()`` returns (name, type, help, [(labels dict, value)]) tuples."""
+        with self._lock:
+            self._collectors.append(collect)
+        return collect
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collect in collectors:
+            for name, kind, documentation, samples in collect():
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labelvalues):
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {labelvalues}')
+        return labelvalues
+
+    def _header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """Monotonic counter; by convention the name ends in ``_total``."""
+
+    kind = 'counter'
+
+    def inc(self, *labelvalues, amount=1):
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = self._header()
+        for key, value in values:
+            lines.append(f'{self.name}{_format_labels(zip(self.labelnames, key))} {_format_value(value)}')
+        return lines
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, *labelvalues):
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labelvalues, amount=1):
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc(*labelvalues, amount=-amount)
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    @contextmanager
+    def track(self, *labelvalues):
+        """Count the enclosed block as in progress."""
+        self.inc(*labelvalues)
+        try:
+            yield
+        finally:
+            self.dec(*labelvalues)
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = self._header()
+        for key, value in values:
+            lines.append(f'{self.name}{_format_labels(zip(self.labelnames, key))} {_format_value(value)}')
+        return lines
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, *labelvalues):
+        key = self._key(labelvalues)
+        # Counts per bucket are stored non-cumulative and summed when rendered
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, *labelvalues):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def count(self, *labelvalues):
+        state = self._values.get(labelvalues)
+        return state[2] if state else 0
+
+    def sum(self, *labelvalues):
+        state = self._values.get(labelvalues)
+        return state[1] if state else 0.0
+
+    def render(self):
+        with self._lock:
+            values = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+        lines = self._header()
+        for key, (counts, total, count) in values:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(labels + [('le', _format_value(float(bound)))])
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {count}')
+        return lines
+
+
+def cache_collector(caches):
+    """Collector for hit/miss counters of caches.
+
+    ``caches`` is a callable returning {name: cache}; each cache has ``hits``
+    and ``misses`` and optionally ``stale_hits`` (SWRCache).
+    """
+    def collect():
+        current = caches()
+        hits, misses, ratios = [], [], []
+        for name, cache in current.items():
+            if cache is None:
+                continue
+            hit_count = cache.hits + getattr(cache, 'stale_hits', 0)
+            hits.append(({'cache': name}, hit_count))
+            misses.append(({'cache': name}, cache.misses))
+            lookups = hit_count + cache.misses
+            ratios.append(({'cache': name}, hit_count / lookups if lookups else 0.0))
+        stale = [({'cache': name}, cache.stale_hits) for name, cache in current.items()
+                 if hasattr(cache, 'stale_hits')]
+        return [
+            ('cache_hits_total', 'counter', 'Cache lookups answered from the cache', hits),
+            ('cache_stale_hits_total', 'counter', 'Hits served stale while a refresh runs', stale),
+            ('cache_misses_total', 'counter', 'Cache lookups that missed', misses),
+            ('cache_hit_ratio', 'gauge', 'Hits per lookup since start', ratios),
+        ]
+    return collect
+
+
+# Application metrics, shared by the modules that record them
+
+HTTP_REQUESTS = Counter('http_requests_total', 'HTTP requests handled', ('endpoint', 'method', 'status'))
+HTTP_REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'HTTP request latency', ('endpoint',))
+HTTP_IN_FLIGHT = Gauge('http_requests_in_flight', 'HTTP requests being handled', ('endpoint',))
+ROUTE_STAGE_SECONDS = Histogram('route_stage_seconds', 'Time spent in each stage of /route and plan_route',
+                                ('stage',))
+UPSTREAM_SECONDS = Histogram('upstream_request_seconds', 'Google Maps API call latency by result status',
+                             ('api', 'status'))
+UPSTREAM_IN_FLIGHT = Gauge('upstream_requests_in_flight', 'Google Maps API calls in progress', ('api',))
+DB_QUERY_SECONDS = Histogram('db_query_seconds', 'SQLite query time by db.py function', ('query',))
+
+
+class upstream_call:
+    """Times one Google Maps API call and counts it as in flight.
+
+    Set ``status`` inside the block (HTTP status first, then the API's own
+    status); calls that end in an exception before that are recorded as
+    'error', 'timeout' or 'cancelled'.
+    """
+
+    def __init__(self, api):
+        self.api = api
+        self.status = None
+
+    def __enter__(self):
+        UPSTREAM_IN_FLIGHT.inc(self.api)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        UPSTREAM_IN_FLIGHT.dec(self.api)
+        if exc_type is not None and issubclass(exc_type, asyncio.CancelledError):
+            self.status = 'cancelled'
+        elif exc_type is not None and issubclass(exc_type, asyncio.TimeoutError):
+            self.status = 'timeout'
+        elif self.status is None:
+            self.status = 'error'
+        UPSTREAM_SECONDS.observe(elapsed, self.api, self.status)
+        return False
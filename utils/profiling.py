@@ -0,0 +1,185 @@
+"""Opt-in per-request profiling with cProfile.
+
+``ProfilingMiddleware`` wraps a WSGI app. A request is profiled when it
+carries ``X-Profile: 1`` (or ``?profile=1``) or, with ``sample_every=N``,
+for one in every N requests. The profile is kept in a ``ProfileStore`` and
+its ID returned in the ``X-Profile-Id`` response header. On-demand profiles
+are kept most recent first; sampled ones only while they are among the
+``keep`` slowest.
+
+Only one request is profiled at a time (a second profiler would distort
+the first, and newer Pythons allow only one); requests arriving meanwhile
+run unprofiled. Install the middleware only when profiling is enabled,
+so a disabled profiler costs nothing.
+"""
+import cProfile
+import heapq
+import io
+import itertools
+import marshal
+import pstats
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+from utils import event_loop
+
+
+class _Loaded:
+    # Stand-in profiler object for pstats.Stats around an existing stats dict
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class Profile:
+    __slots__ = ('id', 'mode', 'method', 'path', 'query', 'status', 'duration', 'created', 'stats')
+
+    def __init__(self, id, mode, method, path, query, status, duration, stats):
+        self.id = id
+        self.mode = mode
+        self.method = method
+        self.path = path
+        self.query = query
+        self.status = status
+        self.duration = duration
+        self.created = time.time()
+        self.stats = stats  # cProfile stats dict, as written by Profile.dump_stats
+
+    def summary(self):
+        return {
+            'id': self.id,
+            'mode': self.mode,
+            'method': self.method,
+            'path': self.path,
+            'query': self.query,
+            'status': self.status,
+            'duration_ms': round(self.duration * 1000, 2),
+            'created': round(self.created, 3),
+        }
+
+    def text(self, sort='cumulative', limit=40):
+        """pstats report of the ``limit`` most expensive functions."""
+        stream = io.StringIO()
+        pstats.Stats(_Loaded(self.stats), stream=stream).strip_dirs().sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def dump(self):
+        """Binary pstats file contents (for snakeviz, pstats.Stats(path), ...)."""
+        return marshal.dumps(self.stats)
+
+
+class ProfileStore:
+    """The ``keep`` most recent on-demand and ``keep`` slowest sampled profiles."""
+
+    def __init__(self, keep=20):
+        self.keep = keep
+        self._recent = OrderedDict()
+        self._slowest = []  # min-heap of (duration, seq, Profile)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, profile):
+        with self._lock:
+            if profile.mode == 'sampled':
+                entry = (profile.duration, next(self._seq), profile)
+                if len(self._slowest) < self.keep:
+                    heapq.heappush(self._slowest, entry)
+                elif self._slowest and entry > self._slowest[0]:
+                    heapq.heapreplace(self._slowest, entry)
+                else:
+                    return False
+            else:
+                self._recent[profile.id] = profile
+                while len(self._recent) > self.keep:
+                    self._recent.popitem(last=False)
+            return True
+
+    def list(self):
+        """On-demand profiles (newest first), then sampled ones (slowest first)."""
+        with self._lock:
+            recent = list(reversed(self._recent.values()))
+            slowest = [entry[2] for entry in sorted(self._slowest, reverse=True)]
+        return recent + slowest
+
+    def get(self, profile_id):
+        with self._lock:
+            if profile_id in self._recent:
+                return self._recent[profile_id]
+            return next((entry[2] for entry in self._slowest if entry[2].id == profile_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._recent.clear()
+            self._slowest.clear()
+
+
+class ProfilingMiddleware:
+    """WSGI middleware running selected requests under cProfile.
+
+    With a ``token``, the on-demand flag is honoured only together with a
+    matching ``X-Profile-Token`` header.
+    """
+
+    def __init__(self, app, store, sample_every=0, token='', exclude=('/admin/',)):
+        self.app = app
+        self.store = store
+        self.sample_every = sample_every
+        self.token = token
+        self.exclude = exclude
+        self._counter = itertools.count(1)
+        self._busy = threading.Lock()
+
+    def _mode(self, environ):
+        path = environ.get('PATH_INFO', '')
+        if any(path.startswith(prefix) for prefix in self.exclude):
+            return None
+        flag = environ.get('HTTP_X_PROFILE')
+        if flag is None and 'profile' in environ.get('QUERY_STRING', ''):
+            flag = parse_qs(environ['QUERY_STRING']).get('profile', [None])[0]
+        if flag in ('1', 'true') and (not self.token or environ.get('HTTP_X_PROFILE_TOKEN') == self.token):
+            return 'on_demand'
+        if self.sample_every > 0 and next(self._counter) % self.sample_every == 0:
+            return 'sampled'
+        return None
+
+    def __call__(self, environ, start_response):
+        mode = self._mode(environ)
+        if mode is None or not self._busy.acquire(blocking=False):
+            return self.app(environ, start_response)
+        profile_id = uuid.uuid4().hex[:12]
+        status = []
+
+        def profiled_start_response(status_line, headers, exc_info=None):
+            status.append(int(status_line.split(' ', 1)[0]))
+            if mode == 'on_demand':
+                headers = list(headers) + [('X-Profile-Id', profile_id)]
+            return start_response(status_line, headers, exc_info)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            with event_loop.inline():
+                profiler.enable()
+                try:
+                    # The body is read inside the profile so lazily built responses count too
+                    body = self.app(environ, profiled_start_response)
+                    try:
+                        chunks = list(body)
+                    finally:
+                        if hasattr(body, 'close'):
+                            body.close()
+                finally:
+                    profiler.disable()
+        finally:
+            self._busy.release()
+        duration = time.perf_counter() - started
+        profiler.create_stats()
+        self.store.add(Profile(profile_id, mode, environ.get('REQUEST_METHOD'), environ.get('PATH_INFO'),
+                               environ.get('QUERY_STRING', ''), status[0] if status else None, duration,
+                               profiler.stats))
+        return chunks
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+from utils import event_loop
+
+
+class SWRCache:
+    """Stale-while-revalidate cache for async fetches.
+
+    Entries younger than ``soft_ttl`` are served as fresh. Between
+    ``soft_ttl`` and ``hard_ttl`` the stale value is served at once and a
+    refresh runs in the background on the shared event loop; a failed refresh
+    keeps the stale value. Older or missing entries make the caller wait.
+    Concurrent fetches of one key are collapsed into a single request.
+    """
+
+    def __init__(self, maxsize=1024, soft_ttl=60, hard_ttl=300):
+        self.maxsize = maxsize
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self._data = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get(self, key, fetch):
+        """Return (value, status, age_seconds); status is 'fresh', 'stale' or 'miss'.
+
+        ``fetch`` is a zero-argument callable returning a coroutine.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+        if entry is not None:
+            age = now - entry[0]
+            if age < self.soft_ttl:
+                self.hits += 1
+                return entry[1], 'fresh', age
+            if age < self.hard_ttl:
+                self.stale_hits += 1
+                self._refresh(key, fetch)
+                return entry[1], 'stale', age
+        self.misses += 1
+        # Shielded so a caller giving up does not cancel the fetch other callers share
+        value = await asyncio.shield(asyncio.wrap_future(self._refresh(key, fetch)))
+        return value, 'miss', 0.0
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _refresh(self, key, fetch):
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = event_loop.submit(self._fetch(key, fetch))
+                self._pending[key] = future
+        return future
+
+    async def _fetch(self, key, fetch):
+        try:
+            value = await fetch()
+            self.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
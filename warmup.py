@@ -0,0 +1,89 @@
+"""Start-up warm-up and readiness.
+
+Importing the app builds nothing expensive: upstream clients, the routing
+graph, the routing pool and the shared event loop are all created on first
+use. ``warm_up`` creates them ahead of traffic, one registered step after
+another; ``start`` runs it in a background thread so a worker can accept
+connections (and answer readiness probes) while it warms. Steps are
+idempotent, so running the warm-up after a request already initialised
+something is harmless.
+"""
+import logging
+import threading
+import time
+
+import db
+import graph_state
+from utils import event_loop
+
+logger = logging.getLogger(__name__)
+
+COLD, WARMING, READY, FAILED = 'cold', 'warming', 'ready', 'failed'
+
+_steps = []
+_state = {'status': COLD, 'error': None, 'seconds': None, 'steps': {}}
+_lock = threading.Lock()
+_done = threading.Event()
+
+
+def register(name, step):
+    """Add a warm-up step; ``step()`` is called with no arguments."""
+    _steps.append((name, step))
+
+
+register('database', db.get_data_version)
+register('event_loop', event_loop.get_loop)
+register('graph', graph_state.get_snapshot)
+
+
+def warm_up():
+    """Run all steps in this thread (once per process; other callers wait for it)."""
+    with _lock:
+        if _state['status'] in (WARMING, READY):
+            owner = False
+        else:
+            _state.update(status=WARMING, error=None, steps={})
+            _done.clear()
+            owner = True
+    if not owner:
+        _done.wait()
+        return _state['status'] == READY
+
+    started = time.perf_counter()
+    try:
+        for name, step in _steps:
+            step_started = time.perf_counter()
+            step()
+            _state['steps'][name] = round(time.perf_counter() - step_started, 4)
+    except Exception as e:
+        logger.exception("Warm-up failed")
+        _state.update(status=FAILED, error=f'{type(e).__name__}: {e}')
+    else:
+        _state['status'] = READY
+        logger.info("Warm-up finished in %.2f s", time.perf_counter() - started)
+    _state['seconds'] = round(time.perf_counter() - started, 4)
+    _done.set()
+    return _state['status'] == READY
+
+
+def start():
+    """Warm up in a background thread unless that already happened or is running."""
+    if _state['status'] in (WARMING, READY):
+        return
+    threading.Thread(target=warm_up, name='warmup', daemon=True).start()
+
+
+def status():
+    return {'status': _state['status'], 'error': _state['error'], 'seconds': _state['seconds'],
+            'steps': dict(_state['steps'])}
+
+
+def is_ready():
+    return _state['status'] == READY
+
+
+def reset():
+    # Forget the warm-up (tests); the initialised subsystems are left alone
+    with _lock:
+        _state.update(status=COLD, error=None, seconds=None, steps={})
+        _done.clear()